@@ -0,0 +1,170 @@
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+from crawl_metrics import get_metrics
+from crawl_state import canonicalize_url
+from scraper import Scraper, find_recipe_links, find_total_pages, is_recipe_link
+from selector_plan import make_soup
+
+debug = False
+
+
+class TokenBucket:
+    # Allows `rate` requests per second on average with bursts up to `capacity`.
+    # Waiters queue on the lock, so tokens are handed out in arrival order.
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+                await asyncio.sleep(wait)
+                get_metrics().inc("sleep_seconds_total", wait, reason="rate_limit")
+
+
+class AsyncCrawler:
+    # asyncio crawl engine for the same cookbook as Scraper.download_cookbook.
+    # Listing pages are processed concurrently (up to max_pages_in_flight), so
+    # recipe fetches from several pages overlap; every request goes through a
+    # global semaphore, a per-host semaphore and a per-host token bucket
+    # instead of fixed sleeps. Parsing and saving reuse the Scraper helpers.
+    def __init__(self, scraper=None, cookbook_url=None, max_concurrency=16, per_host_concurrency=4,
+                 requests_per_second=4.0, burst=8, max_pages_in_flight=4, timeout=30,
+                 max_retries=3, retry_delay=2):
+        self.scraper = scraper or Scraper()
+        if cookbook_url:
+            self.scraper.cookbook_url = cookbook_url
+        self.max_concurrency = max_concurrency
+        self.per_host_concurrency = per_host_concurrency
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.max_pages_in_flight = max_pages_in_flight
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.total_recipes_processed = 0
+        self.total_recipes_saved = 0
+        self.total_recipes_failed = 0
+
+    def host_limits(self, url):
+        host = urlsplit(url).netloc
+        if host not in self.host_semaphores:
+            self.host_semaphores[host] = asyncio.Semaphore(self.per_host_concurrency)
+            self.host_buckets[host] = TokenBucket(self.requests_per_second, self.burst)
+        return self.host_semaphores[host], self.host_buckets[host]
+
+    async def fetch(self, session, url):
+        host_semaphore, host_bucket = self.host_limits(url)
+        metrics = get_metrics()
+        for attempt in range(self.max_retries):
+            try:
+                async with self.global_semaphore, host_semaphore:
+                    await host_bucket.acquire()
+                    start = time.perf_counter()
+                    async with session.get(url) as response:
+                        metrics.inc("http_responses_total", status=response.status)
+                        response.raise_for_status()
+                        body = await response.read()
+                        # undecodable bytes are replaced, as by requests' Response.text,
+                        # so a page with a wrong charset cannot abort the crawl
+                        html = body.decode(response.get_encoding(), errors="replace")
+                    metrics.observe("fetch_seconds", time.perf_counter() - start)
+                    metrics.inc("bytes_downloaded_total", len(body))
+                    return html
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == self.max_retries - 1:
+                    metrics.inc("fetch_failures_total", error=type(e).__name__)
+                    raise
+                if debug:
+                    print(f"Attempt {attempt + 1} failed for {url}: {e}")
+                metrics.inc("fetch_retries_total", error=type(e).__name__)
+                delay = self.retry_delay * 2 ** attempt
+                await asyncio.sleep(delay)
+                metrics.inc("sleep_seconds_total", delay, reason="backoff")
+
+    async def crawl(self):
+        # primitives are created here so they belong to the running event loop
+        self.global_semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.page_semaphore = asyncio.Semaphore(self.max_pages_in_flight)
+        self.host_semaphores = {}
+        self.host_buckets = {}
+        self.in_flight = set()
+        self.scraper.recipe_store.recover_partial_shards()
+        self.scraper.seed_crawl_state()
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        try:
+            async with aiohttp.ClientSession(timeout=timeout) as session:
+                html = await self.fetch(session, self.scraper.cookbook_url)
+                total_pages = find_total_pages(make_soup(html))
+                await asyncio.gather(*(self.crawl_page(session, page_number)
+                                       for page_number in range(1, total_pages + 1)))
+        finally:
+            # an aborted crawl still publishes the recipes saved so far
+            self.scraper.recipe_store.close()
+            get_metrics().write()
+        print(f"Total recipes processed: {self.total_recipes_processed}")
+        print(f"Total recipes saved: {self.total_recipes_saved}")
+        print(f"Total recipes failed: {self.total_recipes_failed}")
+        return self.total_recipes_saved
+
+    async def crawl_page(self, session, page_number):
+        async with self.page_semaphore:
+            page_url = self.scraper.page_url(page_number)
+            try:
+                html = await self.fetch(session, page_url)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"Page {page_number}: failed to download listing: {e}")
+                return
+            recipe_links = [link for link in find_recipe_links(make_soup(html), page_url)
+                            if is_recipe_link(link)]
+            results = await asyncio.gather(*(self.crawl_recipe(session, link) for link in recipe_links))
+            print(f"Page {page_number}: {sum(results)} recipes saved")
+
+    async def crawl_recipe(self, session, link):
+        # Known URLs are skipped before any request, as in download_cookbook;
+        # in_flight catches a link listed on two pages crawled concurrently.
+        # The crawl state is only touched from the event loop thread.
+        crawl_state = self.scraper.crawl_state
+        url = canonicalize_url(link)
+        if url in self.in_flight or crawl_state.is_seen(link):
+            get_metrics().inc("recipes_total", outcome="known")
+            return False
+        self.in_flight.add(url)
+        self.total_recipes_processed += 1
+        try:
+            html = await self.fetch(session, link)
+            # parsing is CPU-bound, keep it off the event loop
+            saved = await asyncio.to_thread(self.scraper.save_recipe_html, html, link)
+        except Exception as e:
+            self.total_recipes_failed += 1
+            get_metrics().inc("recipes_total", outcome="failed")
+            if debug:
+                print(f"Failed to save {link}: {e}")
+            return False
+        finally:
+            self.in_flight.discard(url)
+        crawl_state.mark_seen(link, saved)
+        if saved:
+            self.total_recipes_saved += 1
+        return saved
+
+
+def download_cookbook_async(**options):
+    return asyncio.run(AsyncCrawler(**options).crawl())
+
+
+if __name__ == '__main__':
+    download_cookbook_async()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Database fridge matching benchmark on a synthetic recipe corpus.
+
+Generates a corpus of recipe shards in a temporary directory, bulk loads it
+into the database of the chosen environment (its recipes are replaced, so
+use a scratch database) and runs DatabaseMatcher's set-based query under
+EXPLAIN (ANALYZE, BUFFERS) for every fridge, in full-match mode and with up
+to N missing ingredients. Full matches are checked against the in-memory
+IngredientIndex, and the cost of the alternative, fetching every
+recipe-ingredient link to match in Python, is reported alongside.
+
+Usage:
+    python3 benchmark_database_matcher.py --recipes 100000 --max-missing 0 2
+    python3 benchmark_database_matcher.py --skip-load --plans
+"""
+
+import argparse
+import random
+import statistics
+import tempfile
+import time
+
+from benchmark_matcher import generate_recipes, generate_vocabulary
+from database_matcher import MATCHING_QUERY, DatabaseMatcher
+from database_setup import DatabaseSetup
+from ingredient_index import IngredientIndex
+from recipe_store import ShardWriter
+
+
+def load_corpus(environment, n_recipes, vocabulary, rng):
+    with tempfile.TemporaryDirectory() as folder:
+        print(f"Generating {n_recipes} synthetic recipes...")
+        writer = ShardWriter(folder)
+        for recipe in generate_recipes(n_recipes, vocabulary, rng):
+            writer.write(recipe)
+        writer.close()
+
+        setup = DatabaseSetup(environment)
+        setup.connect()
+        try:
+            setup.create_schema()
+            setup.cursor.execute("TRUNCATE recipes, ingredients, recipe_ingredients, sync_manifest CASCADE")
+            setup.conn.commit()
+            setup.bulk_load_recipes(folder)
+            setup.update_ingredient_counts()
+            setup.conn.autocommit = True
+            setup.cursor.execute("VACUUM ANALYZE recipes, ingredients, recipe_ingredients")
+        finally:
+            setup.disconnect()
+
+
+def build_index(matcher):
+    # the in-memory matcher over the recipes as stored, to check the query against
+    index = IngredientIndex()
+    index.ontology = matcher.ontology
+    with matcher.pool.cursor() as cursor:
+        cursor.execute("""
+            SELECT r.url, COALESCE(array_agg(i.name) FILTER (WHERE i.name IS NOT NULL), '{}') AS names
+            FROM recipes r
+            LEFT JOIN recipe_ingredients ri ON ri.recipe_id = r.id
+            LEFT JOIN ingredients i ON i.id = ri.ingredient_id
+            GROUP BY r.url
+        """)
+        rows = cursor.fetchall()
+    for row in rows:
+        index.add_recipe({'url': row['url'], 'ingredients': [[name] for name in row['names']]})
+    return index
+
+
+def explain(matcher, fridge, max_missing, options="ANALYZE, BUFFERS, FORMAT JSON"):
+    parameters = matcher.matching_parameters(fridge, max_missing)
+    with matcher.pool.cursor() as cursor:
+        cursor.execute(f"EXPLAIN ({options}) " + MATCHING_QUERY, parameters)
+        return [row['QUERY PLAN'] for row in cursor.fetchall()]
+
+
+def fetch_all_links(matcher):
+    # what matching in Python would have to transfer first
+    start = time.perf_counter()
+    with matcher.pool.cursor() as cursor:
+        cursor.execute("""
+            SELECT r.url, i.name
+            FROM recipes r
+            JOIN recipe_ingredients ri ON ri.recipe_id = r.id
+            JOIN ingredients i ON i.id = ri.ingredient_id
+        """)
+        rows = cursor.fetchall()
+    elapsed = time.perf_counter() - start
+    return elapsed, len(rows), sum(len(row['url']) + len(row['name']) for row in rows)
+
+
+def run_benchmark(matcher, fridges, modes, show_plans):
+    index = build_index(matcher)
+    print(f"{'max missing':>12} {'rows':>8} {'execution (ms)':>15} {'planning (ms)':>14} {'client (ms)':>12} "
+          f"{'shared hits':>12}")
+    for max_missing in modes:
+        executions, plannings, clients, rows, hits = [], [], [], [], []
+        for fridge in fridges:
+            plan = explain(matcher, fridge, max_missing)[0][0]
+            executions.append(plan['Execution Time'])
+            plannings.append(plan['Planning Time'])
+            hits.append(plan['Plan'].get('Shared Hit Blocks', 0))
+            if show_plans:
+                print('\n'.join(explain(matcher, fridge, max_missing, "ANALYZE, BUFFERS")))
+            start = time.perf_counter()
+            recipes = matcher.get_matching_recipes(fridge, max_missing)
+            clients.append(1000 * (time.perf_counter() - start))
+            rows.append(len(recipes))
+            if max_missing == 0 and sorted(recipe['url'] for recipe in recipes) != sorted(
+                    index.get_matching_recipes(fridge)):
+                raise AssertionError("the database and IngredientIndex disagree on a fridge")
+        print(f"{max_missing:>12} {statistics.mean(rows):>8.0f} {statistics.median(executions):>15.2f} "
+              f"{statistics.median(plannings):>14.2f} {statistics.median(clients):>12.2f} "
+              f"{statistics.median(hits):>12.0f}")
+
+    elapsed, n_rows, n_bytes = fetch_all_links(matcher)
+    print(f"Fetching every link instead: {n_rows} rows, ~{n_bytes / 1e6:.1f} MB of names and URLs "
+          f"in {1000 * elapsed:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--recipes', type=int, default=100000)
+    parser.add_argument('--ingredients', type=int, default=2000)
+    parser.add_argument('--queries', type=int, default=10)
+    parser.add_argument('--fridge-size', type=int, default=200)
+    parser.add_argument('--max-missing', type=int, nargs='+', default=[0, 2])
+    parser.add_argument('--environment', default='dev', help="database_config environment to load into")
+    parser.add_argument('--skip-load', action='store_true', help='reuse the recipes already in the database')
+    parser.add_argument('--plans', action='store_true', help='print every query plan')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = generate_vocabulary(args.ingredients, rng)
+    fridges = [rng.sample(vocabulary, args.fridge_size) for _ in range(args.queries)]
+    if not args.skip_load:
+        load_corpus(args.environment, args.recipes, vocabulary, rng)
+
+    matcher = DatabaseMatcher(args.environment)
+    matcher.connect()
+    try:
+        run_benchmark(matcher, fridges, args.max_missing, args.plans)
+    finally:
+        matcher.disconnect()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Matcher scaling benchmark on a synthetic recipe corpus.
+
+Generates a corpus in a temporary directory (JSON files plus a packed
+catalog) and reports, for an increasing number of workers, how long the
+shards take to load and how long a batch of fridge queries takes.
+
+Usage:
+    python3 benchmark_matcher.py --recipes 50000 --queries 20
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from ingredient_index import IngredientIndex
+from parallel_matcher import ParallelMatcher
+from recipe_catalog import build_catalog
+
+UNITS = ['g', 'kg', 'ml', 'l', None]
+
+
+def generate_vocabulary(n_ingredients, rng):
+    syllables = ['ba', 'ce', 'di', 'fo', 'gu', 'la', 'me', 'no', 'pa', 'ri', 'sa', 'to', 'va', 'zu']
+    vocabulary = set()
+    while len(vocabulary) < n_ingredients:
+        words = [''.join(rng.choice(syllables) for _ in range(rng.randint(2, 4)))
+                 for _ in range(rng.randint(1, 3))]
+        vocabulary.add(' '.join(words))
+    return sorted(vocabulary)
+
+
+def generate_recipes(n_recipes, vocabulary, rng):
+    for recipe_number in range(n_recipes):
+        ingredients = [[rng.choice(vocabulary), rng.randint(1, 500), rng.choice(UNITS)]
+                       for _ in range(rng.randint(3, 12))]
+        yield {
+            'title': f'ricetta {recipe_number}',
+            'category': 'sintetica',
+            'ingredients': ingredients,
+            'url': f'https://example.invalid/ricetta-{recipe_number}.html',
+            'n_people': str(rng.randint(1, 8))
+        }
+
+
+def write_corpus(folder, n_recipes, vocabulary, rng):
+    recipe_path = os.path.join(folder, 'Recipes')
+    os.makedirs(recipe_path)
+    for recipe in generate_recipes(n_recipes, vocabulary, rng):
+        file_name = recipe['title'].replace(' ', '_') + '.json'
+        with open(os.path.join(recipe_path, file_name), 'w') as file:
+            json.dump(recipe, file)
+    return recipe_path
+
+
+def run_benchmark(recipe_path, catalog_path, fridges, worker_counts):
+    start = time.perf_counter()
+    index = IngredientIndex()
+    for file_name in sorted(os.listdir(recipe_path)):
+        with open(os.path.join(recipe_path, file_name), 'r') as file:
+            index.add_recipe(json.load(file))
+    load_time = time.perf_counter() - start
+    start = time.perf_counter()
+    expected = [index.get_matching_recipes(fridge) for fridge in fridges]
+    query_time = time.perf_counter() - start
+    print(f"{'workers':>8} {'source':>8} {'load (s)':>10} {'queries (s)':>12} {'speedup':>8}")
+    print(f"{'inline':>8} {'json':>8} {load_time:>10.3f} {query_time:>12.3f} {1.0:>8.2f}")
+    baseline = load_time + query_time
+
+    for source, source_catalog in (('json', None), ('catalog', catalog_path)):
+        for n_workers in worker_counts:
+            parallel_matcher = ParallelMatcher(recipe_path, n_workers, source_catalog)
+            start = time.perf_counter()
+            parallel_matcher.start()
+            load_time = time.perf_counter() - start
+            start = time.perf_counter()
+            results = [parallel_matcher.get_matching_recipes(fridge) for fridge in fridges]
+            query_time = time.perf_counter() - start
+            parallel_matcher.close()
+            if results != expected:
+                raise AssertionError(f"{n_workers} workers returned different matches")
+            speedup = baseline / (load_time + query_time)
+            print(f"{n_workers:>8} {source:>8} {load_time:>10.3f} {query_time:>12.3f} {speedup:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--recipes', type=int, default=20000)
+    parser.add_argument('--ingredients', type=int, default=2000)
+    parser.add_argument('--queries', type=int, default=20)
+    parser.add_argument('--fridge-size', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = generate_vocabulary(args.ingredients, rng)
+    fridges = [rng.sample(vocabulary, args.fridge_size) for _ in range(args.queries)]
+    worker_counts = sorted({1, 2, 4, 8, os.cpu_count() or 1})
+    worker_counts = [n for n in worker_counts if n <= (os.cpu_count() or 1)]
+
+    with tempfile.TemporaryDirectory() as folder:
+        print(f"Generating {args.recipes} synthetic recipes...")
+        recipe_path = write_corpus(folder, args.recipes, vocabulary, rng)
+        catalog_path = os.path.join(folder, 'recipes.catalog')
+        build_catalog(recipe_path, catalog_path)
+        run_benchmark(recipe_path, catalog_path, fridges, worker_counts)
+
+
+if __name__ == '__main__':
+    main()
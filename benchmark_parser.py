@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Recipe page parsing benchmark.
+
+Parses a directory of saved recipe pages (*.html) with every available
+parser backend, once with the fixed selector order and once with the
+learned selector plan, and reports the throughput in pages/s.
+Without --fixtures, synthetic pages using the current site layout are used.
+
+Usage:
+    python3 benchmark_parser.py --fixtures saved_pages/
+"""
+
+import argparse
+import glob
+import os
+import random
+import time
+
+import scraper
+from selector_plan import SelectorPlan, available_parsers, make_soup
+
+NOISE = '<div class="gz-card"><a href="/x">link</a><p>' + 'testo ' * 40 + '</p></div>'
+
+
+def synthetic_page(number, rng):
+    ingredients = ''.join(
+        f'<dd class="gz-ingredient"><a>ingrediente {i}</a> {rng.randint(1, 500)} g</dd>'
+        for i in range(rng.randint(4, 15)))
+    return (f'<html><head><title>Ricetta {number}</title></head><body>'
+            f'{NOISE * 60}<h1>Ricetta {number}</h1>'
+            f'<ul class="gz-breadcrumb"><li><a>Primi piatti</a></li></ul>'
+            f'<div class="gz-name-featured-data">Dosi per 4 persone</div>'
+            f'<dl>{ingredients}</dl>{NOISE * 60}</body></html>')
+
+
+def load_fixtures(fixtures, n_pages, seed):
+    if fixtures:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(fixtures, '*.html'))):
+            with open(path, 'r', encoding='utf-8', errors='replace') as file:
+                pages.append(file.read())
+        return pages
+    rng = random.Random(seed)
+    return [synthetic_page(number, rng) for number in range(n_pages)]
+
+
+def parse_page(html, parser):
+    soup = make_soup(html, parser)
+    return (scraper.find_title(soup), scraper.find_ingredients(soup),
+            scraper.find_category(soup), scraper.find_n_people(soup))
+
+
+def run(pages, parser, learn, original_plans, expected=None):
+    # fresh plans, so every run starts from the documented selector order;
+    # plans whose order is a precedence never learn
+    plans = {}
+    for name, original_plan in original_plans.items():
+        plans[name] = SelectorPlan(original_plan.order, learn=learn and original_plan.learn)
+        setattr(scraper, name, plans[name])
+    start = time.perf_counter()
+    results = [parse_page(html, parser) for html in pages]
+    elapsed = time.perf_counter() - start
+    # learning may only change how fast a page is parsed, never what it yields
+    assert expected is None or results == expected, "learned selector plans changed the extracted fields"
+    fallbacks = sum(plan.fallbacks for plan in plans.values())
+    return results, elapsed, fallbacks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fixtures', help='directory of saved recipe pages (*.html)')
+    parser.add_argument('--pages', type=int, default=200, help='number of synthetic pages')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    pages = load_fixtures(args.fixtures, args.pages, args.seed)
+    if not pages:
+        print("No pages to parse.")
+        return
+    original_plans = {name: getattr(scraper, name) for name in ('TITLE_PLAN', 'INGREDIENT_PLAN', 'CATEGORY_PLAN')}
+    print(f"Parsing {len(pages)} pages ({sum(map(len, pages)) / len(pages) / 1024:.0f} KiB on average)")
+    print(f"{'parser':>12} {'selectors':>10} {'pages/s':>10} {'fallbacks':>10}")
+    try:
+        for backend in available_parsers():
+            expected = None
+            for learn in (False, True):
+                results, elapsed, fallbacks = run(pages, backend, learn, original_plans, expected)
+                expected = results
+                label = 'learned' if learn else 'fixed'
+                print(f"{backend:>12} {label:>10} {len(pages) / elapsed:>10.1f} {fallbacks:>10}")
+    finally:
+        for name, plan in original_plans.items():
+            setattr(scraper, name, plan)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Scraper throughput benchmark against a synthetic local site.
+
+Starts a stand-in for the cookbook in a separate process: listing pages
+carry the total-pages marker and recipe cards, recipe pages the h1,
+breadcrumb and gz-ingredient markup of the real site. Every response can be
+delayed, and the first request for a share of the recipe pages can fail
+with a 503, so the retry path is exercised without aborting the crawl.
+The full Scraper.download_cookbook path (or the asyncio crawler) then runs
+in a temporary directory, and the benchmark reports recipes/s, CPU time and
+peak RSS of the crawling process.
+
+Results can be saved with --output and compared with --baseline.
+
+Usage:
+    python3 benchmark_scraper.py --pages 20 --latency 20 --error-rate 0.05
+    python3 benchmark_scraper.py --output before.json
+    python3 benchmark_scraper.py --baseline before.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import tempfile
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmark_parser import synthetic_page
+
+
+def listing_page(page_number, n_pages, recipes_per_page, base_url):
+    cards = ''.join(
+        f'<article class="gz-card"><a href="{base_url}/ricette/ricetta-{page_number}-{i}.html">'
+        f'Ricetta {page_number}-{i}</a></article>'
+        for i in range(recipes_per_page))
+    return (f'<html><body>{cards}'
+            f'<div class="pagination"><span class="disabled total-pages">{n_pages}</span></div>'
+            f'</body></html>')
+
+
+def serve(ready, n_pages, recipes_per_page, latency, error_rate, seed, errors):
+    rng = random.Random(seed)
+    pages = {}
+    requested = set()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if latency:
+                time.sleep(latency)
+            base_url = f"http://127.0.0.1:{self.server.server_port}"
+            if self.path.startswith('/ricette-cat'):
+                page_number = int(self.path.split('/page')[1].strip('/')) if '/page' in self.path else 1
+                body = listing_page(page_number, n_pages, recipes_per_page, base_url)
+            elif self.path.startswith('/ricette/'):
+                # only first requests of recipe pages fail, so every retry succeeds;
+                # listing errors would just shrink the crawl
+                first_request = self.path not in requested
+                requested.add(self.path)
+                if first_request and rng.random() < error_rate:
+                    with errors.get_lock():
+                        errors.value += 1
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+                if self.path not in pages:
+                    pages[self.path] = synthetic_page(len(pages), random.Random(self.path))
+                body = pages[self.path]
+            else:
+                self.send_response(404)
+                self.end_headers()
+                return
+            content = body.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    ready.put(server.server_port)
+    server.serve_forever()
+
+
+def crawl(engine, cookbook_url, delay):
+    import scraper
+    scraper.RETRY_DELAY = delay
+    if engine == 'async':
+        from async_scraper import download_cookbook_async
+        return download_cookbook_async(cookbook_url=cookbook_url, retry_delay=delay,
+                                       requests_per_second=1000.0, burst=1000)
+    instance = scraper.Scraper()
+    instance.cookbook_url = cookbook_url
+    instance.request_delay = delay
+    instance.page_delay = delay
+    instance.cautious_pause = delay
+    instance.download_cookbook()
+    return None
+
+
+def count_saved(recipe_path):
+    from recipe_store import iter_recipes
+    return sum(1 for _ in iter_recipes(recipe_path))
+
+
+def run(args):
+    ready = multiprocessing.Queue()
+    errors = multiprocessing.Value('i', 0)
+    server = multiprocessing.Process(
+        target=serve, daemon=True,
+        args=(ready, args.pages, args.recipes_per_page, args.latency / 1000, args.error_rate, args.seed, errors))
+    server.start()
+    port = ready.get()
+    working_directory = os.getcwd()
+    directory = tempfile.mkdtemp(prefix='ispirami-scraper-')
+    try:
+        # the scraper keeps its recipes, crawl state and caches in the current directory
+        os.chdir(directory)
+        output = io.StringIO()
+        start_usage = resource.getrusage(resource.RUSAGE_SELF)
+        start = time.perf_counter()
+        with contextlib.ExitStack() as redirect:
+            if not args.verbose:
+                redirect.enter_context(contextlib.redirect_stdout(output))
+                redirect.enter_context(contextlib.redirect_stderr(output))
+            crawl(args.engine, f"http://127.0.0.1:{port}/ricette-cat", args.delay)
+        elapsed = time.perf_counter() - start
+        end_usage = resource.getrusage(resource.RUSAGE_SELF)
+        n_saved = count_saved('Recipes')
+    finally:
+        os.chdir(working_directory)
+        shutil.rmtree(directory, ignore_errors=True)
+        server.terminate()
+    cpu_time = (end_usage.ru_utime - start_usage.ru_utime) + (end_usage.ru_stime - start_usage.ru_stime)
+    return {
+        'engine': args.engine,
+        'pages': args.pages,
+        'recipes_per_page': args.recipes_per_page,
+        'latency_ms': args.latency,
+        'error_rate': args.error_rate,
+        'recipes_saved': n_saved,
+        'errors_injected': errors.value,
+        'seconds': elapsed,
+        'recipes_per_second': n_saved / elapsed if elapsed else 0.0,
+        'cpu_seconds': cpu_time,
+        'cpu_ms_per_recipe': 1000 * cpu_time / n_saved if n_saved else 0.0,
+        # ru_maxrss is in KiB on Linux
+        'peak_rss_mib': end_usage.ru_maxrss / 1024,
+    }
+
+
+def print_results(results, baseline=None):
+    rows = [('recipes saved', 'recipes_saved', '{:.0f}'),
+            ('errors injected', 'errors_injected', '{:.0f}'),
+            ('wall time (s)', 'seconds', '{:.2f}'),
+            ('recipes/s', 'recipes_per_second', '{:.1f}'),
+            ('CPU time (s)', 'cpu_seconds', '{:.2f}'),
+            ('CPU ms/recipe', 'cpu_ms_per_recipe', '{:.2f}'),
+            ('peak RSS (MiB)', 'peak_rss_mib', '{:.1f}')]
+    header = f"{'':>16} {'current':>10}"
+    if baseline:
+        header += f" {'baseline':>10} {'ratio':>8}"
+    print(header)
+    for label, key, number_format in rows:
+        line = f"{label:>16} {number_format.format(results[key]):>10}"
+        if baseline:
+            ratio = results[key] / baseline[key] if baseline.get(key) else float('nan')
+            line += f" {number_format.format(baseline[key]):>10} {ratio:>8.2f}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--engine', choices=('sync', 'async'), default='sync')
+    parser.add_argument('--pages', type=int, default=10, help='number of listing pages')
+    parser.add_argument('--recipes-per-page', type=int, default=15)
+    parser.add_argument('--latency', type=float, default=0.0, help='delay of every response, in ms')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='share of recipe pages whose first request is answered 503')
+    parser.add_argument('--delay', type=float, default=0.0, help='politeness and retry delays, in seconds')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='save the results as JSON')
+    parser.add_argument('--baseline', help='JSON results of a previous run to compare with')
+    parser.add_argument('--verbose', action='store_true', help='show the scraper output')
+    args = parser.parse_args()
+
+    print(f"Crawling {args.pages} pages x {args.recipes_per_page} recipes ({args.engine}, "
+          f"{args.latency:g} ms latency, {args.error_rate:.0%} errors)")
+    results = run(args)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            baseline = json.load(file)
+    print_results(results, baseline)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+import numpy as np
+
+# upper bound on the fridges x ingredient-entries cells evaluated at once
+MAX_BATCH_CELLS = 1 << 25
+
+
+class BitmapMatcher:
+    # Vectorized matcher for batches of fridges over one IngredientIndex.
+    # The catalog is a sparse boolean recipe x ingredient matrix in CSR form:
+    # recipe r uses the vocabulary ids entries[offsets[r]:offsets[r + 1]].
+    # A batch of fridges becomes a dense boolean availability matrix over the
+    # same vocabulary, and missing-ingredient counts for every (fridge, recipe)
+    # pair come out of one gather plus a cumulative sum, with no per-recipe loop.
+    def __init__(self, index):
+        self.index = index
+        self.n_ingredients = len(index.ingredient_names)
+        self.offsets = np.zeros(len(index.recipe_sizes) + 1, dtype=np.int64)
+        np.cumsum(index.recipe_sizes, out=self.offsets[1:])
+        self.entries = np.fromiter((ingredient_id for ingredient_ids in index.recipe_ingredients
+                                    for ingredient_id in ingredient_ids),
+                                   dtype=np.int32, count=int(self.offsets[-1]))
+        self.urls = np.array(index.urls, dtype=object)
+
+    def get_availability(self, fridges):
+        availability = np.zeros((len(fridges), self.n_ingredients), dtype=bool)
+        for row, fridge_ingredients in enumerate(fridges):
+            available = self.index.find_available(fridge_ingredients)
+            availability[row, list(available)] = True
+        return availability
+
+    def count_missing(self, fridges):
+        # (fridges x recipes) matrix of missing ingredient counts
+        availability = self.get_availability(fridges)
+        missing_entries = ~availability[:, self.entries]
+        cumulative = np.zeros((len(fridges), len(self.entries) + 1), dtype=np.int32)
+        np.cumsum(missing_entries, axis=1, out=cumulative[:, 1:])
+        return cumulative[:, self.offsets[1:]] - cumulative[:, self.offsets[:-1]]
+
+    def get_matching_recipes_batch(self, fridges):
+        fridges = [list(fridge_ingredients) for fridge_ingredients in fridges]
+        batch_size = max(1, MAX_BATCH_CELLS // max(1, len(self.entries)))
+        matching_recipes = []
+        for start in range(0, len(fridges), batch_size):
+            covered = self.count_missing(fridges[start:start + batch_size]) == 0
+            for row in covered:
+                matching_recipes.append(self.urls[row].tolist())
+        return matching_recipes
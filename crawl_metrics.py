@@ -0,0 +1,176 @@
+import bisect
+import json
+import os
+import threading
+import time
+
+METRICS_PATH = "crawl_metrics.prom"
+PREFIX = "ispirami_crawl_"
+# upper bounds in seconds; the last bucket (+Inf) catches everything else
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+WRITE_INTERVAL = 5.0
+
+HELP = {
+    "fetch_seconds": "Latency of HTTP GETs, 304 revalidations included",
+    "parse_seconds": "Time to build the soup and extract one recipe page",
+    "store_seconds": "Time to store the raw page and write the extracted recipe",
+    "http_responses_total": "HTTP responses by status code",
+    "bytes_downloaded_total": "Response bytes received over the network",
+    "fetch_retries_total": "Failed fetch attempts that were retried, by error class",
+    "fetch_failures_total": "Fetches abandoned after the last retry, by error class",
+    "selector_fallbacks_total": "Pages where the first selector of a plan missed and a later one hit",
+    "selector_misses_total": "Pages where no selector of a plan matched",
+    "recipes_total": "Recipe links by outcome",
+    "pages_total": "Listing pages completed",
+    "sleep_seconds_total": "Time spent sleeping or waiting on the rate limiter, by reason",
+}
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self):
+        total = 0
+        for count in self.counts:
+            total += count
+            yield total
+
+
+class CrawlMetrics:
+    # Thread-safe counters and histograms for one crawl, keyed by metric name
+    # and a sorted tuple of label pairs. A snapshot is written to `path` at most
+    # every `write_interval` seconds while the crawl runs, as Prometheus text
+    # exposition (for the node_exporter textfile collector) or, when the path
+    # ends in .json, as a JSON document.
+    def __init__(self, path=METRICS_PATH, write_interval=WRITE_INTERVAL):
+        self.path = path
+        self.write_interval = write_interval
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.started = time.time()
+        self.last_write = 0.0
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(value)
+
+    def timer(self, name, **labels):
+        return Timer(self, name, labels)
+
+    def snapshot(self):
+        with self.lock:
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self.counters.items())]
+            histograms = [{"name": name, "labels": dict(labels),
+                           "buckets": dict(zip([str(bound) for bound in histogram.buckets] + ["+Inf"],
+                                               histogram.cumulative_counts())),
+                           "sum": histogram.sum, "count": histogram.count}
+                          for (name, labels), histogram in sorted(self.histograms.items())]
+        return {"started": self.started, "updated": time.time(),
+                "counters": counters, "histograms": histograms}
+
+    def to_prometheus(self):
+        snapshot = self.snapshot()
+        lines = []
+        described = set()
+        for kind, metrics in (("counter", snapshot["counters"]), ("histogram", snapshot["histograms"])):
+            for metric in metrics:
+                name = PREFIX + metric["name"]
+                if name not in described:
+                    described.add(name)
+                    lines.append(f"# HELP {name} {HELP.get(metric['name'], metric['name'])}")
+                    lines.append(f"# TYPE {name} {kind}")
+                if kind == "counter":
+                    lines.append(f"{name}{format_labels(metric['labels'])} {metric['value']}")
+                    continue
+                for bound, count in metric["buckets"].items():
+                    lines.append(f"{name}_bucket{format_labels(metric['labels'], le=bound)} {count}")
+                lines.append(f"{name}_sum{format_labels(metric['labels'])} {metric['sum']}")
+                lines.append(f"{name}_count{format_labels(metric['labels'])} {metric['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write(self):
+        if not self.path:
+            return
+        with self.write_lock:
+            self.write_snapshot()
+
+    def maybe_write(self):
+        if time.monotonic() - self.last_write < self.write_interval:
+            return
+        # another thread already writing is as good as writing now
+        if self.write_lock.acquire(blocking=False):
+            try:
+                if self.path:
+                    self.write_snapshot()
+            finally:
+                self.write_lock.release()
+
+    def write_snapshot(self):
+        if self.path.endswith(".json"):
+            content = json.dumps(self.snapshot(), indent=2)
+        else:
+            content = self.to_prometheus()
+        # readers of the file never see a half-written snapshot
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "w") as file:
+            file.write(content)
+        os.replace(temporary_path, self.path)
+        self.last_write = time.monotonic()
+
+
+class Timer:
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.metrics.observe(self.name, time.perf_counter() - self.start, **self.labels)
+
+
+def format_labels(labels, **extra):
+    pairs = list(labels.items()) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+
+metrics = None
+
+
+def configure_metrics(path=METRICS_PATH, write_interval=WRITE_INTERVAL):
+    global metrics
+    metrics = CrawlMetrics(path, write_interval)
+    return metrics
+
+
+def get_metrics():
+    # one registry per process, shared by the session, the scrapers and the selector plans
+    global metrics
+    if metrics is None:
+        metrics = CrawlMetrics()
+    return metrics
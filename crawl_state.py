@@ -0,0 +1,107 @@
+import sqlite3
+from urllib.parse import urlsplit, urlunsplit
+
+CRAWL_STATE_PATH = "crawl_state.sqlite"
+
+
+def canonicalize_url(url):
+    # scheme and host are case-insensitive; query strings, fragments and a
+    # trailing slash do not identify a different recipe
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, '', ''))
+
+
+class CrawlState:
+    # Persistent crawl progress: completed listing pages, the frontier of
+    # recipe links found on pages not yet completed, and the canonical URLs
+    # already fetched with whether they were saved. It lets a crawl skip known
+    # recipes before any request, retry the ones that failed, and resume after
+    # a crash from the exact page and link where it stopped.
+    def __init__(self, state_path=CRAWL_STATE_PATH):
+        self.conn = sqlite3.connect(state_path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS completed_pages (
+                page_number INTEGER PRIMARY KEY,
+                completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE TABLE IF NOT EXISTS frontier (
+                url TEXT PRIMARY KEY,
+                page_number INTEGER NOT NULL,
+                position INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS seen_urls (
+                url TEXT PRIMARY KEY,
+                saved INTEGER NOT NULL,
+                seen_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_frontier_page ON frontier(page_number);
+        """)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def is_page_completed(self, page_number):
+        return self.conn.execute(
+            "SELECT 1 FROM completed_pages WHERE page_number = ?", (page_number,)).fetchone() is not None
+
+    def complete_page(self, page_number):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO completed_pages (page_number) VALUES (?)", (page_number,))
+            self.conn.execute("DELETE FROM frontier WHERE page_number = ?", (page_number,))
+
+    def reset_pages(self):
+        # forget page progress (not the seen URLs) so a new crawl walks the listing again
+        with self.conn:
+            self.conn.execute("DELETE FROM completed_pages")
+            self.conn.execute("DELETE FROM frontier")
+
+    def add_to_frontier(self, page_number, links):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO frontier (url, page_number, position) VALUES (?, ?, ?)",
+                [(link, page_number, position) for position, link in enumerate(links)])
+
+    def get_frontier(self, page_number):
+        rows = self.conn.execute(
+            "SELECT url FROM frontier WHERE page_number = ? ORDER BY position", (page_number,)).fetchall()
+        return [row[0] for row in rows]
+
+    def remove_from_frontier(self, url):
+        with self.conn:
+            self.conn.execute("DELETE FROM frontier WHERE url = ?", (url,))
+
+    def is_seen(self, url):
+        # only saved recipes count, so failed or unparsed pages are fetched again
+        return self.conn.execute(
+            "SELECT 1 FROM seen_urls WHERE url = ? AND saved = 1", (canonicalize_url(url),)).fetchone() is not None
+
+    def mark_seen(self, url, saved=True):
+        # a recipe saved once stays saved when a later fetch of it fails
+        with self.conn:
+            self.conn.execute("""
+                INSERT INTO seen_urls (url, saved) VALUES (?, ?)
+                ON CONFLICT (url) DO UPDATE SET saved = MAX(saved, excluded.saved), seen_at = CURRENT_TIMESTAMP
+            """, (canonicalize_url(url), int(saved)))
+            self.conn.execute("DELETE FROM frontier WHERE url = ?", (url,))
+
+    def seed_seen(self, urls):
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO seen_urls (url, saved) VALUES (?, 1)",
+                                  [(canonicalize_url(url),) for url in urls])
+
+    def count_seen(self):
+        return self.conn.execute("SELECT COUNT(*) FROM seen_urls").fetchone()[0]
+
+    def get_meta(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Parallel Database Loader for Ispirami
+
+Splits the recipe files in Recipes/ across worker processes. Each worker
+parses its files on its own connection and streams them with COPY into its
+own staging tables, committing every chunk. A single merge step then
+deduplicates ingredient names and writes recipes and recipe_ingredients
+links with set-based statements. IDs are assigned in order of first
+appearance in the sorted file list, so they do not depend on worker timing.
+
+Usage:
+    python3 database_setup.py --workers 4
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import psycopg2
+
+import database_setup
+from database_setup import NUMERIC_PATTERN, DatabaseSetup, copy_rows
+from recipe_store import list_recipe_files, read_recipe_file
+
+# Recipes copied per worker transaction
+CHUNK_SIZE = 2000
+
+
+def split_files(recipes_dir: str, file_names: List[str], n_workers: int) -> List[List[Tuple[int, str]]]:
+    """Split the sorted file list into contiguous slices of similar size on disk"""
+    sizes = [os.path.getsize(os.path.join(recipes_dir, file_name)) for file_name in file_names]
+    target = sum(sizes) / n_workers if n_workers else 0
+    slices = [[]]
+    filled = 0
+    for file_index, (file_name, size) in enumerate(zip(file_names, sizes)):
+        if filled >= target and len(slices) < n_workers:
+            slices.append([])
+            filled = 0
+        slices[-1].append((file_index, file_name))
+        filled += size
+    return [files for files in slices if files]
+
+
+def staging_tables(worker_number: int) -> Tuple[str, str]:
+    return f"staging_recipes_{worker_number}", f"staging_links_{worker_number}"
+
+
+def load_files(worker_number: int, recipes_dir: str, files: List[Tuple[int, str]],
+               config: Dict[str, Any], chunk_size: int = CHUNK_SIZE) -> Dict[str, Any]:
+    """Worker: stage the recipes of a slice of files, committing every chunk"""
+    recipes_table, links_table = staging_tables(worker_number)
+    # only the cleaning helpers are used, the worker has its own connection
+    helpers = DatabaseSetup()
+    conn = psycopg2.connect(**config)
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        DROP TABLE IF EXISTS {recipes_table}, {links_table};
+        CREATE UNLOGGED TABLE {recipes_table} (
+            file_index INTEGER,
+            line INTEGER,
+            url TEXT,
+            title TEXT,
+            category TEXT,
+            n_people TEXT
+        );
+        CREATE UNLOGGED TABLE {links_table} (
+            file_index INTEGER,
+            line INTEGER,
+            link INTEGER,
+            url TEXT,
+            name TEXT,
+            quantity TEXT,
+            unit TEXT
+        );
+    """)
+    conn.commit()
+
+    recipe_rows = []
+    link_rows = []
+    n_recipes = 0
+    n_links = 0
+    failed_files = []
+
+    def flush():
+        copy_rows(cursor, recipes_table, ['file_index', 'line', 'url', 'title', 'category', 'n_people'],
+                  recipe_rows)
+        copy_rows(cursor, links_table, ['file_index', 'line', 'link', 'url', 'name', 'quantity', 'unit'],
+                  link_rows)
+        conn.commit()
+        recipe_rows.clear()
+        link_rows.clear()
+
+    try:
+        for file_index, file_name in files:
+            try:
+                recipes = list(read_recipe_file(os.path.join(recipes_dir, file_name)))
+            except Exception as e:
+                print(f"  ❌ Error parsing {file_name}: {e}")
+                failed_files.append(file_name)
+                continue
+            for line, recipe_data in enumerate(recipes):
+                url = recipe_data.get('url', '')
+                recipe_rows.append((file_index, line, url, recipe_data.get('title', ''),
+                                    recipe_data.get('category', ''), recipe_data.get('n_people', '')))
+                for link, ingredient_data in enumerate(recipe_data.get('ingredients', [])):
+                    if isinstance(ingredient_data, list) and len(ingredient_data) > 0:
+                        quantity, unit = helpers.parse_ingredient_quantity(ingredient_data)
+                        cleaned_name = helpers.clean_ingredient_name(ingredient_data[0])
+                        link_rows.append((file_index, line, link, url, cleaned_name, quantity, unit))
+                        n_links += 1
+                n_recipes += 1
+                if len(recipe_rows) >= chunk_size:
+                    flush()
+        if recipe_rows:
+            flush()
+    finally:
+        cursor.close()
+        conn.close()
+    return {'worker': worker_number, 'recipes': n_recipes, 'links': n_links, 'failed_files': failed_files}
+
+
+class ParallelDatabaseLoader:
+    def __init__(self, recipes_dir: str = "Recipes", n_workers: Optional[int] = None,
+                 config: Optional[Dict[str, Any]] = None, chunk_size: int = CHUNK_SIZE):
+        self.recipes_dir = recipes_dir
+        self.n_workers = n_workers or os.cpu_count()
+        self.config = config or database_setup.DB_CONFIG
+        self.chunk_size = chunk_size
+
+    def load(self) -> Dict[str, int]:
+        """Stage the recipe files in parallel, then merge them into the schema"""
+        if not os.path.exists(self.recipes_dir):
+            print(f"⚠️  Recipes directory '{self.recipes_dir}' not found")
+            return {'recipes': 0, 'links': 0}
+
+        file_names = list_recipe_files(self.recipes_dir)
+        slices = split_files(self.recipes_dir, file_names, self.n_workers)
+        print(f"🍳 Loading recipes from {len(file_names)} files in {self.recipes_dir}/ "
+              f"with {len(slices)} workers...")
+
+        start = time.perf_counter()
+        # leftovers of an interrupted load must not be merged
+        self.drop_staging_tables()
+        results = []
+        failed_workers = []
+        with ProcessPoolExecutor(max_workers=len(slices) or 1) as executor:
+            futures = [executor.submit(load_files, worker_number, self.recipes_dir, files,
+                                       self.config, self.chunk_size)
+                       for worker_number, files in enumerate(slices)]
+            for worker_number, future in enumerate(futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    # the chunks this worker committed are still merged
+                    print(f"  ❌ Worker {worker_number} failed: {e}")
+                    failed_workers.append(worker_number)
+        staged = time.perf_counter() - start
+        n_recipes = sum(result['recipes'] for result in results)
+        n_links = sum(result['links'] for result in results)
+        print(f"  📊 Staged {n_recipes} recipes, {n_links} ingredients in {staged:.2f}s")
+
+        self.merge(len(slices))
+        elapsed = time.perf_counter() - start
+        rows = n_recipes + n_links
+        rate = rows / elapsed if elapsed else 0.0
+        failed_files = [file_name for result in results for file_name in result['failed_files']]
+        if failed_files:
+            print(f"⚠️  Skipped {len(failed_files)} unreadable files: {', '.join(failed_files)}")
+        if failed_workers:
+            print(f"⚠️  Incomplete load, workers {failed_workers} failed")
+        print(f"✅ Recipes loaded: {n_recipes} recipes, {n_links} ingredients "
+              f"in {elapsed:.2f}s ({rate:,.0f} rows/s)")
+        return {'recipes': n_recipes, 'links': n_links}
+
+    def drop_staging_tables(self):
+        """Drop the staging tables of every worker, whatever the worker count of the load that left them"""
+        conn = psycopg2.connect(**self.config)
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT tablename FROM pg_tables
+                    WHERE schemaname = current_schema()
+                    AND tablename ~ '^staging_(recipes|links)_[0-9]+$'
+                """)
+                for (table,) in cursor.fetchall():
+                    cursor.execute(f"DROP TABLE IF EXISTS {table}")
+            conn.commit()
+        finally:
+            conn.close()
+
+    def merge(self, n_workers: int):
+        """Move every worker's staging tables into the schema in one transaction"""
+        tables = [staging_tables(worker_number) for worker_number in range(n_workers)]
+        existing = []
+        conn = psycopg2.connect(**self.config)
+        cursor = conn.cursor()
+        try:
+            for recipes_table, links_table in tables:
+                cursor.execute("SELECT to_regclass(%s) IS NOT NULL AND to_regclass(%s) IS NOT NULL",
+                               (recipes_table, links_table))
+                if cursor.fetchone()[0]:
+                    existing.append((recipes_table, links_table))
+            if not existing:
+                return
+            all_recipes = " UNION ALL ".join(f"SELECT * FROM {recipes_table}" for recipes_table, _ in existing)
+            all_links = " UNION ALL ".join(f"SELECT * FROM {links_table}" for _, links_table in existing)
+            cursor.execute(f"""
+                CREATE TEMP VIEW merged_recipes AS {all_recipes};
+                CREATE TEMP VIEW merged_links AS {all_links};
+            """)
+
+            # New ingredient names get their IDs in order of first appearance; text
+            # longer than its VARCHAR column is cut to fit, as in DatabaseSetup.load_batch
+            cursor.execute("""
+                INSERT INTO ingredients (name)
+                SELECT name FROM (
+                    SELECT DISTINCT ON (LEFT(name, 255)) LEFT(name, 255) AS name, file_index, line, link
+                    FROM merged_links
+                    ORDER BY LEFT(name, 255), file_index, line, link
+                ) first_seen
+                ORDER BY file_index, line, link
+                ON CONFLICT (name) DO NOTHING
+            """)
+            # The last occurrence of a url provides its fields, as with the sequential
+            # loaders, while new recipes get their IDs in order of first appearance
+            cursor.execute("""
+                INSERT INTO recipes (title, category, url, n_people)
+                SELECT LEFT(last_seen.title, 255), last_seen.category, last_seen.url, LEFT(last_seen.n_people, 50)
+                FROM (
+                    SELECT DISTINCT ON (url) title, category, url, n_people
+                    FROM merged_recipes
+                    ORDER BY url, file_index DESC, line DESC
+                ) last_seen
+                JOIN (
+                    SELECT DISTINCT ON (url) url, file_index, line
+                    FROM merged_recipes
+                    ORDER BY url, file_index, line
+                ) first_seen ON first_seen.url = last_seen.url
+                ORDER BY first_seen.file_index, first_seen.line
+                ON CONFLICT (url) DO UPDATE SET
+                    title = EXCLUDED.title,
+                    category = EXCLUDED.category,
+                    n_people = EXCLUDED.n_people
+            """)
+            cursor.execute("""
+                INSERT INTO recipe_ingredients (recipe_id, ingredient_id, quantity, unit, notes)
+                SELECT DISTINCT ON (r.id, i.id)
+                    r.id, i.id,
+                    CASE WHEN s.quantity ~ %(numeric)s THEN s.quantity::DECIMAL(10,2) END,
+                    LEFT(s.unit, 50), NULL
+                FROM merged_links s
+                JOIN recipes r ON r.url = s.url
+                JOIN ingredients i ON i.name = LEFT(s.name, 255)
+                ORDER BY r.id, i.id, s.file_index DESC, s.line DESC, s.link DESC
+                ON CONFLICT (recipe_id, ingredient_id) DO UPDATE SET
+                    quantity = EXCLUDED.quantity,
+                    unit = EXCLUDED.unit,
+                    notes = EXCLUDED.notes
+            """, {'numeric': NUMERIC_PATTERN})
+            cursor.execute("""
+                UPDATE ingredients i SET
+                    quantity = s.quantity,
+                    unit = s.unit
+                FROM (
+                    SELECT DISTINCT ON (LEFT(name, 255)) LEFT(name, 255) AS name,
+                        CASE WHEN quantity ~ %(numeric)s THEN quantity::DECIMAL(10,2) END AS quantity,
+                        LEFT(unit, 50) AS unit
+                    FROM merged_links
+                    ORDER BY LEFT(name, 255), file_index DESC, line DESC, link DESC
+                ) s
+                WHERE i.name = s.name
+            """, {'numeric': NUMERIC_PATTERN})
+            cursor.execute("DROP VIEW merged_recipes, merged_links")
+            for recipes_table, links_table in existing:
+                cursor.execute(f"DROP TABLE {recipes_table}, {links_table}")
+            conn.commit()
+        except psycopg2.Error as e:
+            print(f"❌ Error merging staged recipes: {e}")
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+            conn.close()
+
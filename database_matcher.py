@@ -6,32 +6,81 @@ This module provides the same functionality as the original matcher.py
 but uses PostgreSQL database queries instead of JSON files.
 """
 
+import json
 import psycopg2
-from psycopg2.extras import RealDictCursor
 from database_config import get_db_config
-from typing import List, Dict, Any
+from database_pool import get_pool
+from ingredient_normalizer import normalize_ingredient
+from ingredient_ontology import load_ontology
+from typing import List, Dict, Any, Optional
+
+FRIDGE_PATH = "fridge.json"
+
+# A fridge name covers every ingredient whose name contains it or is contained
+# in it (as in matcher.py), plus the names it satisfies through the ontology.
+# Only the ingredient vocabulary is scanned here.
+AVAILABLE_QUERY = """
+    SELECT COALESCE(array_agg(i.id ORDER BY i.id), '{}') AS ids
+    FROM ingredients i
+    WHERE i.name = ANY(%(exact)s::TEXT[])
+    OR EXISTS (
+        SELECT 1 FROM unnest(%(fridge)s::TEXT[]) AS f(name)
+        WHERE strpos(i.name, f.name) > 0 OR strpos(f.name, i.name) > 0
+    )
+"""
+
+# Fridge matching over the whole catalog in one statement. Links to available
+# ingredients are counted per recipe with an index-only scan of
+# idx_recipe_ingredients_ingredient_recipe and compared with the precomputed
+# recipes.n_ingredients; recipes without any available ingredient can only
+# qualify when they are small enough, which idx_recipes_n_ingredients answers.
+# The ingredient IDs are passed as an array rather than joined from the lookup
+# above, so the planner knows how many there are and picks the index.
+MATCHING_QUERY = """
+    WITH matched AS (
+        SELECT ri.recipe_id, COUNT(*) AS n_available
+        FROM recipe_ingredients ri
+        WHERE ri.ingredient_id = ANY(%(ingredient_ids)s::INTEGER[])
+        GROUP BY ri.recipe_id
+    )
+    SELECT r.id, r.title, r.url, r.n_ingredients - m.n_available AS missing
+    FROM matched m
+    JOIN recipes r ON r.id = m.recipe_id
+    WHERE r.n_ingredients - m.n_available <= %(max_missing)s
+    UNION ALL
+    SELECT r.id, r.title, r.url, r.n_ingredients AS missing
+    FROM recipes r
+    WHERE r.n_ingredients <= %(max_missing)s
+    AND NOT EXISTS (SELECT 1 FROM matched m WHERE m.recipe_id = r.id)
+    ORDER BY missing, title, id
+"""
+
+
+def load_fridge(fridge_path: str = FRIDGE_PATH) -> Dict[str, str]:
+    """Load the available ingredients, as in matcher.py"""
+    with open(fridge_path, "r") as file:
+        return json.load(file)
+
 
 class DatabaseMatcher:
     def __init__(self, environment='default'):
         self.config = get_db_config(environment)
-        self.conn = None
-        self.cursor = None
+        # every query borrows its own connection, so one matcher can serve many threads
+        self.pool = None
+        # substitutions such as parmigiano -> formaggio grattugiato, when the ontology file exists
+        self.ontology = load_ontology()
     
     def connect(self):
-        """Establish database connection"""
+        """Attach to the shared connection pool of this environment"""
         try:
-            self.conn = psycopg2.connect(**self.config)
-            self.cursor = self.conn.cursor(cursor_factory=RealDictCursor)
+            self.pool = get_pool(self.config)
         except psycopg2.Error as e:
             print(f"❌ Error connecting to database: {e}")
             raise
     
     def disconnect(self):
-        """Close database connection"""
-        if self.cursor:
-            self.cursor.close()
-        if self.conn:
-            self.conn.close()
+        """Detach from the pool, whose connections stay open for other users"""
+        self.pool = None
     
     def get_all_recipes(self) -> List[str]:
         """
@@ -41,18 +90,73 @@ class DatabaseMatcher:
             List[str]: List of all recipe URLs
         """
         try:
-            self.cursor.execute("""
-                SELECT url FROM recipes
-                ORDER BY title
-            """)
+            with self.pool.cursor() as cursor:
+                cursor.execute("""
+                    SELECT url FROM recipes
+                    ORDER BY title
+                """)
             
-            results = self.cursor.fetchall()
-            return [row['url'] for row in results]
+                results = cursor.fetchall()
+                return [row['url'] for row in results]
             
         except psycopg2.Error as e:
             print(f"❌ Error getting recipes: {e}")
             return []
     
+    def get_available_ingredient_ids(self, fridge) -> List[int]:
+        """
+        Get the IDs of the ingredients the fridge covers.
+        
+        Args:
+            fridge: Available ingredient names (a fridge.json dict or any iterable)
+            
+        Returns:
+            List[int]: Ingredient IDs
+        """
+        fridge_names = sorted({normalize_ingredient(name) for name in fridge})
+        exact_names = set()
+        if self.ontology:
+            for name in fridge_names:
+                exact_names.update(self.ontology.get_satisfied(name))
+        with self.pool.cursor() as cursor:
+            cursor.execute(AVAILABLE_QUERY, {'fridge': fridge_names, 'exact': sorted(exact_names)})
+            return cursor.fetchone()['ids']
+    
+    def matching_parameters(self, fridge, max_missing: int = 0) -> Dict[str, Any]:
+        """
+        Build the parameters of MATCHING_QUERY for a fridge.
+        
+        Args:
+            fridge: Available ingredient names (a fridge.json dict or any iterable)
+            max_missing (int): Recipe ingredients that may be missing
+            
+        Returns:
+            Dict: Query parameters
+        """
+        return {'ingredient_ids': self.get_available_ingredient_ids(fridge), 'max_missing': max_missing}
+    
+    def get_matching_recipes(self, fridge, max_missing: int = 0) -> List[Dict[str, Any]]:
+        """
+        Get the recipes that can be made with the fridge, matched inside the database
+        instead of fetching every recipe to match in Python.
+        
+        Args:
+            fridge: Available ingredient names (a fridge.json dict or any iterable)
+            max_missing (int): Recipe ingredients that may be missing, 0 for full matches
+            
+        Returns:
+            List[Dict]: Recipes (id, title, url, missing), fewest missing ingredients first
+        """
+        try:
+            parameters = self.matching_parameters(fridge, max_missing)
+            with self.pool.cursor() as cursor:
+                cursor.execute(MATCHING_QUERY, parameters)
+                return cursor.fetchall()
+            
+        except psycopg2.Error as e:
+            print(f"❌ Error matching recipes: {e}")
+            return []
+    
     def get_all_recipes_detailed(self) -> List[Dict[str, Any]]:
         """
         Get detailed information about all recipes.
@@ -61,13 +165,14 @@ class DatabaseMatcher:
             List[Dict]: List of recipe dictionaries with full details
         """
         try:
-            self.cursor.execute("""
-                SELECT id, title, category, url, n_people
-                FROM recipes
-                ORDER BY title
-            """)
+            with self.pool.cursor() as cursor:
+                cursor.execute("""
+                    SELECT id, title, category, url, n_people
+                    FROM recipes
+                    ORDER BY title
+                """)
             
-            return self.cursor.fetchall()
+                return cursor.fetchall()
             
         except psycopg2.Error as e:
             print(f"❌ Error getting detailed recipes: {e}")
@@ -84,15 +189,16 @@ class DatabaseMatcher:
             List[Dict]: List of ingredient dictionaries
         """
         try:
-            self.cursor.execute("""
-                SELECT i.name, ri.quantity, ri.unit
-                FROM recipe_ingredients ri
-                JOIN ingredients i ON ri.ingredient_id = i.id
-                WHERE ri.recipe_id = %s
-                ORDER BY i.name
-            """, (recipe_id,))
+            with self.pool.cursor() as cursor:
+                cursor.execute("""
+                    SELECT i.name, ri.quantity, ri.unit
+                    FROM recipe_ingredients ri
+                    JOIN ingredients i ON ri.ingredient_id = i.id
+                    WHERE ri.recipe_id = %s
+                    ORDER BY i.name
+                """, (recipe_id,))
             
-            return self.cursor.fetchall()
+                return cursor.fetchall()
             
         except psycopg2.Error as e:
             print(f"❌ Error getting recipe ingredients: {e}")
@@ -109,16 +215,17 @@ class DatabaseMatcher:
             List[Dict]: List of recipe dictionaries
         """
         try:
-            self.cursor.execute("""
-                SELECT DISTINCT r.id, r.title, r.category, r.url, r.n_people
-                FROM recipes r
-                JOIN recipe_ingredients ri ON r.id = ri.recipe_id
-                JOIN ingredients i ON ri.ingredient_id = i.id
-                WHERE LOWER(i.name) LIKE LOWER(%s)
-                ORDER BY r.title
-            """, (f'%{ingredient_name}%',))
+            with self.pool.cursor() as cursor:
+                cursor.execute("""
+                    SELECT DISTINCT r.id, r.title, r.category, r.url, r.n_people
+                    FROM recipes r
+                    JOIN recipe_ingredients ri ON r.id = ri.recipe_id
+                    JOIN ingredients i ON ri.ingredient_id = i.id
+                    WHERE LOWER(i.name) LIKE LOWER(%s)
+                    ORDER BY r.title
+                """, (f'%{ingredient_name}%',))
             
-            return self.cursor.fetchall()
+                return cursor.fetchall()
             
         except psycopg2.Error as e:
             print(f"❌ Error searching recipes: {e}")
@@ -135,15 +242,16 @@ class DatabaseMatcher:
             Dict: Recipe dictionary or None if not found
         """
         try:
-            self.cursor.execute("""
-                SELECT id, title, category, url, n_people
-                FROM recipes
-                WHERE url = %s
-            """, (url,))
+            with self.pool.cursor() as cursor:
+                cursor.execute("""
+                    SELECT id, title, category, url, n_people
+                    FROM recipes
+                    WHERE url = %s
+                """, (url,))
             
-            result = self.cursor.fetchone()
+                result = cursor.fetchone()
             if result:
-                # Get ingredients for this recipe
+                # Get ingredients for this recipe, once the connection is returned
                 ingredients = self.get_recipe_ingredients(result['id'])
                 result['ingredients'] = ingredients
             
@@ -161,13 +269,14 @@ class DatabaseMatcher:
             List[Dict]: List of ingredient dictionaries
         """
         try:
-            self.cursor.execute("""
-                SELECT name, quantity, unit
-                FROM ingredients
-                ORDER BY name
-            """)
+            with self.pool.cursor() as cursor:
+                cursor.execute("""
+                    SELECT name, quantity, unit
+                    FROM ingredients
+                    ORDER BY name
+                """)
             
-            return self.cursor.fetchall()
+                return cursor.fetchall()
             
         except psycopg2.Error as e:
             print(f"❌ Error getting ingredients: {e}")
@@ -185,19 +294,18 @@ class DatabaseMatcher:
             unit (str): Unit of measurement
         """
         try:
-            self.cursor.execute("""
-                INSERT INTO ingredients (name, quantity, unit)
-                VALUES (%s, %s, %s)
-                ON CONFLICT (name) DO UPDATE SET
-                    quantity = EXCLUDED.quantity,
-                    unit = EXCLUDED.unit
-            """, (name.lower(), quantity, unit))
+            with self.pool.cursor() as cursor:
+                cursor.execute("""
+                    INSERT INTO ingredients (name, quantity, unit)
+                    VALUES (%s, %s, %s)
+                    ON CONFLICT (name) DO UPDATE SET
+                        quantity = EXCLUDED.quantity,
+                        unit = EXCLUDED.unit
+                """, (name.lower(), quantity, unit))
             
-            self.conn.commit()
             
         except psycopg2.Error as e:
             print(f"❌ Error adding ingredient: {e}")
-            self.conn.rollback()
     
     def get_statistics(self) -> Dict[str, int]:
         """
@@ -207,45 +315,51 @@ class DatabaseMatcher:
             Dict: Statistics dictionary
         """
         try:
-            # Total recipes
-            self.cursor.execute("SELECT COUNT(*) as count FROM recipes")
-            total_recipes = self.cursor.fetchone()['count']
+            with self.pool.cursor() as cursor:
+                # Total recipes
+                cursor.execute("SELECT COUNT(*) as count FROM recipes")
+                total_recipes = cursor.fetchone()['count']
             
-            # Total ingredients
-            self.cursor.execute("SELECT COUNT(*) as count FROM ingredients")
-            total_ingredients = self.cursor.fetchone()['count']
+                # Total ingredients
+                cursor.execute("SELECT COUNT(*) as count FROM ingredients")
+                total_ingredients = cursor.fetchone()['count']
             
-            # Unique ingredients used in recipes
-            self.cursor.execute("SELECT COUNT(DISTINCT ingredient_id) as count FROM recipe_ingredients")
-            unique_ingredients = self.cursor.fetchone()['count']
+                # Unique ingredients used in recipes
+                cursor.execute("SELECT COUNT(DISTINCT ingredient_id) as count FROM recipe_ingredients")
+                unique_ingredients = cursor.fetchone()['count']
             
-            return {
-                'total_recipes': total_recipes,
-                'total_ingredients': total_ingredients,
-                'unique_ingredients': unique_ingredients
-            }
+                return {
+                    'total_recipes': total_recipes,
+                    'total_ingredients': total_ingredients,
+                    'unique_ingredients': unique_ingredients
+                }
             
         except psycopg2.Error as e:
             print(f"❌ Error getting statistics: {e}")
             return {}
 
-def print_recipes(matcher: DatabaseMatcher):
+def print_recipes(matcher: DatabaseMatcher, fridge: Optional[Dict[str, str]] = None, max_missing: int = 0):
     """
-    Print all recipes in a formatted way.
+    Print the recipes matching the fridge in a formatted way.
     
     Args:
         matcher (DatabaseMatcher): Database matcher instance
+        fridge (Dict): Available ingredients, fridge.json by default
+        max_missing (int): Recipe ingredients that may be missing
     """
     try:
         matcher.connect()
         
-        recipe_urls = matcher.get_all_recipes()
+        if fridge is None:
+            fridge = load_fridge()
+        recipes = matcher.get_matching_recipes(fridge, max_missing)
         
-        if recipe_urls:
-            print(f"Found {len(recipe_urls)} recipes.")
-            print("Recipes:")
-            for url in recipe_urls:
-                print(f"  - {url}")
+        if recipes:
+            print("Matching recipes:")
+            for recipe in recipes:
+                missing = f" (missing: {recipe['missing']})" if recipe['missing'] else ""
+                print(f"  - {recipe['url']}{missing}")
+            print(f"Found {len(recipes)} matching recipes.")
         else:
             print("No recipes found.")
             
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Shared PostgreSQL Connection Pool for Ispirami
+
+One thread-safe pool per database configuration, shared by DatabaseSetup,
+DatabaseQueries and DatabaseMatcher. Its size comes from POOL_CONFIG in
+database_config.py: `minconn` connections are opened up front and kept open
+between borrows, more are opened on demand up to `maxconn` and closed when
+returned. Once `maxconn` connections are borrowed, further borrowers wait
+for one to be returned instead of opening new ones.
+
+Usage:
+    from database_pool import get_pool
+
+    with get_pool().cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) AS count FROM recipes")
+"""
+
+import atexit
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+import psycopg2
+from psycopg2 import pool
+from psycopg2.extras import RealDictCursor
+
+from database_config import DB_CONFIG, POOL_CONFIG
+
+# Connections idle for longer are pinged before being handed out
+HEALTH_CHECK_INTERVAL = 30.0
+# Seconds a borrower waits for a connection when all of them are in use
+BORROW_TIMEOUT = 30.0
+
+
+class DatabasePool:
+    def __init__(self, config: Dict[str, Any], minconn: int = POOL_CONFIG['minconn'],
+                 maxconn: int = POOL_CONFIG['maxconn'],
+                 health_check_interval: float = HEALTH_CHECK_INTERVAL,
+                 timeout: float = BORROW_TIMEOUT):
+        self.config = config
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.health_check_interval = health_check_interval
+        self.timeout = timeout
+        self.pool = pool.ThreadedConnectionPool(minconn, maxconn, **config)
+        # ThreadedConnectionPool raises when exhausted, borrowers queue here
+        # instead; a counter rather than a semaphore, so resize() can change maxconn
+        self.n_borrowed = 0
+        self.slots_available = threading.Condition()
+        self.lock = threading.Lock()
+        # id(connection) -> time it was last returned
+        self.returned_at: Dict[int, float] = {}
+
+    def getconn(self, timeout: Optional[float] = None):
+        """
+        Borrow a healthy connection, waiting while all of them are in use.
+
+        Args:
+            timeout (float): Seconds to wait, the pool's timeout by default
+
+        Returns:
+            connection: A psycopg2 connection, to give back with putconn
+        """
+        timeout = self.timeout if timeout is None else timeout
+        with self.slots_available:
+            if not self.slots_available.wait_for(lambda: self.n_borrowed < self.maxconn, timeout):
+                raise pool.PoolError(f"no connection available after {timeout:g}s ({self.maxconn} in use)")
+            self.n_borrowed += 1
+        try:
+            # a dead connection is replaced; each attempt opens a fresh one once the idle ones are used up
+            for _ in range(self.maxconn + 1):
+                conn = self.pool.getconn()
+                if self.is_healthy(conn):
+                    return conn
+                self.pool.putconn(conn, close=True)
+            raise pool.PoolError("could not get a healthy connection")
+        except Exception:
+            self.release_slot()
+            raise
+
+    def is_healthy(self, conn) -> bool:
+        """Check a connection that was closed or idle for too long"""
+        if conn.closed:
+            return False
+        with self.lock:
+            returned_at = self.returned_at.get(id(conn))
+        if returned_at is None or time.monotonic() - returned_at < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            return False
+
+    def putconn(self, conn, close: bool = False):
+        """
+        Give a borrowed connection back to the pool.
+
+        Args:
+            conn: Connection obtained with getconn
+            close (bool): Discard the connection instead of keeping it open
+        """
+        try:
+            if not close and not conn.closed:
+                # the next borrower starts from a clean session state; a connection
+                # that cannot even roll back is broken
+                try:
+                    conn.rollback()
+                    conn.autocommit = False
+                except psycopg2.Error:
+                    close = True
+            with self.lock:
+                if close or conn.closed:
+                    self.returned_at.pop(id(conn), None)
+                else:
+                    self.returned_at[id(conn)] = time.monotonic()
+            if self.pool.closed:
+                # borrowed before close_pools ran at exit
+                conn.close()
+            else:
+                self.pool.putconn(conn, close=close)
+        finally:
+            self.release_slot()
+
+    def release_slot(self):
+        with self.slots_available:
+            self.n_borrowed -= 1
+            self.slots_available.notify()
+
+    def resize(self, minconn: Optional[int] = None, maxconn: Optional[int] = None,
+               health_check_interval: Optional[float] = None, timeout: Optional[float] = None):
+        """
+        Change the pool settings in place, leaving borrowed connections alone.
+
+        When maxconn shrinks, new borrowers wait until enough connections are
+        returned; idle connections beyond a smaller minconn are closed as they
+        are borrowed and returned.
+
+        Args:
+            minconn (int): Connections kept open between borrows
+            maxconn (int): Connections open at most
+            health_check_interval (float): Idle seconds before a connection is pinged
+            timeout (float): Default seconds a borrower waits
+        """
+        with self.slots_available:
+            if minconn is not None:
+                self.minconn = self.pool.minconn = minconn
+            if maxconn is not None:
+                self.maxconn = self.pool.maxconn = maxconn
+            if health_check_interval is not None:
+                self.health_check_interval = health_check_interval
+            if timeout is not None:
+                self.timeout = timeout
+            self.slots_available.notify_all()
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """Borrow a connection; commit on success, roll back on error, then return it"""
+        conn = self.getconn()
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            # putconn rolls back what is left, or discards a broken connection
+            self.putconn(conn)
+
+    @contextmanager
+    def cursor(self, cursor_factory=RealDictCursor) -> Iterator[Any]:
+        """Borrow a connection and open a cursor on it, as with connection()"""
+        with self.connection() as conn:
+            with conn.cursor(cursor_factory=cursor_factory) as cursor:
+                yield cursor
+
+    def close(self):
+        """Close every connection of the pool, borrowed ones included"""
+        if not self.pool.closed:
+            self.pool.closeall()
+
+
+pools: Dict[tuple, DatabasePool] = {}
+pools_lock = threading.Lock()
+
+
+def pool_key(config: Dict[str, Any]) -> tuple:
+    return tuple(sorted(config.items()))
+
+
+def configure_pool(config: Optional[Dict[str, Any]] = None, **options) -> DatabasePool:
+    """
+    Create the shared pool of a database configuration, or resize it in place.
+
+    The pool object is kept when it already exists, so the instances holding
+    it and the connections they borrowed stay valid.
+
+    Args:
+        config (Dict): Connection settings, DB_CONFIG by default
+        **options: minconn, maxconn, health_check_interval or timeout
+
+    Returns:
+        DatabasePool: The shared pool
+    """
+    config = config or DB_CONFIG
+    key = pool_key(config)
+    with pools_lock:
+        if key in pools:
+            pools[key].resize(**options)
+        else:
+            pools[key] = DatabasePool(config, **options)
+        return pools[key]
+
+
+def get_pool(config: Optional[Dict[str, Any]] = None) -> DatabasePool:
+    """
+    Get the shared pool of a database configuration, creating it on first use.
+
+    Args:
+        config (Dict): Connection settings, DB_CONFIG by default
+
+    Returns:
+        DatabasePool: One pool per process and configuration
+    """
+    config = config or DB_CONFIG
+    key = pool_key(config)
+    with pools_lock:
+        if key not in pools:
+            pools[key] = DatabasePool(config)
+        return pools[key]
+
+
+@atexit.register
+def close_pools():
+    """Close every shared pool"""
+    with pools_lock:
+        for database_pool in pools.values():
+            database_pool.close()
+        pools.clear()
@@ -6,44 +6,41 @@ This script provides common queries to explore and test the database.
 """
 
 import psycopg2
-from psycopg2.extras import RealDictCursor
 from database_config import get_db_config
-import sys
+from database_pool import get_pool
 
 class DatabaseQueries:
     def __init__(self, environment='default'):
         self.config = get_db_config(environment)
-        self.conn = None
-        self.cursor = None
+        # every query borrows its own connection, so one instance can serve many threads
+        self.pool = None
     
     def connect(self):
-        """Establish database connection"""
+        """Attach to the shared connection pool of this environment"""
         try:
-            self.conn = psycopg2.connect(**self.config)
-            self.cursor = self.conn.cursor(cursor_factory=RealDictCursor)
+            self.pool = get_pool(self.config)
             print("✅ Connected to database successfully")
         except psycopg2.Error as e:
             print(f"❌ Error connecting to database: {e}")
-            sys.exit(1)
+            raise
     
     def disconnect(self):
-        """Close database connection"""
-        if self.cursor:
-            self.cursor.close()
-        if self.conn:
-            self.conn.close()
-            print("✅ Database connection closed")
+        """Detach from the pool, whose connections stay open for other users"""
+        if self.pool:
+            self.pool = None
+            print("✅ Database connection returned to the pool")
     
     def get_all_recipes(self):
         """Get all recipes in the database"""
         try:
-            self.cursor.execute("""
-                SELECT r.title, r.category, r.url, r.n_people
-                FROM recipes r
-                ORDER BY r.title
-            """)
+            with self.pool.cursor() as cursor:
+                cursor.execute("""
+                    SELECT r.title, r.category, r.url, r.n_people
+                    FROM recipes r
+                    ORDER BY r.title
+                """)
+                recipes = cursor.fetchall()
             
-            recipes = self.cursor.fetchall()
             print(f"\n📖 All Recipes ({len(recipes)} found):")
             for recipe in recipes:
                 print(f"  📖 {recipe['title']}")
@@ -61,28 +58,32 @@ class DatabaseQueries:
         """Get ingredients for a specific recipe"""
         try:
             if recipe_id:
-                self.cursor.execute("""
+                query = """
                     SELECT r.title, i.name, ri.quantity, ri.unit
                     FROM recipes r
                     JOIN recipe_ingredients ri ON r.id = ri.recipe_id
                     JOIN ingredients i ON ri.ingredient_id = i.id
                     WHERE r.id = %s
                     ORDER BY i.name
-                """, (recipe_id,))
+                """
+                parameters = (recipe_id,)
             elif recipe_title:
-                self.cursor.execute("""
+                query = """
                     SELECT r.title, i.name, ri.quantity, ri.unit
                     FROM recipes r
                     JOIN recipe_ingredients ri ON r.id = ri.recipe_id
                     JOIN ingredients i ON ri.ingredient_id = i.id
                     WHERE LOWER(r.title) LIKE LOWER(%s)
                     ORDER BY i.name
-                """, (f'%{recipe_title}%',))
+                """
+                parameters = (f'%{recipe_title}%',)
             else:
                 print("❌ Please provide either recipe_title or recipe_id")
                 return []
             
-            ingredients = self.cursor.fetchall()
+            with self.pool.cursor() as cursor:
+                cursor.execute(query, parameters)
+                ingredients = cursor.fetchall()
             if ingredients:
                 recipe_title = ingredients[0]['title']
                 print(f"\n🥕 Ingredients for '{recipe_title}':")
@@ -100,13 +101,14 @@ class DatabaseQueries:
     def get_all_ingredients(self):
         """Get all ingredients in the database"""
         try:
-            self.cursor.execute("""
-                SELECT name, quantity, unit
-                FROM ingredients
-                ORDER BY name
-            """)
+            with self.pool.cursor() as cursor:
+                cursor.execute("""
+                    SELECT name, quantity, unit
+                    FROM ingredients
+                    ORDER BY name
+                """)
+                ingredients = cursor.fetchall()
             
-            ingredients = self.cursor.fetchall()
             print(f"\n🥕 All Ingredients ({len(ingredients)} found):")
             for ingredient in ingredients:
                 quantity = f"{ingredient['quantity']} {ingredient['unit']}" if ingredient['quantity'] and ingredient['unit'] else "q.b."
@@ -120,16 +122,17 @@ class DatabaseQueries:
     def search_recipes_by_ingredient(self, ingredient_name):
         """Search recipes that contain a specific ingredient"""
         try:
-            self.cursor.execute("""
-                SELECT DISTINCT r.title, r.category, r.url
-                FROM recipes r
-                JOIN recipe_ingredients ri ON r.id = ri.recipe_id
-                JOIN ingredients i ON ri.ingredient_id = i.id
-                WHERE LOWER(i.name) LIKE LOWER(%s)
-                ORDER BY r.title
-            """, (f'%{ingredient_name}%',))
+            with self.pool.cursor() as cursor:
+                cursor.execute("""
+                    SELECT DISTINCT r.title, r.category, r.url
+                    FROM recipes r
+                    JOIN recipe_ingredients ri ON r.id = ri.recipe_id
+                    JOIN ingredients i ON ri.ingredient_id = i.id
+                    WHERE LOWER(i.name) LIKE LOWER(%s)
+                    ORDER BY r.title
+                """, (f'%{ingredient_name}%',))
+                recipes = cursor.fetchall()
             
-            recipes = self.cursor.fetchall()
             print(f"\n🔍 Recipes containing '{ingredient_name}' ({len(recipes)} found):")
             for recipe in recipes:
                 print(f"  📖 {recipe['title']}")
@@ -145,28 +148,29 @@ class DatabaseQueries:
     def get_recipe_statistics(self):
         """Get comprehensive recipe statistics"""
         try:
-            # Total recipes
-            self.cursor.execute("SELECT COUNT(*) as count FROM recipes")
-            total_recipes = self.cursor.fetchone()['count']
-            
-            # Total ingredients
-            self.cursor.execute("SELECT COUNT(*) as count FROM ingredients")
-            total_ingredients = self.cursor.fetchone()['count']
-            
-            # Unique ingredients used in recipes
-            self.cursor.execute("SELECT COUNT(DISTINCT ingredient_id) as count FROM recipe_ingredients")
-            unique_ingredients = self.cursor.fetchone()['count']
-            
-            # Recipes by category
-            self.cursor.execute("""
-                SELECT category, COUNT(*) as count
-                FROM recipes
-                WHERE category IS NOT NULL AND category != ''
-                GROUP BY category
-                ORDER BY count DESC
-                LIMIT 10
-            """)
-            categories = self.cursor.fetchall()
+            with self.pool.cursor() as cursor:
+                # Total recipes
+                cursor.execute("SELECT COUNT(*) as count FROM recipes")
+                total_recipes = cursor.fetchone()['count']
+                
+                # Total ingredients
+                cursor.execute("SELECT COUNT(*) as count FROM ingredients")
+                total_ingredients = cursor.fetchone()['count']
+                
+                # Unique ingredients used in recipes
+                cursor.execute("SELECT COUNT(DISTINCT ingredient_id) as count FROM recipe_ingredients")
+                unique_ingredients = cursor.fetchone()['count']
+                
+                # Recipes by category
+                cursor.execute("""
+                    SELECT category, COUNT(*) as count
+                    FROM recipes
+                    WHERE category IS NOT NULL AND category != ''
+                    GROUP BY category
+                    ORDER BY count DESC
+                    LIMIT 10
+                """)
+                categories = cursor.fetchall()
             
             print("\n📊 Database Statistics:")
             print(f"  🍳 Total recipes: {total_recipes}")
@@ -7,30 +7,83 @@ This script creates the PostgreSQL database schema and populates it with:
 2. Recipe-ingredient relationships
 
 Usage:
-    python3 database_setup.py
+    python3 database_setup.py              # bulk COPY load
+    python3 database_setup.py --workers 4  # bulk load with parallel workers
+    python3 database_setup.py --row-by-row # one INSERT per row
+    python3 database_setup.py --sync       # load only new or changed recipe files
 """
 
+import hashlib
+import io
 import json
 import os
+import time
+import zlib
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 import re
 from typing import List, Dict, Any, Optional
 import sys
 from database_config import get_db_config
+from database_pool import get_pool
+from ingredient_normalizer import normalize_ingredient
+from recipe_store import list_recipe_files, read_recipe_file
 
 # Database configuration
 DB_CONFIG = get_db_config()
 
+# Recipes staged and resolved per COPY round
+BULK_BATCH_SIZE = 5000
+# Quantities are staged as text; only plain numbers fit the DECIMAL columns
+NUMERIC_PATTERN = r'^-?[0-9]{1,8}(\.[0-9]+)?$'
+
+
+def copy_value(value: Any) -> str:
+    """Format a value for COPY ... FROM STDIN in text format"""
+    if value is None:
+        return '\\N'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def copy_rows(cursor, table: str, columns: List[str], rows: List[tuple]):
+    """Stream rows into a table with a single COPY"""
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(copy_value(value) for value in row))
+        buffer.write('\n')
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+
+
+def file_hash(path: str) -> str:
+    """SHA-256 of a file's bytes, read in 1 MiB blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
 class DatabaseSetup:
-    def __init__(self):
+    def __init__(self, environment: Optional[str] = None):
+        self.config = get_db_config(environment) if environment else DB_CONFIG
+        self.pool = None
+        # One pooled connection for the whole setup: the staging tables are per session
         self.conn = None
         self.cursor = None
+        # Cleaned ingredient name -> ingredients.id, filled by the bulk loader
+        self.ingredient_ids: Dict[str, int] = {}
+        self.row_by_row = False
+        self.sync = False
+        # More than one worker loads through database_loader.ParallelDatabaseLoader
+        self.n_workers = 1
         
     def connect(self):
-        """Establish database connection"""
+        """Borrow a connection from the shared pool"""
         try:
-            self.conn = psycopg2.connect(**DB_CONFIG)
+            self.pool = get_pool(self.config)
+            self.conn = self.pool.getconn()
             self.cursor = self.conn.cursor(cursor_factory=RealDictCursor)
             print("✅ Connected to PostgreSQL database successfully")
         except psycopg2.Error as e:
@@ -38,12 +91,14 @@ class DatabaseSetup:
             sys.exit(1)
     
     def disconnect(self):
-        """Close database connection"""
+        """Return the connection to the pool"""
         if self.cursor:
             self.cursor.close()
+            self.cursor = None
         if self.conn:
-            self.conn.close()
-            print("✅ Database connection closed")
+            self.pool.putconn(self.conn)
+            self.conn = None
+            print("✅ Database connection returned to the pool")
     
     def create_schema(self):
         """Create the database schema"""
@@ -55,6 +110,7 @@ class DatabaseSetup:
             category TEXT,
             url TEXT UNIQUE NOT NULL,
             n_people VARCHAR(50),
+            n_ingredients INTEGER NOT NULL DEFAULT 0,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         );
         
@@ -78,12 +134,47 @@ class DatabaseSetup:
             UNIQUE(recipe_id, ingredient_id)
         );
         
+        -- Distinct ingredients per recipe, kept up to date by the loaders for fridge matching;
+        -- databases created before the column existed get it counted once
+        DO $$
+        BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM information_schema.columns
+                WHERE table_schema = current_schema()
+                AND table_name = 'recipes' AND column_name = 'n_ingredients'
+            ) THEN
+                ALTER TABLE recipes ADD COLUMN n_ingredients INTEGER NOT NULL DEFAULT 0;
+                UPDATE recipes r SET n_ingredients = (
+                    SELECT COUNT(*) FROM recipe_ingredients ri WHERE ri.recipe_id = r.id
+                );
+            END IF;
+        END $$;
+        
         -- Create indexes for better performance
         CREATE INDEX IF NOT EXISTS idx_recipes_title ON recipes(title);
         CREATE INDEX IF NOT EXISTS idx_recipes_category ON recipes(category);
         CREATE INDEX IF NOT EXISTS idx_ingredients_name ON ingredients(name);
         CREATE INDEX IF NOT EXISTS idx_recipe_ingredients_recipe_id ON recipe_ingredients(recipe_id);
         CREATE INDEX IF NOT EXISTS idx_recipe_ingredients_ingredient_id ON recipe_ingredients(ingredient_id);
+        CREATE INDEX IF NOT EXISTS idx_recipe_ingredients_ingredient_recipe ON recipe_ingredients(ingredient_id, recipe_id);
+        CREATE INDEX IF NOT EXISTS idx_recipes_n_ingredients ON recipes(n_ingredients);
+        
+        -- Sync manifest: content hash of every loaded recipe file and the recipes it holds
+        CREATE TABLE IF NOT EXISTS sync_manifest (
+            path TEXT PRIMARY KEY,
+            content_hash TEXT NOT NULL,
+            size BIGINT NOT NULL,
+            mtime DOUBLE PRECISION NOT NULL,
+            synced_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+        
+        CREATE TABLE IF NOT EXISTS sync_manifest_recipes (
+            path TEXT REFERENCES sync_manifest(path) ON DELETE CASCADE,
+            url TEXT NOT NULL,
+            PRIMARY KEY (path, url)
+        );
+        
+        CREATE INDEX IF NOT EXISTS idx_sync_manifest_recipes_url ON sync_manifest_recipes(url);
         """
         
         try:
@@ -96,15 +187,8 @@ class DatabaseSetup:
             raise
     
     def clean_ingredient_name(self, ingredient_name: str) -> str:
-        """Clean and normalize ingredient names"""
-        # Remove extra whitespace and newlines
-        cleaned = re.sub(r'\s+', ' ', ingredient_name.strip())
-        # Remove common prefixes/suffixes
-        cleaned = re.sub(r'^di\s+', '', cleaned, flags=re.IGNORECASE)
-        cleaned = re.sub(r'^del\s+', '', cleaned, flags=re.IGNORECASE)
-        cleaned = re.sub(r'^della\s+', '', cleaned, flags=re.IGNORECASE)
-        cleaned = re.sub(r'^dell\s+', '', cleaned, flags=re.IGNORECASE)
-        return cleaned.lower()
+        """Clean and normalize ingredient names (shared, memoized normalizer)"""
+        return normalize_ingredient(ingredient_name)
     
     def parse_ingredient_quantity(self, ingredient_data: List) -> tuple:
         """Parse ingredient quantity and unit from recipe data"""
@@ -190,65 +274,64 @@ class DatabaseSetup:
         return (None, None)
     
     def populate_recipes(self):
-        """Populate database with recipes from JSON files"""
+        """Populate database with recipes from recipe shards and JSON files"""
         recipes_dir = "Recipes"
         if not os.path.exists(recipes_dir):
             print(f"⚠️  Recipes directory '{recipes_dir}' not found")
             return
         
-        recipe_files = [f for f in os.listdir(recipes_dir) if f.endswith('.json')]
-        print(f"🍳 Loading {len(recipe_files)} recipes from {recipes_dir}/...")
+        recipe_files = list_recipe_files(recipes_dir)
+        print(f"🍳 Loading recipes from {len(recipe_files)} files in {recipes_dir}/...")
         
         recipes_processed = 0
         ingredients_processed = 0
         
         for recipe_file in recipe_files:
             try:
-                with open(os.path.join(recipes_dir, recipe_file), 'r', encoding='utf-8') as f:
-                    recipe_data = json.load(f)
-                
-                # Insert recipe
-                recipe_id = self.insert_recipe(
-                    title=recipe_data.get('title', ''),
-                    category=recipe_data.get('category', ''),
-                    url=recipe_data.get('url', ''),
-                    n_people=recipe_data.get('n_people', '')
-                )
+                # A shard holds many recipes, a legacy JSON file holds one
+                for recipe_data in read_recipe_file(os.path.join(recipes_dir, recipe_file)):
+                    # Insert recipe
+                    recipe_id = self.insert_recipe(
+                        title=recipe_data.get('title', ''),
+                        category=recipe_data.get('category', ''),
+                        url=recipe_data.get('url', ''),
+                        n_people=recipe_data.get('n_people', '')
+                    )
                 
-                if not recipe_id:
-                    print(f"  ❌ Failed to insert recipe: {recipe_data.get('title', 'Unknown')}")
-                    continue
+                    if not recipe_id:
+                        print(f"  ❌ Failed to insert recipe: {recipe_data.get('title', 'Unknown')}")
+                        continue
                 
-                # Process ingredients
-                ingredients = recipe_data.get('ingredients', [])
-                for ingredient_data in ingredients:
-                    if isinstance(ingredient_data, list) and len(ingredient_data) > 0:
-                        ingredient_name = ingredient_data[0]
-                        quantity, unit = self.parse_ingredient_quantity(ingredient_data)
-                        
-                        # Clean ingredient name
-                        cleaned_name = self.clean_ingredient_name(ingredient_name)
+                    # Process ingredients
+                    ingredients = recipe_data.get('ingredients', [])
+                    for ingredient_data in ingredients:
+                        if isinstance(ingredient_data, list) and len(ingredient_data) > 0:
+                            ingredient_name = ingredient_data[0]
+                            quantity, unit = self.parse_ingredient_quantity(ingredient_data)
                         
-                        # Insert ingredient
-                        ingredient_id = self.insert_ingredient(
-                            name=cleaned_name,
-                            quantity=quantity,
-                            unit=unit
-                        )
+                            # Clean ingredient name
+                            cleaned_name = self.clean_ingredient_name(ingredient_name)
                         
-                        if ingredient_id:
-                            # Link recipe with ingredient
-                            self.link_recipe_ingredient(
-                                recipe_id=recipe_id,
-                                ingredient_id=ingredient_id,
+                            # Insert ingredient
+                            ingredient_id = self.insert_ingredient(
+                                name=cleaned_name,
                                 quantity=quantity,
                                 unit=unit
                             )
-                            ingredients_processed += 1
+                        
+                            if ingredient_id:
+                                # Link recipe with ingredient
+                                self.link_recipe_ingredient(
+                                    recipe_id=recipe_id,
+                                    ingredient_id=ingredient_id,
+                                    quantity=quantity,
+                                    unit=unit
+                                )
+                                ingredients_processed += 1
                 
-                recipes_processed += 1
-                if recipes_processed % 10 == 0:
-                    print(f"  📊 Processed {recipes_processed} recipes...")
+                    recipes_processed += 1
+                    if recipes_processed % 10 == 0:
+                        print(f"  📊 Processed {recipes_processed} recipes...")
                 
             except json.JSONDecodeError as e:
                 print(f"  ❌ Error parsing {recipe_file}: {e}")
@@ -258,6 +341,303 @@ class DatabaseSetup:
         self.conn.commit()
         print(f"✅ Recipes populated successfully: {recipes_processed} recipes, {ingredients_processed} ingredients")
     
+    def bulk_load_recipes(self, recipes_dir: str = "Recipes", batch_size: int = BULK_BATCH_SIZE,
+                          recipe_files: Optional[List[str]] = None,
+                          replace_links: bool = False) -> Dict[str, List[str]]:
+        """
+        Populate the database with COPY into staging tables and set-based upserts
+        
+        Args:
+            recipes_dir (str): Directory of recipe shards and JSON files
+            batch_size (int): Recipes staged and resolved per COPY round
+            recipe_files (List[str]): Files to load, all of them by default
+            replace_links (bool): Drop the existing ingredient links of loaded recipes first
+        
+        Returns:
+            Dict[str, List[str]]: Recipe URLs of every file read without errors
+        """
+        if not os.path.exists(recipes_dir):
+            print(f"⚠️  Recipes directory '{recipes_dir}' not found")
+            return {}
+        
+        if recipe_files is None:
+            recipe_files = list_recipe_files(recipes_dir)
+        print(f"🍳 Bulk loading recipes from {len(recipe_files)} files in {recipes_dir}/...")
+        self.create_staging_tables()
+        
+        start = time.perf_counter()
+        recipes_processed = 0
+        links_processed = 0
+        recipe_rows = []
+        link_rows = []
+        # Staged rows are numbered in file order, so duplicates resolve to the last one
+        position = 0
+        link_position = 0
+        file_urls = {}
+        # Links are dropped once per URL, so a recipe staged in several batches
+        # keeps the links of all of them, as a single batch would
+        replaced_urls = set()
+        for recipe_file in recipe_files:
+            urls = []
+            try:
+                for recipe_data in read_recipe_file(os.path.join(recipes_dir, recipe_file)):
+                    position += 1
+                    url = recipe_data.get('url', '')
+                    urls.append(url)
+                    recipe_rows.append((position, url, recipe_data.get('title', ''),
+                                        recipe_data.get('category', ''), recipe_data.get('n_people', '')))
+                    for ingredient_data in recipe_data.get('ingredients', []):
+                        if isinstance(ingredient_data, list) and len(ingredient_data) > 0:
+                            quantity, unit = self.parse_ingredient_quantity(ingredient_data)
+                            cleaned_name = self.clean_ingredient_name(ingredient_data[0])
+                            link_position += 1
+                            link_rows.append((link_position, url, cleaned_name, quantity, unit))
+                    if len(recipe_rows) >= batch_size:
+                        links_processed += self.load_batch(
+                            recipe_rows, link_rows, self.urls_to_replace(recipe_rows, replaced_urls, replace_links))
+                        recipes_processed += len(recipe_rows)
+                        recipe_rows, link_rows = [], []
+                        print(f"  📊 Loaded {recipes_processed} recipes...")
+                file_urls[recipe_file] = urls
+            except (json.JSONDecodeError, EOFError, OSError, zlib.error) as e:
+                # A truncated shard is left out of the result, so a sync retries it
+                print(f"  ❌ Error parsing {recipe_file}: {e}")
+        if recipe_rows:
+            links_processed += self.load_batch(
+                recipe_rows, link_rows, self.urls_to_replace(recipe_rows, replaced_urls, replace_links))
+            recipes_processed += len(recipe_rows)
+        
+        elapsed = time.perf_counter() - start
+        rows = recipes_processed + links_processed
+        rate = rows / elapsed if elapsed else 0.0
+        print(f"✅ Recipes bulk loaded: {recipes_processed} recipes, {links_processed} ingredients "
+              f"in {elapsed:.2f}s ({rate:,.0f} rows/s)")
+        return file_urls
+    
+    def urls_to_replace(self, recipe_rows: List[tuple], replaced_urls: set, replace_links: bool) -> List[str]:
+        """Staged URLs whose existing links have not been dropped yet in this load"""
+        if not replace_links:
+            return []
+        urls = {row[1] for row in recipe_rows} - replaced_urls
+        replaced_urls.update(urls)
+        return sorted(urls)
+    
+    def sync_recipes(self, recipes_dir: str = "Recipes"):
+        """
+        Bring the database in line with the recipe files, loading only what changed
+        
+        Files whose size and mtime match the manifest are skipped without being
+        read; files whose content hash matches are skipped without being parsed.
+        New and changed files are bulk loaded, replacing the ingredient links of
+        their recipes, and recipes no longer found in any file are deleted.
+        """
+        if not os.path.exists(recipes_dir):
+            print(f"⚠️  Recipes directory '{recipes_dir}' not found")
+            return
+        
+        start = time.perf_counter()
+        self.cursor.execute("SELECT path, content_hash, size, mtime FROM sync_manifest")
+        manifest = {row['path']: row for row in self.cursor.fetchall()}
+        current_files = list_recipe_files(recipes_dir)
+        changed_files = []
+        file_stats = {}
+        for recipe_file in current_files:
+            stat = os.stat(os.path.join(recipes_dir, recipe_file))
+            entry = manifest.get(recipe_file)
+            if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+                continue
+            content_hash = file_hash(os.path.join(recipes_dir, recipe_file))
+            file_stats[recipe_file] = (content_hash, stat.st_size, stat.st_mtime)
+            if not entry or entry['content_hash'] != content_hash:
+                changed_files.append(recipe_file)
+        removed_files = sorted(set(manifest) - set(current_files))
+        print(f"🔄 Sync: {len(changed_files)} new or changed, {len(removed_files)} removed, "
+              f"{len(current_files) - len(changed_files)} unchanged files")
+        
+        file_urls = {}
+        if changed_files:
+            file_urls = self.bulk_load_recipes(recipes_dir, recipe_files=changed_files, replace_links=True)
+            self.update_ingredient_counts([url for urls in file_urls.values() for url in urls])
+        
+        try:
+            # Recipes of replaced or removed files are deleted unless another file still has them
+            self.cursor.execute("""
+                CREATE TEMP TABLE stale_urls ON COMMIT DROP AS
+                SELECT url FROM sync_manifest_recipes WHERE path = ANY(%s)
+            """, (removed_files + list(file_urls),))
+            self.cursor.execute("DELETE FROM sync_manifest WHERE path = ANY(%s)", (removed_files,))
+            self.cursor.execute("DELETE FROM sync_manifest_recipes WHERE path = ANY(%s)", (list(file_urls),))
+            # Unchanged files with a new mtime only get their stat refreshed
+            synced_files = [recipe_file for recipe_file in file_stats
+                            if recipe_file in file_urls or recipe_file not in changed_files]
+            if synced_files:
+                execute_values(self.cursor, """
+                    INSERT INTO sync_manifest (path, content_hash, size, mtime) VALUES %s
+                    ON CONFLICT (path) DO UPDATE SET
+                        content_hash = EXCLUDED.content_hash,
+                        size = EXCLUDED.size,
+                        mtime = EXCLUDED.mtime,
+                        synced_at = CURRENT_TIMESTAMP
+                """, [(recipe_file, *file_stats[recipe_file]) for recipe_file in synced_files])
+            copy_rows(self.cursor, 'sync_manifest_recipes', ['path', 'url'],
+                      [(recipe_file, url) for recipe_file, urls in file_urls.items() for url in set(urls)])
+            self.cursor.execute("""
+                DELETE FROM recipes
+                WHERE url IN (SELECT url FROM stale_urls)
+                AND url NOT IN (SELECT url FROM sync_manifest_recipes)
+            """)
+            recipes_deleted = self.cursor.rowcount
+            self.conn.commit()
+        except psycopg2.Error as e:
+            print(f"❌ Error updating the sync manifest: {e}")
+            self.conn.rollback()
+            raise
+        
+        elapsed = time.perf_counter() - start
+        print(f"✅ Sync completed in {elapsed:.2f}s: {sum(map(len, file_urls.values()))} recipes loaded, "
+              f"{recipes_deleted} recipes deleted")
+    
+    def update_ingredient_counts(self, urls: Optional[List[str]] = None):
+        """
+        Recount the distinct ingredients of recipes in one set-based UPDATE
+        
+        Args:
+            urls (List[str]): Recipes to recount, all of them by default
+        """
+        try:
+            self.cursor.execute("""
+                UPDATE recipes r SET n_ingredients = (
+                    SELECT COUNT(*) FROM recipe_ingredients ri WHERE ri.recipe_id = r.id
+                )
+                WHERE %(urls)s::TEXT[] IS NULL OR r.url = ANY(%(urls)s::TEXT[])
+            """, {'urls': urls})
+            self.conn.commit()
+            print(f"✅ Ingredient counts updated for {self.cursor.rowcount} recipes")
+        except psycopg2.Error as e:
+            print(f"❌ Error updating ingredient counts: {e}")
+            self.conn.rollback()
+            raise
+    
+    def create_staging_tables(self):
+        """Create the session-local tables the bulk loader copies into"""
+        self.cursor.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS staging_recipes (
+                position INTEGER,
+                url TEXT,
+                title TEXT,
+                category TEXT,
+                n_people TEXT
+            );
+            CREATE TEMP TABLE IF NOT EXISTS staging_links (
+                position INTEGER,
+                url TEXT,
+                ingredient_id INTEGER,
+                quantity TEXT,
+                unit TEXT
+            );
+            CREATE TEMP TABLE IF NOT EXISTS staging_names (
+                name TEXT
+            );
+        """)
+    
+    def resolve_ingredient_ids(self, names: set):
+        """Insert the ingredient names missing from the cache and cache their IDs"""
+        missing_names = [(name,) for name in names if name not in self.ingredient_ids]
+        if not missing_names:
+            return
+        self.cursor.execute("TRUNCATE staging_names")
+        copy_rows(self.cursor, 'staging_names', ['name'], missing_names)
+        # Text longer than its VARCHAR column is cut to fit instead of failing the batch
+        self.cursor.execute("""
+            INSERT INTO ingredients (name)
+            SELECT LEFT(name, 255) FROM staging_names
+            ON CONFLICT (name) DO NOTHING
+        """)
+        self.cursor.execute("""
+            SELECT i.id, s.name
+            FROM ingredients i
+            JOIN staging_names s ON LEFT(s.name, 255) = i.name
+        """)
+        for row in self.cursor.fetchall():
+            self.ingredient_ids[row['name']] = row['id']
+    
+    def load_batch(self, recipe_rows: List[tuple], link_rows: List[tuple],
+                   replace_urls: Optional[List[str]] = None) -> int:
+        """
+        Upsert one batch of staged recipes and links
+        
+        Args:
+            recipe_rows (List[tuple]): (position, url, title, category, n_people) rows
+            link_rows (List[tuple]): (position, url, ingredient name, quantity, unit) rows
+            replace_urls (List[str]): Recipes whose existing ingredient links are dropped first
+        
+        Returns:
+            int: Number of links loaded
+        """
+        try:
+            self.resolve_ingredient_ids({row[2] for row in link_rows})
+            self.cursor.execute("TRUNCATE staging_recipes, staging_links")
+            copy_rows(self.cursor, 'staging_recipes', ['position', 'url', 'title', 'category', 'n_people'],
+                      recipe_rows)
+            copy_rows(self.cursor, 'staging_links', ['position', 'url', 'ingredient_id', 'quantity', 'unit'],
+                      [(position, url, self.ingredient_ids[name], quantity, unit)
+                       for position, url, name, quantity, unit in link_rows])
+            
+            # The last occurrence wins, as with one upsert per row
+            self.cursor.execute("""
+                INSERT INTO recipes (title, category, url, n_people)
+                SELECT DISTINCT ON (url) LEFT(title, 255), category, url, LEFT(n_people, 50)
+                FROM staging_recipes
+                ORDER BY url, position DESC
+                ON CONFLICT (url) DO UPDATE SET
+                    title = EXCLUDED.title,
+                    category = EXCLUDED.category,
+                    n_people = EXCLUDED.n_people
+            """)
+            if replace_urls:
+                # A changed recipe may have dropped ingredients
+                self.cursor.execute("""
+                    DELETE FROM recipe_ingredients ri
+                    USING recipes r
+                    WHERE ri.recipe_id = r.id
+                    AND r.url = ANY(%s)
+                """, (replace_urls,))
+            self.cursor.execute("""
+                INSERT INTO recipe_ingredients (recipe_id, ingredient_id, quantity, unit, notes)
+                SELECT DISTINCT ON (r.id, s.ingredient_id)
+                    r.id, s.ingredient_id,
+                    CASE WHEN s.quantity ~ %(numeric)s THEN s.quantity::DECIMAL(10,2) END,
+                    LEFT(s.unit, 50), NULL
+                FROM staging_links s
+                JOIN recipes r ON r.url = s.url
+                ORDER BY r.id, s.ingredient_id, s.position DESC
+                ON CONFLICT (recipe_id, ingredient_id) DO UPDATE SET
+                    quantity = EXCLUDED.quantity,
+                    unit = EXCLUDED.unit,
+                    notes = EXCLUDED.notes
+            """, {'numeric': NUMERIC_PATTERN})
+            self.cursor.execute("""
+                UPDATE ingredients i SET
+                    quantity = s.quantity,
+                    unit = s.unit
+                FROM (
+                    SELECT DISTINCT ON (ingredient_id) ingredient_id,
+                        CASE WHEN quantity ~ %(numeric)s THEN quantity::DECIMAL(10,2) END AS quantity,
+                        LEFT(unit, 50) AS unit
+                    FROM staging_links
+                    ORDER BY ingredient_id, position DESC
+                ) s
+                WHERE i.id = s.ingredient_id
+            """, {'numeric': NUMERIC_PATTERN})
+            self.conn.commit()
+            return len(link_rows)
+        except psycopg2.Error as e:
+            print(f"❌ Error loading batch: {e}")
+            self.conn.rollback()
+            # IDs cached during the failed transaction may not exist
+            self.ingredient_ids.clear()
+            raise
+    
     def create_views(self):
         """Create useful database views"""
         views_sql = """
@@ -319,7 +699,18 @@ class DatabaseSetup:
             self.create_schema()
             
             # Populate data
-            self.populate_recipes()
+            if self.sync:
+                self.sync_recipes()
+            elif self.row_by_row:
+                self.populate_recipes()
+                self.update_ingredient_counts()
+            elif self.n_workers > 1:
+                from database_loader import ParallelDatabaseLoader
+                ParallelDatabaseLoader(n_workers=self.n_workers, config=self.config).load()
+                self.update_ingredient_counts()
+            else:
+                self.bulk_load_recipes()
+                self.update_ingredient_counts()
             
             # Create views
             self.create_views()
@@ -339,6 +730,15 @@ class DatabaseSetup:
 def main():
     """Main function"""
     setup = DatabaseSetup()
+    setup.row_by_row = "--row-by-row" in sys.argv
+    setup.sync = "--sync" in sys.argv
+    if "--workers" in sys.argv:
+        index = sys.argv.index("--workers")
+        value = sys.argv[index + 1] if index + 1 < len(sys.argv) else ""
+        if not value.isdigit() or int(value) < 1:
+            print("❌ --workers expects a positive number of worker processes")
+            sys.exit(1)
+        setup.n_workers = int(value)
     setup.run_setup()
 
 if __name__ == "__main__":
@@ -0,0 +1,144 @@
+import sqlite3
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from crawl_metrics import get_metrics
+
+CACHE_PATH = ".http_cache.sqlite"
+POOL_SIZE = 16
+# cached bodies beyond this many bytes are evicted, least recently used first
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+
+class CachedSession:
+    # Pooled keep-alive session with a persistent conditional-GET cache.
+    # Responses carrying an ETag or Last-Modified are stored with their body;
+    # the next request for the same URL is sent as a conditional GET, and a
+    # 304 is answered from the cache with response.from_cache set to True.
+    # The cache is bounded by max_cache_bytes of bodies.
+    def __init__(self, cache_path=CACHE_PATH, pool_size=POOL_SIZE, max_cache_bytes=CACHE_MAX_BYTES):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Accept-Encoding"] = "gzip, deflate"
+        self.lock = threading.Lock()
+        self.cache = sqlite3.connect(cache_path, check_same_thread=False)
+        self.cache.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                encoding TEXT,
+                body BLOB
+            )
+        """)
+        # caches written before eviction existed lack the bookkeeping columns
+        columns = {row[1] for row in self.cache.execute("PRAGMA table_info(pages)")}
+        if "size" not in columns:
+            self.cache.execute("ALTER TABLE pages ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+            self.cache.execute("UPDATE pages SET size = length(body)")
+        if "used_at" not in columns:
+            self.cache.execute("ALTER TABLE pages ADD COLUMN used_at REAL NOT NULL DEFAULT 0")
+        self.cache.execute("CREATE INDEX IF NOT EXISTS idx_pages_used_at ON pages(used_at)")
+        self.cache.commit()
+        self.max_cache_bytes = max_cache_bytes
+        self.cache_bytes = self.cache.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        self.requests = 0
+        self.hits = 0
+        self.bytes_downloaded = 0
+        self.bytes_saved = 0
+
+    def get(self, url, timeout=30):
+        with self.lock:
+            cached = self.cache.execute(
+                "SELECT etag, last_modified, encoding, body FROM pages WHERE url = ?", (url,)).fetchone()
+        headers = {}
+        if cached:
+            if cached[0]:
+                headers["If-None-Match"] = cached[0]
+            if cached[1]:
+                headers["If-Modified-Since"] = cached[1]
+        start = time.perf_counter()
+        response = self.session.get(url, headers=headers, timeout=timeout)
+        metrics = get_metrics()
+        metrics.observe("fetch_seconds", time.perf_counter() - start)
+        metrics.inc("http_responses_total", status=response.status_code)
+        if response.status_code == 304 and cached:
+            with self.lock:
+                self.requests += 1
+                self.hits += 1
+                self.bytes_saved += len(cached[3])
+                self.cache.execute("UPDATE pages SET used_at = ? WHERE url = ?", (time.time(), url))
+                self.cache.commit()
+            return cached_response(response, cached[2], cached[3])
+        response.from_cache = False
+        # decoded body size; Content-Length is the compressed size on gzip responses
+        n_bytes = len(response.content)
+        metrics.inc("bytes_downloaded_total", n_bytes)
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        with self.lock:
+            self.requests += 1
+            self.bytes_downloaded += n_bytes
+            if response.ok and (etag or last_modified):
+                self.store(url, etag, last_modified, response.encoding, response.content)
+        return response
+
+    def store(self, url, etag, last_modified, encoding, body):
+        # called with self.lock held
+        replaced = self.cache.execute("SELECT size FROM pages WHERE url = ?", (url,)).fetchone()
+        self.cache.execute(
+            "INSERT OR REPLACE INTO pages (url, etag, last_modified, encoding, body, size, used_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (url, etag, last_modified, encoding, body, len(body), time.time()))
+        self.cache_bytes += len(body) - (replaced[0] if replaced else 0)
+        if self.cache_bytes > self.max_cache_bytes:
+            self.evict()
+        self.cache.commit()
+
+    def evict(self):
+        # drop the least recently used bodies until the cache is back under
+        # 90% of its bound, so eviction does not run on every store
+        target = self.max_cache_bytes * 0.9
+        evicted = []
+        for url, size in self.cache.execute("SELECT url, size FROM pages ORDER BY used_at"):
+            if self.cache_bytes <= target:
+                break
+            evicted.append((url,))
+            self.cache_bytes -= size
+        self.cache.executemany("DELETE FROM pages WHERE url = ?", evicted)
+
+    def report(self):
+        with self.lock:
+            requests, hits = self.requests, self.hits
+            bytes_downloaded, bytes_saved = self.bytes_downloaded, self.bytes_saved
+        hit_rate = hits / requests if requests else 0
+        return (f"HTTP cache: {hits}/{requests} conditional hits ({hit_rate:.0%}), "
+                f"{bytes_downloaded / 1024:.1f} KiB downloaded, {bytes_saved / 1024:.1f} KiB saved")
+
+
+def cached_response(not_modified, encoding, body):
+    # turn a 304 into the 200 it stands for, with the cached body
+    response = requests.Response()
+    response.status_code = 200
+    response.url = not_modified.url
+    response.headers = not_modified.headers
+    response.encoding = encoding
+    response._content = body
+    response.from_cache = True
+    return response
+
+
+session = None
+
+
+def get_session():
+    # one session per process, shared by every scraper function
+    global session
+    if session is None:
+        session = CachedSession()
+    return session
@@ -0,0 +1,62 @@
+from array import array
+
+
+def diff_fridge(old_fridge, new_fridge):
+    added = [ingredient for ingredient in new_fridge if ingredient not in old_fridge]
+    removed = [ingredient for ingredient in old_fridge if ingredient not in new_fridge]
+    return added, removed
+
+
+class IncrementalMatcher:
+    # Keeps, for every recipe, how many of its distinct ingredients the fridge
+    # currently satisfies. A fridge diff only walks the posting lists of the
+    # vocabulary entries whose availability actually flips, so an update costs
+    # in proportion to the diff rather than to the catalog.
+    def __init__(self, index, fridge_ingredients=()):
+        self.index = index
+        self.fridge_ingredients = {}
+        # number of fridge items satisfying each vocabulary entry
+        self.providers = {}
+        self.satisfied = array('I', bytes(4 * len(index.recipe_sizes)))
+        self.update(added=fridge_ingredients)
+
+    def update(self, added=(), removed=()):
+        # returns the urls of the recipes that entered and left the matching set
+        before = {}
+        for fridge_ingredient in removed:
+            ingredient_ids = self.fridge_ingredients.pop(fridge_ingredient, ())
+            for ingredient_id in ingredient_ids:
+                self.providers[ingredient_id] -= 1
+                if self.providers[ingredient_id] == 0:
+                    del self.providers[ingredient_id]
+                    self.shift(ingredient_id, -1, before)
+        for fridge_ingredient in added:
+            if fridge_ingredient in self.fridge_ingredients:
+                continue
+            ingredient_ids = self.index.find_ingredients(fridge_ingredient)
+            self.fridge_ingredients[fridge_ingredient] = ingredient_ids
+            for ingredient_id in ingredient_ids:
+                self.providers[ingredient_id] = self.providers.get(ingredient_id, 0) + 1
+                if self.providers[ingredient_id] == 1:
+                    self.shift(ingredient_id, 1, before)
+        entered = []
+        left = []
+        for recipe_id in sorted(before):
+            matching = self.is_matching(recipe_id)
+            if matching and not before[recipe_id]:
+                entered.append(self.index.urls[recipe_id])
+            elif before[recipe_id] and not matching:
+                left.append(self.index.urls[recipe_id])
+        return entered, left
+
+    def shift(self, ingredient_id, delta, before):
+        for recipe_id in self.index.postings[ingredient_id]:
+            if recipe_id not in before:
+                before[recipe_id] = self.is_matching(recipe_id)
+            self.satisfied[recipe_id] += delta
+
+    def is_matching(self, recipe_id):
+        return self.satisfied[recipe_id] == self.index.recipe_sizes[recipe_id]
+
+    def get_matching_recipes(self):
+        return [url for recipe_id, url in enumerate(self.index.urls) if self.is_matching(recipe_id)]
@@ -0,0 +1,252 @@
+import heapq
+import math
+from array import array
+
+from ingredient_normalizer import normalize_ingredient
+from quantity_udm_parser import parse_quantity_udm, to_base_unit
+
+GRAM_SIZE = 3
+# base units as stored in the entry_udms array; None is a piece count
+UDMS = ('g', 'ml', None)
+UDM_CODES = {udm: code for code, udm in enumerate(UDMS)}
+
+
+def get_grams(text):
+    return {text[i:i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+
+def parse_servings(n_people):
+    try:
+        return float(n_people)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+class IngredientIndex:
+    # Inverted index over a recipe catalog, built once per catalog load.
+    # Normalized ingredient names are interned into ids; each id has a posting
+    # list of the recipes using it, and a trigram index over the names resolves
+    # the same bidirectional substring containment used by Matcher.has_ingredient.
+    def __init__(self):
+        self.urls = []
+        self.recipe_sizes = []
+        self.recipe_ingredients = []
+        self.recipe_servings = array('d')
+        # required amount of every recipe ingredient, in base units, aligned
+        # with recipe_ingredients and sliced by entry_offsets
+        self.entry_offsets = array('I', [0])
+        self.entry_amounts = array('d')
+        self.entry_udms = array('B')
+        self.empty_recipes = []
+        self.ingredient_ids = {}
+        self.ingredient_names = []
+        self.postings = []
+        self.grams = {}
+        self.gram_counts = []
+        # fuzzy fallback for names with no exact vocabulary entry (e.g. melanzane
+        # vs melanzana); None disables it. Lookups are memoized per vocabulary.
+        self.fuzzy_threshold = None
+        self.fuzzy_cache = {}
+        # optional IngredientOntology: a fridge name also satisfies every name
+        # in its precomputed closure, looked up exactly in the vocabulary
+        self.ontology = None
+
+    def add_recipe(self, recipe):
+        recipe_id = len(self.urls)
+        self.urls.append(recipe['url'])
+        names = {}
+        for ingredient in recipe['ingredients']:
+            quantity = ingredient[1] if len(ingredient) > 1 else None
+            udm = ingredient[2] if len(ingredient) > 2 else None
+            amount, base_udm = to_base_unit(quantity, udm)
+            name = normalize_ingredient(ingredient[0])
+            if name not in names:
+                names[name] = [amount, base_udm]
+            elif names[name][0] is not None and amount is not None and names[name][1] == base_udm:
+                # the same ingredient listed twice needs both amounts
+                names[name][0] += amount
+        self.recipe_sizes.append(len(names))
+        self.recipe_servings.append(parse_servings(recipe.get('n_people')))
+        if not names:
+            # has_all_ingredients([]) is true, so these match any fridge
+            self.empty_recipes.append(recipe_id)
+        ingredient_ids = tuple(self.get_ingredient_id(name) for name in names)
+        self.recipe_ingredients.append(ingredient_ids)
+        for ingredient_id in ingredient_ids:
+            self.postings[ingredient_id].append(recipe_id)
+        for amount, base_udm in names.values():
+            self.entry_amounts.append(math.nan if amount is None else amount)
+            self.entry_udms.append(UDM_CODES[base_udm])
+        self.entry_offsets.append(len(self.entry_amounts))
+        return recipe_id
+
+    def get_ingredient_id(self, name):
+        ingredient_id = self.ingredient_ids.get(name)
+        if ingredient_id is None:
+            ingredient_id = len(self.ingredient_names)
+            self.ingredient_ids[name] = ingredient_id
+            self.ingredient_names.append(name)
+            self.postings.append([])
+            grams = get_grams(name)
+            self.gram_counts.append(len(grams))
+            for gram in grams:
+                self.grams.setdefault(gram, set()).add(ingredient_id)
+            # a new vocabulary entry can change any fuzzy result
+            self.fuzzy_cache.clear()
+        return ingredient_id
+
+    def find_ingredients(self, fridge_ingredient):
+        fridge_name = normalize_ingredient(fridge_ingredient)
+        found = self.find_contained(fridge_name)
+        found.update(self.find_containing(fridge_name))
+        if self.ontology is not None:
+            for name in self.ontology.get_satisfied(fridge_name):
+                ingredient_id = self.ingredient_ids.get(name)
+                if ingredient_id is not None:
+                    found.add(ingredient_id)
+        # the fuzzy pass only runs when the name itself is not in the vocabulary
+        if self.fuzzy_threshold is not None and fridge_name not in self.ingredient_ids:
+            found.update(self.find_similar(fridge_name, self.fuzzy_threshold))
+        return found
+
+    def find_similar(self, fridge_name, threshold):
+        # vocabulary entries whose trigram Jaccard similarity with fridge_name
+        # reaches threshold; only names sharing at least one trigram are touched
+        key = (fridge_name, threshold)
+        if key in self.fuzzy_cache:
+            return self.fuzzy_cache[key]
+        grams = get_grams(fridge_name)
+        shared = {}
+        for gram in grams:
+            for ingredient_id in self.grams.get(gram, ()):
+                shared[ingredient_id] = shared.get(ingredient_id, 0) + 1
+        similar = frozenset(
+            ingredient_id for ingredient_id, n_shared in shared.items()
+            if n_shared / (len(grams) + self.gram_counts[ingredient_id] - n_shared) >= threshold)
+        self.fuzzy_cache[key] = similar
+        return similar
+
+    def find_contained(self, fridge_name):
+        # recipe ingredients contained in the fridge ingredient are exactly
+        # its substrings, so look each one up in the vocabulary
+        found = set()
+        length = len(fridge_name)
+        for start in range(length + 1):
+            for end in range(start, length + 1):
+                ingredient_id = self.ingredient_ids.get(fridge_name[start:end])
+                if ingredient_id is not None:
+                    found.add(ingredient_id)
+        return found
+
+    def find_containing(self, fridge_name):
+        # recipe ingredients containing the fridge ingredient must contain
+        # all of its trigrams; intersect those postings and verify
+        grams = get_grams(fridge_name)
+        if not grams:
+            candidates = range(len(self.ingredient_names))
+        else:
+            postings = sorted((self.grams.get(gram, set()) for gram in grams), key=len)
+            candidates = set.intersection(*postings)
+        return {ingredient_id for ingredient_id in candidates
+                if fridge_name in self.ingredient_names[ingredient_id]}
+
+    def find_available(self, fridge_ingredients):
+        available = set()
+        for fridge_ingredient in fridge_ingredients:
+            available.update(self.find_ingredients(fridge_ingredient))
+        return available
+
+    def count_matches(self, available):
+        counts = {}
+        for ingredient_id in available:
+            for recipe_id in self.postings[ingredient_id]:
+                counts[recipe_id] = counts.get(recipe_id, 0) + 1
+        return counts
+
+    def get_matching_recipes(self, fridge_ingredients):
+        counts = self.count_matches(self.find_available(fridge_ingredients))
+        recipe_ids = [recipe_id for recipe_id, count in counts.items()
+                      if count == self.recipe_sizes[recipe_id]]
+        recipe_ids.extend(self.empty_recipes)
+        return [self.urls[recipe_id] for recipe_id in sorted(recipe_ids)]
+
+    def get_ranked_recipes(self, fridge_ingredients, k):
+        # Top-k recipes sharing at least one ingredient with the fridge, by fewest
+        # missing ingredients and then by coverage ratio. A bounded heap keeps
+        # only k candidates, with the worst one on top so it can be replaced.
+        # Once k perfect matches are seen the scan stops, so ties between
+        # perfect matches go to the ones found first.
+        available = self.find_available(fridge_ingredients)
+        heap = []
+        n_perfect = 0
+        candidates = [(recipe_id, 0) for recipe_id in self.empty_recipes]
+        candidates.extend(self.count_matches(available).items())
+        for recipe_id, count in candidates:
+            size = self.recipe_sizes[recipe_id]
+            missing = size - count
+            coverage = count / size if size else 1.0
+            item = (-missing, coverage, -recipe_id)
+            if len(heap) < k:
+                heapq.heappush(heap, item)
+            else:
+                heapq.heappushpop(heap, item)
+            if missing == 0:
+                n_perfect += 1
+                # nothing can outrank k perfect matches
+                if n_perfect >= k:
+                    break
+        ranked = []
+        for negative_missing, coverage, negative_recipe_id in sorted(heap, reverse=True):
+            recipe_id = -negative_recipe_id
+            ranked.append({
+                'url': self.urls[recipe_id],
+                'missing': [self.ingredient_names[ingredient_id]
+                            for ingredient_id in self.recipe_ingredients[recipe_id]
+                            if ingredient_id not in available],
+                'coverage': coverage
+            })
+        return ranked
+
+    def get_matching_recipes_with_quantities(self, fridge, servings=None):
+        # fridge maps ingredient names to quantities such as "500 g" or "10";
+        # recipes are scaled from their n_people to the requested servings.
+        # stock maps a vocabulary id to the amount held per base unit, or to
+        # None when a fridge item for it has no readable quantity ("q.b.").
+        # Several fridge items can resolve to the same id (e.g. "farina" and
+        # "farina 00" both contain "farina"), so the largest one counts
+        # instead of their sum.
+        stock = {}
+        for fridge_ingredient, fridge_quantity in fridge.items():
+            amount, base_udm = to_base_unit(*parse_quantity_udm(str(fridge_quantity)))
+            for ingredient_id in self.find_ingredients(fridge_ingredient):
+                if amount is None:
+                    stock[ingredient_id] = None
+                    continue
+                held = stock.setdefault(ingredient_id, {})
+                if held is not None:
+                    held[base_udm] = max(held.get(base_udm, 0.0), amount)
+        counts = self.count_matches(stock.keys())
+        recipe_ids = [recipe_id for recipe_id, count in counts.items()
+                      if count == self.recipe_sizes[recipe_id]]
+        recipe_ids.extend(self.empty_recipes)
+        return [self.urls[recipe_id] for recipe_id in sorted(recipe_ids)
+                if self.has_enough(recipe_id, stock, servings)]
+
+    def has_enough(self, recipe_id, stock, servings):
+        scale = 1.0
+        recipe_servings = self.recipe_servings[recipe_id]
+        if servings and recipe_servings > 0:
+            scale = servings / recipe_servings
+        start = self.entry_offsets[recipe_id]
+        for entry, ingredient_id in enumerate(self.recipe_ingredients[recipe_id], start):
+            required = self.entry_amounts[entry]
+            if math.isnan(required):
+                continue
+            if stock[ingredient_id] is None:
+                # an unknown amount cannot be checked
+                continue
+            held = stock[ingredient_id].get(UDMS[self.entry_udms[entry]])
+            # an amount held in another unit family cannot be compared, so it is not checked
+            if held is not None and held < required * scale:
+                return False
+        return True
@@ -0,0 +1,50 @@
+import re
+from functools import lru_cache
+
+from quantity_udm_parser import remove_parentheses
+
+QUANTITY_UDM = r"\b\d+(?:[.,]\d+)?\s*(?:kg|g|ml|cl|l|cc)\b"
+# counts such as "2" or "1,5"; grades such as farina "00" or "0" start with a zero and are kept
+COUNT = r"\b[1-9]\d*(?:[.,/]\d+)?\b"
+QB = r"\bq\.?\s*b\.?(?=\s|$)"
+ELISION = r"\b(?:dell|dall|nell|sull|all|un|d|l)['’]"
+NOISE = r"[^\w\s]"
+STOPWORDS = {
+    'il', 'lo', 'la', 'i', 'gli', 'le', 'un', 'uno', 'una',
+    'di', 'da', 'del', 'dello', 'della', 'dei', 'degli', 'delle',
+    'al', 'allo', 'alla', 'ai', 'agli', 'alle', 'dal', 'dalla', 'dai',
+    'a', 'ad', 'in', 'nel', 'nella', 'con', 'per', 'su', 'e', 'ed', 'o',
+}
+IRREGULAR_PLURALS = {'uova': 'uovo'}
+# plural suffix -> singular suffix, longest first; feminine plurals in -e are
+# left alone because they collide with singular nouns such as sale or latte
+PLURAL_SUFFIXES = [
+    ('cchi', 'cchio'), ('chi', 'co'), ('ghi', 'go'), ('che', 'ca'), ('ghe', 'ga'),
+    ('cie', 'cia'), ('gie', 'gia'), ('ini', 'ino'), ('oni', 'one'), ('i', 'o'),
+]
+MIN_PLURAL_LENGTH = 5
+
+
+@lru_cache(maxsize=65536)
+def normalize_ingredient(raw_name):
+    # "Farina 00 (tipo) 200 g" -> "farina 00"; the same raw strings repeat across
+    # thousands of recipes, so results are memoized
+    name = remove_parentheses(raw_name.lower())
+    name = re.sub(QUANTITY_UDM, " ", name)
+    name = re.sub(QB, " ", name)
+    name = re.sub(COUNT, " ", name)
+    name = re.sub(ELISION, " ", name)
+    name = re.sub(NOISE, " ", name)
+    words = [singularize(word) for word in name.split() if word not in STOPWORDS]
+    return " ".join(words)
+
+
+def singularize(word):
+    if word in IRREGULAR_PLURALS:
+        return IRREGULAR_PLURALS[word]
+    if len(word) < MIN_PLURAL_LENGTH:
+        return word
+    for plural, singular in PLURAL_SUFFIXES:
+        if word.endswith(plural):
+            return word[:-len(plural)] + singular
+    return word
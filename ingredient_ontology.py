@@ -0,0 +1,46 @@
+import json
+import os
+
+from ingredient_normalizer import normalize_ingredient
+
+ONTOLOGY_PATH = "ingredient_ontology.json"
+
+
+class IngredientOntology:
+    # Hierarchy and synonym graph between ingredient names: an ingredient
+    # satisfies its synonyms and, transitively, everything it "is a" (latte
+    # intero -> latte, parmigiano -> formaggio grattugiato). The closure is
+    # flattened at load time, so a lookup is a single dict hit.
+    def __init__(self, synonyms=(), is_a=None):
+        edges = {}
+        for group in synonyms:
+            names = [normalize_ingredient(name) for name in group]
+            for name in names:
+                edges.setdefault(name, set()).update(names)
+        for child, parents in (is_a or {}).items():
+            edges.setdefault(normalize_ingredient(child), set()).update(
+                normalize_ingredient(parent) for parent in parents)
+        self.satisfies = {name: frozenset(self.walk(name, edges)) for name in edges}
+
+    @staticmethod
+    def walk(name, edges):
+        reached = {name}
+        stack = [name]
+        while stack:
+            for neighbour in edges.get(stack.pop(), ()):
+                if neighbour not in reached:
+                    reached.add(neighbour)
+                    stack.append(neighbour)
+        return reached
+
+    def get_satisfied(self, name):
+        # normalized names satisfied by an already normalized name, itself included
+        return self.satisfies.get(name, (name,))
+
+
+def load_ontology(ontology_path=ONTOLOGY_PATH):
+    if not os.path.exists(ontology_path):
+        return None
+    with open(ontology_path, "r") as file:
+        ontology = json.load(file)
+    return IngredientOntology(ontology.get("synonyms", []), ontology.get("is_a", {}))
@@ -1,16 +1,28 @@
 import os
+import sys
 from matcher import Matcher
+from recipe_catalog import CATALOG_PATH, build_catalog, is_catalog_current
 from scraper import Scraper
 
-def print_recipes(matcher_instance):
-    matched_recipes = matcher_instance.get_matching_recipes()
-    print(f"Found {len(matched_recipes)} matching recipes.")
-    if len(matched_recipes) == 0:
+def print_recipes(matcher_instance, limit=None, offset=0):
+    # stream matches as they are found instead of waiting for the full list
+    n_matches = 0
+    for match in matcher_instance.iter_matching_recipes(limit, offset):
+        if n_matches == 0:
+            print("Matching recipes:")
+        print(f"  - {match}", flush=True)
+        n_matches += 1
+    print(f"Found {n_matches} matching recipes.")
+    if n_matches == 0:
         print("No recipes found.")
-    else:
-        print("Matching recipes:")
-        for match in matched_recipes:
-            print(f"  - {match}")
+        print_closest_recipes(matcher_instance)
+
+def print_closest_recipes(matcher_instance, k=10):
+    ranked_recipes = matcher_instance.get_ranked_recipes(k)
+    if ranked_recipes:
+        print("Closest recipes:")
+        for recipe in ranked_recipes:
+            print(f"  - {recipe['url']} (missing: {', '.join(recipe['missing'])})")
 
 def main():
     # Check if Recipes folder exists
@@ -21,13 +33,29 @@ def main():
         scraper = Scraper()
         scraper.download_cookbook()
         print("Scraping completed.")
+        scraped = True
+    elif "--refresh" in sys.argv:
+        print("Recipes folder found. Fetching only new recipes...")
+        scraper = Scraper()
+        scraped = scraper.download_new_recipes() > 0
     else:
         print("Recipes folder found. Skipping scraper execution.")
+        scraped = False
+
+    # Pack the recipes into a single mmappable catalog for the matcher, again
+    # whenever the recipe files changed since it was built
+    if scraped or not is_catalog_current(recipes_folder):
+        print("Building packed recipe catalog...")
+        n_recipes = build_catalog(recipes_folder)
+        print(f"Packed {n_recipes} recipes into {CATALOG_PATH}.")
     
     # Always run the matcher
     print("Running matcher...")
     matcher = Matcher()
-    print_recipes(matcher)
+    try:
+        print_recipes(matcher)
+    finally:
+        matcher.close()
     print("Matching completed.")
 
 if __name__ == '__main__':
@@ -1,30 +1,112 @@
 import json
 import os
+from itertools import islice
+
+from incremental_matcher import IncrementalMatcher, diff_fridge
+from ingredient_normalizer import normalize_ingredient
+from ingredient_ontology import ONTOLOGY_PATH, load_ontology
+from ingredient_index import IngredientIndex
+from parallel_matcher import ParallelMatcher
+from recipe_catalog import load_catalog
+from recipe_store import list_recipe_files, read_recipe_file
 
 with open("fridge.json", "r") as f:
     fridge = json.load(f)
 
 class Matcher:
-    def __init__(self):
+    def __init__(self, n_workers=1, fuzzy_threshold=None):
         self.fridge = fridge
         self.recipe_path = "Recipes/"
-        self.recipe_file_names = os.listdir(self.recipe_path)
+        # a packed catalog, when built from the current recipe files, replaces
+        # the recipe shards and JSON files
+        self.catalog = load_catalog(recipe_path=self.recipe_path)
+        self.recipe_file_names = [] if self.catalog is not None else list_recipe_files(self.recipe_path)
         self.ingredients_available = fridge.keys()
+        self.index = None
+        self.n_workers = n_workers
+        # trigram similarity above which a misspelled or variant name still matches
+        self.fuzzy_threshold = fuzzy_threshold
+        # substitutions such as parmigiano -> formaggio grattugiato, when the ontology file exists
+        self.ontology = load_ontology()
+        self.parallel_matcher = None
+        self.bitmap_matcher = None
+        self.incremental_matcher = None
 
     def get_matching_recipes(self):
-        matching_recipes = []
-        for recipe_file_name in self.recipe_file_names:
-            recipe = self.get_recipe_from_file_name(recipe_file_name)
-            ingredients = recipe['ingredients']
-            url = recipe['url']
-            if self.has_all_ingredients(ingredients):
-                matching_recipes.append(url)
-        return matching_recipes
-
-    def get_recipe_from_file_name(self, recipe_file_name):
-        with open(self.recipe_path+recipe_file_name, "r") as file:
-            recipe = json.load(file)
-        return recipe
+        if self.n_workers > 1:
+            return self.get_parallel_matcher().get_matching_recipes(self.ingredients_available)
+        return self.get_index().get_matching_recipes(self.ingredients_available)
+
+    def get_matching_recipes_with_quantities(self, servings=None):
+        return self.get_index().get_matching_recipes_with_quantities(self.fridge, servings)
+
+    def update_fridge(self, new_fridge):
+        # apply only the difference with the current fridge and report which
+        # recipe urls entered and left the matching set
+        if self.incremental_matcher is None:
+            self.incremental_matcher = IncrementalMatcher(self.get_index(), self.ingredients_available)
+        added, removed = diff_fridge(self.fridge, new_fridge)
+        self.fridge = new_fridge
+        self.ingredients_available = new_fridge.keys()
+        return self.incremental_matcher.update(added, removed)
+
+    def get_parallel_matcher(self):
+        # the shard workers stay warm across queries until close()
+        if self.parallel_matcher is None:
+            ontology_path = ONTOLOGY_PATH if self.ontology else None
+            self.parallel_matcher = ParallelMatcher(self.recipe_path, self.n_workers,
+                                                    fuzzy_threshold=self.fuzzy_threshold,
+                                                    ontology_path=ontology_path).start()
+        return self.parallel_matcher
+
+    def close(self):
+        if self.parallel_matcher is not None:
+            self.parallel_matcher.close()
+            self.parallel_matcher = None
+
+    def iter_matching_recipes(self, limit=None, offset=0):
+        # yields matching urls as they are found, in catalog order. Exact
+        # matching checks recipes one by one while reading them lazily, so no
+        # recipe file past the last requested match is opened; has_ingredient
+        # applies the same normalizer and ontology as the index, so the result
+        # is the same. Fuzzy matching needs the whole vocabulary, so it goes
+        # through the index, and worker shards are streamed in shard order.
+        if self.n_workers > 1:
+            matches = self.get_parallel_matcher().iter_matching_recipes(self.ingredients_available)
+        elif self.index is not None or self.fuzzy_threshold is not None:
+            matches = iter(self.get_index().get_matching_recipes(self.ingredients_available))
+        else:
+            matches = (recipe['url'] for recipe in self.iter_recipes()
+                       if self.has_all_ingredients(recipe['ingredients']))
+        stop = None if limit is None else offset + limit
+        yield from islice(matches, offset, stop)
+
+    def get_matching_recipes_batch(self, fridges):
+        # numpy is only needed for batch matching
+        from bitmap_matcher import BitmapMatcher
+        if self.bitmap_matcher is None:
+            self.bitmap_matcher = BitmapMatcher(self.get_index())
+        return self.bitmap_matcher.get_matching_recipes_batch(fridges)
+
+    def get_ranked_recipes(self, k=10):
+        return self.get_index().get_ranked_recipes(self.ingredients_available, k)
+
+    def get_index(self):
+        # the inverted index is built once per catalog load and reused across queries
+        if self.index is None:
+            self.index = IngredientIndex()
+            self.index.fuzzy_threshold = self.fuzzy_threshold
+            self.index.ontology = self.ontology
+            for recipe in self.iter_recipes():
+                self.index.add_recipe(recipe)
+        return self.index
+
+    def iter_recipes(self):
+        if self.catalog is not None:
+            yield from self.catalog
+        else:
+            for recipe_file_name in self.recipe_file_names:
+                yield from read_recipe_file(os.path.join(self.recipe_path, recipe_file_name))
 
     def has_all_ingredients(self,ingredients):
         n_ingredients = len(ingredients)
@@ -36,12 +118,14 @@ class Matcher:
         return n_ingredients == n_matches
 
     def has_ingredient(self,recipe_ingredient):
-        recipe_ingredient_lower = recipe_ingredient.lower()
+        recipe_ingredient_name = normalize_ingredient(recipe_ingredient)
         for ingredient in self.ingredients_available:
-            ingredient_lower = ingredient.lower()
+            ingredient_name = normalize_ingredient(ingredient)
             # Check if the fridge ingredient is contained in the recipe ingredient
             # or if the recipe ingredient is contained in the fridge ingredient
-            if ingredient_lower in recipe_ingredient_lower or recipe_ingredient_lower in ingredient_lower:
+            if ingredient_name in recipe_ingredient_name or recipe_ingredient_name in ingredient_name:
+                return True
+            if self.ontology and recipe_ingredient_name in self.ontology.get_satisfied(ingredient_name):
                 return True
         return False
 
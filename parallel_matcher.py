@@ -0,0 +1,104 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from ingredient_index import IngredientIndex
+from ingredient_ontology import load_ontology
+from recipe_catalog import CATALOG_PATH, PackedCatalog, is_catalog_current
+from recipe_store import count_recipe_file, list_recipe_files, read_recipe_range
+
+# Each worker process holds the index of its own shard for its whole life
+shard_index = None
+
+
+def load_shard(recipe_path, recipe_files, catalog_path, start, end, fuzzy_threshold=None,
+               ontology_path=None):
+    global shard_index
+    shard_index = IngredientIndex()
+    shard_index.fuzzy_threshold = fuzzy_threshold
+    if ontology_path:
+        shard_index.ontology = load_ontology(ontology_path)
+    if catalog_path:
+        # every worker maps the same catalog file, sharing its page-cache pages
+        catalog = PackedCatalog(catalog_path)
+        for recipe_id in range(start, end):
+            shard_index.add_recipe(catalog.get_recipe(recipe_id))
+    else:
+        # (file name, number of recipes) pairs; only the files overlapping
+        # the shard's recipe range are read
+        offset = 0
+        for recipe_file_name, n_file_recipes in recipe_files:
+            if offset < end and offset + n_file_recipes > start:
+                for recipe in read_recipe_range(os.path.join(recipe_path, recipe_file_name),
+                                                max(start - offset, 0), min(end - offset, n_file_recipes)):
+                    shard_index.add_recipe(recipe)
+            offset += n_file_recipes
+    return end - start
+
+
+def match_shard(fridge_ingredients):
+    return shard_index.get_matching_recipes(fridge_ingredients)
+
+
+class ParallelMatcher:
+    # Shards the catalog into contiguous ranges, one warm worker process per
+    # shard. Results are concatenated in shard order, which keeps the output
+    # identical to a single-process scan of the same catalog. Without a
+    # catalog, the recipes of every file are counted first and ranges are
+    # taken over recipes across files, so a few large shards are still split
+    # evenly between the workers.
+    def __init__(self, recipe_path="Recipes/", n_workers=None, catalog_path=CATALOG_PATH, fuzzy_threshold=None,
+                 ontology_path=None):
+        self.recipe_path = recipe_path
+        self.fuzzy_threshold = fuzzy_threshold
+        self.ontology_path = ontology_path
+        self.n_workers = n_workers or os.cpu_count()
+        if catalog_path and is_catalog_current(recipe_path, catalog_path):
+            self.catalog_path = catalog_path
+            self.recipe_files = []
+            catalog = PackedCatalog(catalog_path)
+            n_recipes = len(catalog)
+            catalog.close()
+        else:
+            self.catalog_path = None
+            self.recipe_files = [(recipe_file_name, count_recipe_file(os.path.join(recipe_path, recipe_file_name)))
+                                 for recipe_file_name in list_recipe_files(recipe_path)]
+            n_recipes = sum(n_file_recipes for _, n_file_recipes in self.recipe_files)
+        shard_size = -(-n_recipes // self.n_workers) if n_recipes else 0
+        self.shards = [(start, min(start + shard_size, n_recipes))
+                       for start in range(0, n_recipes, shard_size or 1)]
+        self.executors = []
+
+    def start(self):
+        # one single-process executor per shard, so a shard always lands on the worker that loaded it
+        if not self.executors:
+            self.executors = [ProcessPoolExecutor(max_workers=1) for _ in self.shards]
+            futures = [executor.submit(load_shard, self.recipe_path, self.recipe_files,
+                                       self.catalog_path, start, end, self.fuzzy_threshold,
+                                       self.ontology_path)
+                       for executor, (start, end) in zip(self.executors, self.shards)]
+            for future in futures:
+                future.result()
+        return self
+
+    def get_matching_recipes(self, fridge_ingredients):
+        return list(self.iter_matching_recipes(fridge_ingredients))
+
+    def iter_matching_recipes(self, fridge_ingredients):
+        # every shard is queried at once; the matches of each one are yielded
+        # as soon as it and the shards before it are done
+        self.start()
+        fridge_ingredients = list(fridge_ingredients)
+        futures = [executor.submit(match_shard, fridge_ingredients) for executor in self.executors]
+        for future in futures:
+            yield from future.result()
+
+    def close(self):
+        for executor in self.executors:
+            executor.shutdown()
+        self.executors = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Offline recipe extraction from the raw page store.
+
+Re-runs find_ingredients / get_quantity_udm and the other extractors over
+every page kept in RawPages/ by the crawler, on a process pool and with no
+network access, and writes the results to new recipe shards in Recipes/.
+Once the new shards are published, the recipes they replace are dropped
+from the older shards and legacy JSON files.
+
+Usage:
+    python3 parse_pipeline.py --workers 8
+"""
+
+import argparse
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+
+from raw_store import RAW_STORE_PATH, RawStore
+from recipe_store import ShardWriter, is_shard, list_recipe_files, read_recipe_file
+from scraper import parse_recipe
+from selector_plan import make_soup
+
+# Each worker opens the store once
+store = None
+
+
+def open_store(store_path):
+    global store
+    store = RawStore(store_path)
+
+
+def parse_chunk(urls):
+    recipes = []
+    for url in urls:
+        model_recipe = parse_recipe(make_soup(store.get(url)), url)
+        if model_recipe is not None:
+            recipes.append(model_recipe)
+    return recipes
+
+
+def reparse_store(store_path=RAW_STORE_PATH, recipe_path="Recipes", n_workers=None, chunk_size=200):
+    urls = RawStore(store_path).urls()
+    chunks = [urls[start:start + chunk_size] for start in range(0, len(urls), chunk_size)]
+    writer = ShardWriter(recipe_path)
+    # shards recovered from a crashed crawl are replaced like any other
+    writer.recover_partial_shards()
+    old_file_names = list_recipe_files(recipe_path)
+    reparsed_urls = set()
+    with ProcessPoolExecutor(n_workers, initializer=open_store, initargs=(store_path,)) as executor:
+        # map keeps chunk order, so the output does not depend on worker timing
+        for recipes in executor.map(parse_chunk, chunks):
+            for model_recipe in recipes:
+                recipe = model_recipe.to_dictionary()
+                writer.write(recipe)
+                reparsed_urls.add(recipe["url"])
+    replace_recipes(recipe_path, old_file_names, reparsed_urls, writer)
+    print(f"Re-extracted {len(reparsed_urls)} recipes from {len(urls)} stored pages.")
+    return len(reparsed_urls)
+
+
+def replace_recipes(recipe_path, old_file_names, reparsed_urls, writer):
+    # Recipes of old shards without a stored page are carried over to the new
+    # shards before the old ones are removed, so a crash can duplicate a recipe
+    # but never lose one
+    obsolete_paths = []
+    for file_name in old_file_names:
+        path = os.path.join(recipe_path, file_name)
+        if is_shard(file_name):
+            for recipe in read_recipe_file(path):
+                if recipe["url"] not in reparsed_urls:
+                    writer.write(recipe)
+            obsolete_paths.append(path)
+        elif all(recipe["url"] in reparsed_urls for recipe in read_recipe_file(path)):
+            obsolete_paths.append(path)
+    writer.close()
+    for path in obsolete_paths:
+        os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--store', default=RAW_STORE_PATH)
+    parser.add_argument('--recipes', default="Recipes")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=200)
+    args = parser.parse_args()
+    reparse_store(args.store, args.recipes, args.workers, args.chunk_size)
+
+
+if __name__ == '__main__':
+    main()
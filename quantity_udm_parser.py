@@ -3,7 +3,17 @@ udm = ['g','kg','l','ml']
 QUANTITY_UDM = r'(\d{1,4}(?:,\d{1,2})?)\s(g|kg|ml|l|cl|cc)'
 QUANTITY_ONLY =  r'\b(\d{1,2})\b'
 PARENTHESIS = r"\s*\([^)]*\)"
+# base unit and conversion factor for every unit QUANTITY_UDM can extract
+BASE_UDM = {'g': ('g', 1), 'kg': ('g', 1000), 'ml': ('ml', 1), 'cl': ('ml', 10), 'l': ('ml', 1000), 'cc': ('ml', 1)}
 def get_quantity_udm(quantity_raw):
+    quantity, udm = parse_quantity_udm(quantity_raw)
+    if quantity is None:
+        # exceptions
+        return [1,'g']
+    return [quantity, udm]
+
+def parse_quantity_udm(quantity_raw):
+    # like get_quantity_udm, but [None, None] when no quantity can be read ("q.b.", "")
     # remove parenthesis if any
     quantity_raw = remove_parentheses(quantity_raw)
     # get quantity and udm
@@ -16,8 +26,18 @@ def get_quantity_udm(quantity_raw):
     quantity_only_match = re.search(QUANTITY_ONLY, quantity_raw, re.IGNORECASE)
     if quantity_only_match:
         return [float(quantity_only_match.group(1)),None]
-    # exceptions
-    return [1,'g']
+    return [None, None]
 
 def remove_parentheses(text):
-    return re.sub(PARENTHESIS, "", text).strip()
\ No newline at end of file
+    return re.sub(PARENTHESIS, "", text).strip()
+
+def to_base_unit(quantity, udm):
+    # quantities without a unit are piece counts and stay as they are
+    if quantity is None:
+        return [None, None]
+    if udm is None:
+        return [float(quantity), None]
+    if udm.lower() not in BASE_UDM:
+        return [None, None]
+    base_udm, factor = BASE_UDM[udm.lower()]
+    return [float(quantity) * factor, base_udm]
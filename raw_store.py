@@ -0,0 +1,56 @@
+import gzip
+import json
+import os
+import threading
+import time
+
+RAW_STORE_PATH = "RawPages"
+
+
+class RawStore:
+    # Append-only store of raw fetched pages. Every page is one gzip member
+    # appended to pages.dat; index.jsonl gets one line per page with its URL,
+    # byte offset and length. The data is written before its index line, so a
+    # crash can at worst leave unindexed bytes behind, never a broken entry.
+    # When a URL is stored again the latest entry wins.
+    def __init__(self, store_path=RAW_STORE_PATH):
+        os.makedirs(store_path, exist_ok=True)
+        self.data_path = os.path.join(store_path, "pages.dat")
+        self.index_path = os.path.join(store_path, "index.jsonl")
+        self.lock = threading.Lock()
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r") as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # a line cut short by a crash
+                        continue
+                    self.index[entry["url"]] = (entry["offset"], entry["length"])
+
+    def put(self, url, html):
+        record = gzip.compress(html.encode("utf-8"))
+        with self.lock:
+            with open(self.data_path, "ab") as data_file:
+                offset = data_file.seek(0, os.SEEK_END)
+                data_file.write(record)
+            with open(self.index_path, "a") as index_file:
+                index_file.write(json.dumps({"url": url, "offset": offset, "length": len(record),
+                                             "fetched_at": int(time.time())}) + "\n")
+            self.index[url] = (offset, len(record))
+
+    def get(self, url):
+        offset, length = self.index[url]
+        with open(self.data_path, "rb") as data_file:
+            data_file.seek(offset)
+            return gzip.decompress(data_file.read(length)).decode("utf-8")
+
+    def urls(self):
+        return list(self.index)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, url):
+        return url in self.index
@@ -0,0 +1,210 @@
+import hashlib
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from recipe_store import iter_recipes, list_recipe_files
+
+CATALOG_PATH = "recipes.catalog"
+MAGIC = b"ISPCAT02"
+NONE = 0xFFFFFFFF
+# magic, byte order, fingerprint of the source files, counts, then the byte
+# position of every section
+HEADER = struct.Struct("<8s8s16s10Q")
+# fingerprint of a catalog built from recipes that did not come from a folder
+NO_SOURCE = bytes(16)
+ALIGNMENT = 8
+
+# Layout of a packed catalog (all arrays in native byte order):
+#   string_offsets  uint32[n_strings + 1]  offsets into the string blob
+#   strings         utf-8 blob of every distinct string, interned once
+#   recipe_fields   uint32[n_recipes * 4]  title, category, url, n_people string ids
+#   entry_offsets   uint32[n_recipes + 1]  first ingredient entry of each recipe
+#   entry_names     uint32[n_entries]      ingredient name string ids
+#   entry_udms      uint32[n_entries]      unit string ids (NONE when missing)
+#   entry_quantities float64[n_entries]    quantities (nan when missing)
+RECIPE_FIELDS = ("title", "category", "url", "n_people")
+
+
+class StringTable:
+    def __init__(self):
+        self.ids = {}
+        self.offsets = array("I", [0])
+        self.blob = bytearray()
+
+    def intern(self, text):
+        if text is None:
+            return NONE
+        text = str(text)
+        string_id = self.ids.get(text)
+        if string_id is None:
+            string_id = len(self.ids)
+            self.ids[text] = string_id
+            self.blob += text.encode("utf-8")
+            self.offsets.append(len(self.blob))
+        return string_id
+
+
+def iter_recipe_files(recipe_path):
+    # recipe shards and legacy per-recipe JSON files alike
+    return iter_recipes(recipe_path)
+
+
+def source_fingerprint(recipe_path):
+    # names, sizes and modification times of the files a catalog is built
+    # from; any scrape, re-extraction or manual edit changes it
+    digest = hashlib.blake2b(digest_size=16)
+    for file_name in list_recipe_files(recipe_path):
+        stat = os.stat(os.path.join(recipe_path, file_name))
+        digest.update(f"{file_name}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode("utf-8"))
+    return digest.digest()
+
+
+def build_catalog(recipe_path="Recipes/", catalog_path=CATALOG_PATH, recipes=None):
+    if recipes is None:
+        # taken before reading, so files changed during the build leave the catalog stale
+        fingerprint = source_fingerprint(recipe_path)
+        recipes = iter_recipe_files(recipe_path)
+    else:
+        fingerprint = NO_SOURCE
+    strings = StringTable()
+    recipe_fields = array("I")
+    entry_offsets = array("I", [0])
+    entry_names = array("I")
+    entry_udms = array("I")
+    entry_quantities = array("d")
+    n_recipes = 0
+    for recipe in recipes:
+        for field in RECIPE_FIELDS:
+            recipe_fields.append(strings.intern(recipe.get(field)))
+        for ingredient in recipe.get("ingredients", []):
+            quantity = ingredient[1] if len(ingredient) > 1 else None
+            udm = ingredient[2] if len(ingredient) > 2 else None
+            entry_names.append(strings.intern(ingredient[0]))
+            entry_udms.append(strings.intern(udm))
+            entry_quantities.append(math.nan if quantity is None else float(quantity))
+        entry_offsets.append(len(entry_names))
+        n_recipes += 1
+
+    sections = [strings.offsets, bytes(strings.blob), recipe_fields, entry_offsets,
+                entry_names, entry_udms, entry_quantities]
+    positions = []
+    position = HEADER.size
+    for section in sections:
+        position = align(position)
+        positions.append(position)
+        position += len(section_bytes(section))
+    header = HEADER.pack(MAGIC, sys.byteorder.encode().ljust(8), fingerprint, n_recipes,
+                         len(entry_names), len(strings.ids), *positions)
+
+    # write next to the target and rename, so processes mapping the old file keep a consistent view
+    temporary_path = catalog_path + ".tmp"
+    with open(temporary_path, "wb") as file:
+        file.write(header)
+        for section, position in zip(sections, positions):
+            file.write(b"\0" * (position - file.tell()))
+            file.write(section_bytes(section))
+    os.replace(temporary_path, catalog_path)
+    return n_recipes
+
+
+def align(position):
+    return (position + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def section_bytes(section):
+    return section.tobytes() if isinstance(section, array) else section
+
+
+class PackedCatalog:
+    # Read-only view over a packed catalog. The file is mmapped and the arrays
+    # are memoryview casts over the mapping, so nothing is copied at load time
+    # and every process opening the same file shares its page-cache pages.
+    def __init__(self, catalog_path=CATALOG_PATH):
+        with open(catalog_path, "rb") as file:
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.buffer)
+        (magic, byte_order, self.fingerprint, self.n_recipes, self.n_entries, n_strings, string_offsets_pos,
+         strings_pos, recipe_fields_pos, entry_offsets_pos, entry_names_pos, entry_udms_pos,
+         entry_quantities_pos) = HEADER.unpack_from(self.view)
+        if magic != MAGIC:
+            raise ValueError(f"{catalog_path} is not a packed recipe catalog")
+        if byte_order.rstrip() != sys.byteorder.encode():
+            raise ValueError(f"{catalog_path} was built on a {byte_order.decode().strip()}-endian host")
+        self.string_offsets = self.cast(string_offsets_pos, n_strings + 1, "I")
+        self.strings = self.view[strings_pos:strings_pos + self.string_offsets[n_strings]]
+        self.recipe_fields = self.cast(recipe_fields_pos, self.n_recipes * len(RECIPE_FIELDS), "I")
+        self.entry_offsets = self.cast(entry_offsets_pos, self.n_recipes + 1, "I")
+        self.entry_names = self.cast(entry_names_pos, self.n_entries, "I")
+        self.entry_udms = self.cast(entry_udms_pos, self.n_entries, "I")
+        self.entry_quantities = self.cast(entry_quantities_pos, self.n_entries, "d")
+
+    def cast(self, position, length, typecode):
+        size = array(typecode).itemsize
+        return self.view[position:position + length * size].cast(typecode)
+
+    def close(self):
+        for name in ("string_offsets", "strings", "recipe_fields", "entry_offsets",
+                     "entry_names", "entry_udms", "entry_quantities", "view"):
+            getattr(self, name).release()
+        self.buffer.close()
+
+    def __len__(self):
+        return self.n_recipes
+
+    def __iter__(self):
+        for recipe_id in range(self.n_recipes):
+            yield self.get_recipe(recipe_id)
+
+    def get_string(self, string_id):
+        if string_id == NONE:
+            return None
+        return str(self.strings[self.string_offsets[string_id]:self.string_offsets[string_id + 1]], "utf-8")
+
+    def get_field(self, recipe_id, field):
+        return self.get_string(self.recipe_fields[recipe_id * len(RECIPE_FIELDS) + RECIPE_FIELDS.index(field)])
+
+    def get_ingredients(self, recipe_id):
+        ingredients = []
+        for entry in range(self.entry_offsets[recipe_id], self.entry_offsets[recipe_id + 1]):
+            quantity = self.entry_quantities[entry]
+            ingredients.append([self.get_string(self.entry_names[entry]),
+                                None if math.isnan(quantity) else quantity,
+                                self.get_string(self.entry_udms[entry])])
+        return ingredients
+
+    def get_recipe(self, recipe_id):
+        start = recipe_id * len(RECIPE_FIELDS)
+        recipe = {field: self.get_string(self.recipe_fields[start + i]) for i, field in enumerate(RECIPE_FIELDS)}
+        recipe["ingredients"] = self.get_ingredients(recipe_id)
+        return recipe
+
+
+def is_catalog_current(recipe_path="Recipes/", catalog_path=CATALOG_PATH):
+    # a catalog from an older format or built before the recipe files last changed is stale
+    if not os.path.exists(catalog_path):
+        return False
+    try:
+        catalog = PackedCatalog(catalog_path)
+    except (ValueError, struct.error):
+        return False
+    fingerprint = catalog.fingerprint
+    catalog.close()
+    return fingerprint == source_fingerprint(recipe_path)
+
+
+def load_catalog(catalog_path=CATALOG_PATH, recipe_path=None):
+    # with recipe_path, a stale catalog is ignored and None returned
+    if recipe_path is not None and not is_catalog_current(recipe_path, catalog_path):
+        return None
+    if os.path.exists(catalog_path):
+        return PackedCatalog(catalog_path)
+    return None
+
+
+if __name__ == '__main__':
+    n_recipes = build_catalog()
+    print(f"Packed {n_recipes} recipes into {CATALOG_PATH}.")
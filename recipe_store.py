@@ -0,0 +1,205 @@
+import fcntl
+import gzip
+import json
+import os
+import threading
+import zlib
+from itertools import islice
+
+SHARD_PREFIX = "recipes-"
+SHARD_SUFFIX = ".jsonl.gz"
+PARTIAL_SUFFIX = ".tmp"
+RECOVERY_SUFFIX = ".recovering"
+SHARD_MAX_BYTES = 16 * 1024 * 1024
+
+
+def is_shard(file_name):
+    return file_name.startswith(SHARD_PREFIX) and file_name.endswith(SHARD_SUFFIX)
+
+
+def list_recipe_files(folder):
+    # published shards plus legacy one-recipe JSON files, in a stable order
+    return sorted(file_name for file_name in os.listdir(folder)
+                  if is_shard(file_name) or file_name.endswith(".json"))
+
+
+def read_recipe_file(path):
+    if path.endswith(SHARD_SUFFIX):
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            for line in file:
+                yield json.loads(line)
+    else:
+        with open(path, "r", encoding="utf-8") as file:
+            yield json.load(file)
+
+
+def count_recipe_file(path):
+    # number of recipes in a file, counted without decoding them
+    if path.endswith(SHARD_SUFFIX):
+        with gzip.open(path, "rb") as file:
+            return sum(1 for _ in file)
+    return 1
+
+
+def read_recipe_range(path, start, end):
+    # recipes start..end-1 of a file; the lines before start are skipped undecoded
+    if path.endswith(SHARD_SUFFIX):
+        with gzip.open(path, "rb") as file:
+            for line in islice(file, start, end):
+                yield json.loads(line)
+    elif start == 0 and end > 0:
+        yield from read_recipe_file(path)
+
+
+def iter_recipes(folder):
+    # streams every recipe of a folder sequentially, one shard at a time
+    for file_name in list_recipe_files(folder):
+        yield from read_recipe_file(os.path.join(folder, file_name))
+
+
+def encode_recipe(recipe):
+    return (json.dumps(recipe, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def read_partial_shard(path):
+    # complete lines of a shard left behind by a crash; its gzip stream may be cut short
+    recipes = []
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            for line in file:
+                if not line.endswith("\n"):
+                    break
+                recipes.append(json.loads(line))
+    except (EOFError, OSError, zlib.error, json.JSONDecodeError):
+        pass
+    return recipes
+
+
+class ShardWriter:
+    # Append-only writer of gzip JSON-lines shards. The shard being filled is
+    # written under a .tmp name and published under its final name once it
+    # reaches max_shard_bytes or the writer is closed, so readers only ever
+    # see complete shards. Every recipe is flushed, so the lines of an unfinished
+    # shard survive a crash and are published by recover_partial_shards. The
+    # writer holds an exclusive lock on its .tmp file, so recovery never
+    # touches a shard that another live process is still filling.
+    def __init__(self, folder, max_shard_bytes=SHARD_MAX_BYTES):
+        self.folder = folder
+        self.max_shard_bytes = max_shard_bytes
+        self.lock = threading.Lock()
+        self.file = None
+        self.raw_file = None
+        self.path = None
+        self.shard_bytes = 0
+        os.makedirs(folder, exist_ok=True)
+        shard_numbers = [int(file_name[len(SHARD_PREFIX):].split(".")[0])
+                         for file_name in os.listdir(folder)
+                         if file_name.startswith(SHARD_PREFIX) and file_name[len(SHARD_PREFIX)].isdigit()]
+        self.next_shard_number = max(shard_numbers, default=-1) + 1
+
+    def recover_partial_shards(self):
+        # The complete lines of a shard left behind by a crash are published
+        # under that shard's own name, and the .tmp file is removed only once
+        # they are in place, so a crash during recovery neither loses nor
+        # duplicates a recipe
+        for file_name in sorted(os.listdir(self.folder)):
+            if file_name.startswith(SHARD_PREFIX) and file_name.endswith(PARTIAL_SUFFIX):
+                partial_path = os.path.join(self.folder, file_name)
+                try:
+                    partial_file = open(partial_path, "rb")
+                except FileNotFoundError:
+                    # published or recovered by another process meanwhile
+                    continue
+                with partial_file:
+                    try:
+                        fcntl.flock(partial_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        # still being written by a live writer
+                        continue
+                    # the lock only covers the file that was opened, which a
+                    # writer may have published or renamed meanwhile
+                    try:
+                        if os.stat(partial_path).st_ino != os.fstat(partial_file.fileno()).st_ino:
+                            continue
+                    except FileNotFoundError:
+                        continue
+                    self.recover_partial_shard(partial_path)
+
+    def recover_partial_shard(self, partial_path):
+        path = partial_path[:-len(PARTIAL_SUFFIX)]
+        if not os.path.exists(path):
+            recipes = read_partial_shard(partial_path)
+            if recipes:
+                with gzip.open(path + RECOVERY_SUFFIX, "wb") as file:
+                    for recipe in recipes:
+                        file.write(encode_recipe(recipe))
+                os.replace(path + RECOVERY_SUFFIX, path)
+        os.remove(partial_path)
+
+    def write(self, recipe):
+        line = encode_recipe(recipe)
+        with self.lock:
+            if self.file is None:
+                self.open_shard()
+            self.file.write(line)
+            self.file.flush()
+            self.shard_bytes += len(line)
+            if self.shard_bytes >= self.max_shard_bytes:
+                self.publish()
+
+    def open_shard(self):
+        self.path, self.raw_file = self.claim_shard()
+        self.file = gzip.GzipFile(fileobj=self.raw_file, mode="wb")
+        self.shard_bytes = 0
+
+    def claim_shard(self):
+        # The first number with neither a published shard nor a .tmp file is
+        # claimed by creating its .tmp exclusively, so writers sharing the
+        # folder (a crawler and parse_pipeline.py) never pick the same shard
+        while True:
+            file_name = f"{SHARD_PREFIX}{self.next_shard_number:05d}{SHARD_SUFFIX}"
+            self.next_shard_number += 1
+            path = os.path.join(self.folder, file_name)
+            if os.path.exists(path):
+                continue
+            try:
+                fd = os.open(path + PARTIAL_SUFFIX, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+            except FileExistsError:
+                continue
+            raw_file = os.fdopen(fd, "wb")
+            fcntl.flock(raw_file, fcntl.LOCK_EX)
+            try:
+                # an empty .tmp is taken for a crashed one until it is locked
+                claimed = os.stat(path + PARTIAL_SUFFIX).st_ino == os.fstat(fd).st_ino
+            except FileNotFoundError:
+                claimed = False
+            if claimed and os.path.exists(path):
+                # published by the writer that held the number until just now
+                os.remove(path + PARTIAL_SUFFIX)
+                claimed = False
+            if claimed:
+                return path, raw_file
+            raw_file.close()
+
+    def publish(self):
+        self.file.close()
+        # linked rather than renamed, so a shard published under the same name
+        # by another writer is never replaced; the lock goes with the file handle
+        while True:
+            try:
+                os.link(self.path + PARTIAL_SUFFIX, self.path)
+                break
+            except FileExistsError:
+                path, claimed_file = self.claim_shard()
+                os.replace(self.path + PARTIAL_SUFFIX, path + PARTIAL_SUFFIX)
+                claimed_file.close()
+                self.path = path
+        os.remove(self.path + PARTIAL_SUFFIX)
+        self.raw_file.close()
+        self.file = None
+        self.raw_file = None
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.publish()
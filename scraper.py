@@ -1,17 +1,26 @@
-import json
 import os
 import re
 import sys
+import time
+from urllib.parse import urljoin
 import requests
-from bs4 import BeautifulSoup
 from tqdm import tqdm
 
 sys.path.append(os.path.abspath(".."))
 
+from crawl_metrics import get_metrics
+from crawl_state import CRAWL_STATE_PATH, CrawlState, canonicalize_url
+from http_session import get_session
 from model_recipe import ModelRecipe
 from quantity_udm_parser import get_quantity_udm
+from raw_store import RAW_STORE_PATH, RawStore
+from recipe_store import ShardWriter, iter_recipes
+from selector_plan import SelectorPlan, make_soup
 
 debug = False
+# fetch_page retries, with exponential backoff starting at RETRY_DELAY seconds
+MAX_RETRIES = 3
+RETRY_DELAY = 2
 
 class Scraper:
     def __init__(self):
@@ -20,136 +29,213 @@ class Scraper:
         # Ensure the Recipes directory exists
         if not os.path.exists(self.folder_recipes):
             os.makedirs(self.folder_recipes)
+        self.crawl_state = CrawlState(CRAWL_STATE_PATH)
+        self.raw_store = RawStore(RAW_STORE_PATH)
+        # Recipes are appended to rolling gzip JSON-lines shards; shards left
+        # behind by a crashed crawl are recovered when a crawl starts
+        self.recipe_store = ShardWriter(self.folder_recipes)
+        # Politeness delays, in seconds
+        self.request_delay = 0.5
+        self.page_delay = 1
+        self.cautious_pause = 300
+        self.cautious_pause_every = 40
 
     def download_cookbook(self):
+        self.recipe_store.recover_partial_shards()
+        self.seed_crawl_state()
         total_pages = self.count_total_pages() + 1
         total_recipes_processed = 0
         total_recipes_saved = 0
+        total_recipes_skipped = 0
         for page_number in tqdm(range(1, total_pages), desc="pages…", ascii=False, ncols=75):
+            # Resume: pages finished by a previous run are not requested again
+            if self.crawl_state.is_page_completed(page_number):
+                continue
             print(f"\nProcessing page {page_number}/{total_pages-1}...")
             
             # Cautious strategy: Sleep for 5 minutes every 40 pages to avoid being blocked
-            if page_number > 1 and page_number % 40 == 0:
-                print(f"\n⚠️  Cautious pause: Sleeping for 5 minutes after processing {page_number} pages...")
-                import time
-                time.sleep(300)  # 5 minutes = 300 seconds
+            if page_number > 1 and page_number % self.cautious_pause_every == 0:
+                print(f"\n⚠️  Cautious pause: Sleeping for {self.cautious_pause} seconds after processing {page_number} pages...")
+                self.pause(self.cautious_pause, "cautious")
                 print("Resuming scraping...")
             
-            # New URL structure: /page2/ instead of /page/2
-            if page_number == 1:
-                link_list = self.cookbook_url
-            else:
-                link_list = self.cookbook_url + '/page' + str(page_number) + '/'
-            if debug:
-                print(f"Requesting URL: {link_list}")
-            response = requests.get(link_list)
-            soup = BeautifulSoup(response.text, "html.parser")
             page_recipes = 0
-            # Look for individual recipe links on the main listing page
-            # The main listing pages contain recipe cards with individual recipe links
-            # Try to find the recipe cards and extract their links
-            recipe_links = []
-            
-            # Method 1: Look for recipe cards with links
-            recipe_cards = soup.find_all(['article', 'div'], class_=lambda x: x and ('recipe' in x.lower() or 'card' in x.lower()))
-            for card in recipe_cards:
-                link_elem = card.find('a')
-                if link_elem and link_elem.get('href'):
-                    href = link_elem.get('href')
-                    if href and not href.startswith('#'):
-                        if href.startswith('/'):
-                            href = 'https://www.giallozafferano.it' + href
-                        recipe_links.append(href)
-            
-            # Method 2: If no recipe cards found, look for any links that might be recipes
+            # A page interrupted by a crash still has its links in the frontier
+            recipe_links = self.crawl_state.get_frontier(page_number)
             if not recipe_links:
-                all_links = soup.find_all('a')
-                for link in all_links:
-                    href = link.get('href')
-                    if href and not href.startswith('#') and not href.startswith('javascript:'):
-                        # Look for recipe-like URLs
-                        if '/ricette/' in href or href.endswith('.html'):
-                            if href.startswith('/'):
-                                href = 'https://www.giallozafferano.it' + href
-                            recipe_links.append(href)
-            
-            # Remove duplicates
-            recipe_links = list(set(recipe_links))
+                recipe_links = self.download_page_links(page_number)
+                self.crawl_state.add_to_frontier(page_number, recipe_links)
+                # The newest recipe marks where the next incremental crawl can stop
+                if page_number == 1 and recipe_links:
+                    self.crawl_state.set_meta("watermark_url", recipe_links[0])
             
             print(f"Page {page_number}: Found {len(recipe_links)} recipe links")
-            for i, recipe_link in enumerate(recipe_links):
+            n_requests = 0
+            for recipe_link in recipe_links:
+                # Known URLs are skipped before any request is made
+                if self.crawl_state.is_seen(recipe_link):
+                    total_recipes_skipped += 1
+                    get_metrics().inc("recipes_total", outcome="known")
+                    self.crawl_state.remove_from_frontier(recipe_link)
+                    continue
                 # Add a small delay between requests to be respectful to the website
-                if i > 0:
-                    import time
-                    time.sleep(0.5)  # 500ms delay between requests
+                if n_requests > 0:
+                    self.pause(self.request_delay, "request")
+                n_requests += 1
                 
-                # Check if this is an actual recipe link (not a category page)
-                if '/ricette/' in recipe_link or recipe_link.endswith('.html'):
-                    total_recipes_processed += 1
-                    if self.save_recipe(recipe_link):
-                        total_recipes_saved += 1
-                        page_recipes += 1
-                else:
-                    # Skip category pages
-                    if i < 2:
-                        print(f"Skipping category page: {recipe_link}")
+                total_recipes_processed += 1
+                saved = self.save_recipe(recipe_link)
+                self.crawl_state.mark_seen(recipe_link, saved)
+                if saved:
+                    total_recipes_saved += 1
+                    page_recipes += 1
+            self.crawl_state.complete_page(page_number)
+            get_metrics().inc("pages_total")
             print(f"Page {page_number}: {page_recipes} recipes saved")
             
             # Add a delay between pages to be respectful to the website
             if page_number < total_pages - 1:
-                import time
-                time.sleep(1)  # 1 second delay between pages
+                self.pause(self.page_delay, "page")
         
         print(f"Total recipes processed: {total_recipes_processed}")
         print(f"Total recipes saved: {total_recipes_saved}")
+        print(f"Total recipes skipped (already known): {total_recipes_skipped}")
+        print(get_session().report())
+        # The next crawl starts again from the first page; seen URLs are kept
+        self.crawl_state.reset_pages()
+        self.recipe_store.close()
+        get_metrics().write()
         print("Scraping completed.")
 
+    def download_new_recipes(self, stop_after_known=40):
+        # Incremental crawl: listing pages are ordered newest first, so walk them
+        # until the newest recipe of the previous run (the watermark) or a run of
+        # `stop_after_known` consecutive known links is reached
+        self.recipe_store.recover_partial_shards()
+        self.seed_crawl_state()
+        watermark = self.crawl_state.get_meta("watermark_url")
+        watermark = canonicalize_url(watermark) if watermark else None
+        total_pages = self.count_total_pages()
+        consecutive_known = 0
+        total_recipes_saved = 0
+        # (link, saved or already known) for every link walked, newest first
+        walked_links = []
+        reached_known = False
+        page_number = 0
+        while page_number < total_pages and not reached_known:
+            # Add a delay between pages to be respectful to the website
+            if page_number > 0:
+                self.pause(self.page_delay, "page")
+            page_number += 1
+            recipe_links = self.download_page_links(page_number)
+            for recipe_link in recipe_links:
+                if canonicalize_url(recipe_link) == watermark:
+                    reached_known = True
+                    break
+                if self.crawl_state.is_seen(recipe_link):
+                    get_metrics().inc("recipes_total", outcome="known")
+                    walked_links.append((recipe_link, True))
+                    consecutive_known += 1
+                    if consecutive_known >= stop_after_known:
+                        reached_known = True
+                        break
+                    continue
+                consecutive_known = 0
+                self.pause(self.request_delay, "request")
+                saved = self.save_recipe(recipe_link)
+                self.crawl_state.mark_seen(recipe_link, saved)
+                walked_links.append((recipe_link, saved))
+                if saved:
+                    total_recipes_saved += 1
+        new_watermark = find_watermark(walked_links)
+        if new_watermark:
+            self.crawl_state.set_meta("watermark_url", new_watermark)
+        self.crawl_state.set_meta("watermark_time", int(time.time()))
+        self.recipe_store.close()
+        get_metrics().write()
+        print(f"Incremental crawl: {total_recipes_saved} new recipes saved from {page_number} pages")
+        print(get_session().report())
+        return total_recipes_saved
+
+    def download_page_links(self, page_number):
+        link_list = self.page_url(page_number)
+        if debug:
+            print(f"Requesting URL: {link_list}")
+        response = get_session().get(link_list)
+        soup = make_soup(response.text)
+        recipe_links = []
+        for i, recipe_link in enumerate(find_recipe_links(soup, link_list)):
+            # Check if this is an actual recipe link (not a category page)
+            if is_recipe_link(recipe_link):
+                recipe_links.append(recipe_link)
+            elif i < 2:
+                # Skip category pages
+                print(f"Skipping category page: {recipe_link}")
+        return recipe_links
+
+    def seed_crawl_state(self):
+        # Recipes saved before the crawl state existed count as already seen
+        if self.crawl_state.count_seen() > 0:
+            return
+        urls = [recipe["url"] for recipe in iter_recipes(self.folder_recipes)]
+        self.crawl_state.seed_seen(urls)
+
     def count_total_pages(self):
-        number_of_pages = 0
-        response = requests.get(self.cookbook_url)
-        soup = BeautifulSoup(response.text, "html.parser")
-        for tag in soup.find_all(attrs={"class": "disabled total-pages"}):
-            number_of_pages = int(tag.text)
-        return number_of_pages
+        response = get_session().get(self.cookbook_url)
+        soup = make_soup(response.text)
+        return find_total_pages(soup)
+
+    def page_url(self, page_number):
+        # New URL structure: /page2/ instead of /page/2
+        if page_number == 1:
+            return self.cookbook_url
+        return self.cookbook_url + '/page' + str(page_number) + '/'
+
+    def pause(self, seconds, reason):
+        if seconds > 0:
+            time.sleep(seconds)
+            get_metrics().inc("sleep_seconds_total", seconds, reason=reason)
 
     def save_recipe(self, link_recipe_to_download):
-        soup = download_page(link_recipe_to_download)
-        ingredients = find_ingredients(soup)
-        title = find_title(soup)
-        if debug:
-            print(f"Processing: {title} - Found {len(ingredients)} ingredients")
-            if len(ingredients) == 0:
-                print(f"No ingredients found for: {title}")
-        if ingredients:
-            category = find_category(soup)
-            n_people = find_n_people(soup)
-
-            file_path = self.calculate_file_path(title)
-            if os.path.exists(file_path):
-                return False
-
-            model_recipe = ModelRecipe()
-            model_recipe.title = title
-            model_recipe.ingredients = ingredients
-            model_recipe.category = category
-            model_recipe.url = link_recipe_to_download
-            model_recipe.n_people = n_people
-
-            create_file_json(model_recipe.to_dictionary(), file_path)
-            return True
-        return False
-
-    def calculate_file_path(self, title):
-        compact_name = title.replace(" ", "_").lower()
-        return self.folder_recipes + "/" + compact_name + ".json"
+        # Recipes already saved are skipped by the crawl state before any request,
+        # so a page answered 304 is one that was never saved: its cached body is parsed
+        response = fetch_page(link_recipe_to_download)
+        return self.save_recipe_html(response.text, link_recipe_to_download)
+
+    def save_recipe_html(self, html, link_recipe_to_download):
+        metrics = get_metrics()
+        # Keep the raw page, so extraction can be re-run offline without re-crawling
+        with metrics.timer("store_seconds", target="raw"):
+            self.raw_store.put(link_recipe_to_download, html)
+        with metrics.timer("parse_seconds"):
+            model_recipe = parse_recipe(make_soup(html), link_recipe_to_download)
+        saved = False
+        if model_recipe is not None:
+            with metrics.timer("store_seconds", target="recipe"):
+                saved = self.write_recipe(model_recipe)
+        metrics.inc("recipes_total", outcome="saved" if saved else "unparsed")
+        metrics.maybe_write()
+        return saved
+
+    def save_recipe_from_soup(self, soup, link_recipe_to_download):
+        model_recipe = parse_recipe(soup, link_recipe_to_download)
+        if model_recipe is None:
+            return False
+        return self.write_recipe(model_recipe)
+
+    def write_recipe(self, model_recipe):
+        # Recipes are told apart by URL in the crawl state, so two recipes
+        # sharing a title are both kept
+        self.recipe_store.write(model_recipe.to_dictionary())
+        return True
 
     def extract_recipes_from_category(self, category_url):
         """Extract individual recipe links from a category page"""
         recipe_links = []
         try:
-            response = requests.get(category_url, timeout=30)
+            response = get_session().get(category_url, timeout=30)
             response.raise_for_status()
-            soup = BeautifulSoup(response.text, "html.parser")
+            soup = make_soup(response.text)
             
             # Look for individual recipe links on the category page
             # Try different selectors for recipe links
@@ -171,9 +257,7 @@ class Scraper:
                         href = link.get('href')
                         if href and not href.startswith('#'):
                             # Convert relative URL to absolute URL
-                            if href.startswith('/'):
-                                href = 'https://www.giallozafferano.it' + href
-                            recipe_links.append(href)
+                            recipe_links.append(urljoin(category_url, href))
                     break  # Use the first selector that finds links
             
             if debug:
@@ -185,63 +269,134 @@ class Scraper:
         
         return recipe_links
 
-def find_title(soup):
-    title_recipe = ""
-    # Try multiple selectors for the new structure
-    selectors = [
-        'h1',  # Main recipe title
-        '.recipe-title',  # Common recipe title class
-        'h2',  # Alternative title
-        'title'  # Page title as fallback
-    ]
+def parse_recipe(soup, link_recipe):
+    ingredients = find_ingredients(soup)
+    title = find_title(soup)
+    if debug:
+        print(f"Processing: {title} - Found {len(ingredients)} ingredients")
+        if len(ingredients) == 0:
+            print(f"No ingredients found for: {title}")
+    if not ingredients:
+        return None
+
+    model_recipe = ModelRecipe()
+    model_recipe.title = title
+    model_recipe.ingredients = ingredients
+    model_recipe.category = find_category(soup)
+    model_recipe.url = link_recipe
+    model_recipe.n_people = find_n_people(soup)
+    return model_recipe
+
+def find_watermark(walked_links):
+    # The newest link older than every recipe that failed, so the next
+    # incremental crawl walks back to the failed recipes and retries them;
+    # None keeps the previous watermark
+    watermark = None
+    for recipe_link, done in walked_links:
+        if not done:
+            watermark = None
+        elif watermark is None:
+            watermark = recipe_link
+    return watermark
+
+def find_total_pages(soup):
+    number_of_pages = 0
+    for tag in soup.find_all(attrs={"class": "disabled total-pages"}):
+        number_of_pages = int(tag.text)
+    return number_of_pages
+
+def find_recipe_links(soup, page_url):
+    # Look for individual recipe links on the main listing page; relative links
+    # are resolved against page_url, so any cookbook host works
+    # The main listing pages contain recipe cards with individual recipe links
+    # Try to find the recipe cards and extract their links
+    recipe_links = []
+    
+    # Method 1: Look for recipe cards with links
+    recipe_cards = soup.find_all(['article', 'div'], class_=lambda x: x and ('recipe' in x.lower() or 'card' in x.lower()))
+    for card in recipe_cards:
+        link_elem = card.find('a')
+        if link_elem and link_elem.get('href'):
+            href = link_elem.get('href')
+            if href and not href.startswith('#'):
+                recipe_links.append(urljoin(page_url, href))
     
-    for selector in selectors:
-        title_elements = soup.find_all(selector)
-        for title in title_elements:
-            if title.text.strip():
-                title_recipe = title.text.strip()
-                break
-        if title_recipe:
-            break
+    # Method 2: If no recipe cards found, look for any links that might be recipes
+    if not recipe_links:
+        all_links = soup.find_all('a')
+        for link in all_links:
+            href = link.get('href')
+            if href and not href.startswith('#') and not href.startswith('javascript:'):
+                # Look for recipe-like URLs
+                if '/ricette/' in href or href.endswith('.html'):
+                    recipe_links.append(urljoin(page_url, href))
     
-    return title_recipe
+    # Remove duplicates, keeping the listing order (newest recipes first)
+    return list(dict.fromkeys(recipe_links))
+
+def is_recipe_link(link):
+    # Recipe pages, as opposed to category pages
+    return '/ricette/' in link or link.endswith('.html')
+
+TITLE_PLAN = SelectorPlan([
+    'h1',  # Main recipe title
+    '.recipe-title',  # Common recipe title class
+    'h2',  # Alternative title
+    'title'  # Page title as fallback
+], learn=False, name="title")
+
+INGREDIENT_PLAN = SelectorPlan([
+    '.ingredient',  # Common ingredient class
+    '.recipe-ingredient',  # Recipe ingredient class
+    '.ingredients-list li',  # Ingredients list items
+    '.ingredient-item',  # Ingredient item class
+    'li[data-ingredient]',  # Data attribute for ingredients
+    '.gz-ingredient'  # Keep old selector as fallback
+], name="ingredients")
+
+CATEGORY_PLAN = SelectorPlan([
+    '.breadcrumb a',  # Breadcrumb navigation
+    '.category',  # Category class
+    '.recipe-category',  # Recipe category class
+    '.breadcrumb li a',  # Breadcrumb list items
+    '.gz-breadcrumb'  # Keep old selector as fallback
+], learn=False, name="category")
+
+def first_text(tags):
+    for tag in tags:
+        if tag.text.strip():
+            return tag.text.strip()
+    return ""
+
+def find_title(soup):
+    # Try the selectors of the plan in order of precedence
+    return TITLE_PLAN.find(soup, first_text) or ""
 
 
 def find_ingredients(soup):
     all_ingredients = []
-    # Try multiple selectors for ingredients in the new structure
-    ingredient_selectors = [
-        '.ingredient',  # Common ingredient class
-        '.recipe-ingredient',  # Recipe ingredient class
-        '.ingredients-list li',  # Ingredients list items
-        '.ingredient-item',  # Ingredient item class
-        'li[data-ingredient]',  # Data attribute for ingredients
-        '.gz-ingredient'  # Keep old selector as fallback
-    ]
+    # Use the first selector of the plan that finds ingredient tags; each one
+    # matches a different layout, so the plan tries the last winning one first
+    ingredient_tags = INGREDIENT_PLAN.find(soup, lambda tags: tags) or []
+    if debug:
+        print(f"Found {len(ingredient_tags)} ingredient tags")
     
-    for selector in ingredient_selectors:
-        ingredient_tags = soup.select(selector)
-        if debug:
-            print(f"Trying selector '{selector}': Found {len(ingredient_tags)} ingredient tags")
-        
-        if ingredient_tags:
-            for tag in ingredient_tags:
-                try:
-                    # Try different ways to extract ingredient name and quantity
-                    ingredient_text = tag.get_text().strip()
-                    if ingredient_text:
-                        # Simple parsing: assume format is "ingredient quantity unit"
-                        parts = ingredient_text.split()
-                        if len(parts) >= 2:
-                            # Try to extract quantity and unit from the last parts
-                            quantity, udm = get_quantity_udm(ingredient_text)
-                            # Assume the ingredient name is everything except quantity/unit
-                            name_ingredient = ingredient_text.lower()
-                            all_ingredients.append([name_ingredient, quantity, udm])
-                except Exception as e:
-                    if debug:
-                        print(f"Error processing ingredient tag: {e}")
-            break  # Use the first selector that finds ingredients
+    for tag in ingredient_tags:
+        try:
+            # Try different ways to extract ingredient name and quantity
+            ingredient_text = tag.get_text().strip()
+            if ingredient_text:
+                # Simple parsing: assume format is "ingredient quantity unit"
+                parts = ingredient_text.split()
+                if len(parts) >= 2:
+                    # Try to extract quantity and unit from the last parts
+                    quantity, udm = get_quantity_udm(ingredient_text)
+                    # Assume the ingredient name is everything except quantity/unit
+                    name_ingredient = ingredient_text.lower()
+                    all_ingredients.append([name_ingredient, quantity, udm])
+        except Exception as e:
+            if debug:
+                print(f"Error processing ingredient tag: {e}")
     
     return all_ingredients
 
@@ -254,49 +409,37 @@ def find_n_people(soup):
 
 
 def find_category(soup):
-    # Try multiple selectors for category in the new structure
-    category_selectors = [
-        '.breadcrumb a',  # Breadcrumb navigation
-        '.category',  # Category class
-        '.recipe-category',  # Recipe category class
-        '.breadcrumb li a',  # Breadcrumb list items
-        '.gz-breadcrumb'  # Keep old selector as fallback
-    ]
-    
-    for selector in category_selectors:
-        category_tags = soup.select(selector)
-        for tag in category_tags:
-            if tag.text.strip():
-                return tag.text.strip()
-    
-    return ""
+    # Try the selectors of the plan in order of precedence
+    return CATEGORY_PLAN.find(soup, first_text) or ""
 
 
 
-def create_file_json(data, path):
-    with open(path, "w") as file:
-        file.write(json.dumps(data, ensure_ascii=False))
+def download_page(link_to_download):
+    response = fetch_page(link_to_download)
+    soup = make_soup(response.text)
+    return soup
 
 
-def download_page(link_to_download):
-    max_retries = 3
-    retry_delay = 2  # seconds
+def fetch_page(link_to_download):
+    max_retries = MAX_RETRIES
+    retry_delay = RETRY_DELAY
     
     for attempt in range(max_retries):
         try:
-            response = requests.get(link_to_download, timeout=30)
+            response = get_session().get(link_to_download, timeout=30)
             response.raise_for_status()
-            soup = BeautifulSoup(response.text, "html.parser")
-            return soup
+            return response
         except (requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.HTTPError) as e:
             if attempt < max_retries - 1:
                 if debug:
                     print(f"Attempt {attempt + 1} failed for {link_to_download}: {e}")
                     print(f"Retrying in {retry_delay} seconds...")
-                import time
+                get_metrics().inc("fetch_retries_total", error=type(e).__name__)
                 time.sleep(retry_delay)
+                get_metrics().inc("sleep_seconds_total", retry_delay, reason="backoff")
                 retry_delay *= 2  # Exponential backoff
             else:
+                get_metrics().inc("fetch_failures_total", error=type(e).__name__)
                 if debug:
                     print(f"Failed to download {link_to_download} after {max_retries} attempts: {e}")
                 raise
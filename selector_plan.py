@@ -0,0 +1,68 @@
+import threading
+
+from bs4 import BeautifulSoup
+
+from crawl_metrics import get_metrics
+
+# Parser backends in order of preference; lxml builds the tree several times
+# faster than the pure-Python html.parser but is an optional dependency
+PARSER_BACKENDS = ['lxml', 'html.parser']
+
+
+def available_parsers():
+    parsers = []
+    for parser in PARSER_BACKENDS:
+        try:
+            BeautifulSoup("", parser)
+        except Exception:
+            continue
+        parsers.append(parser)
+    return parsers
+
+
+html_parser = available_parsers()[0]
+
+
+def make_soup(html, parser=None):
+    return BeautifulSoup(html, parser or html_parser)
+
+
+class SelectorPlan:
+    # Ordered fallback list of CSS selectors that can learn from its hits: the
+    # selector that last succeeded is tried first on the next page, so the
+    # remaining ones only run when the winning layout misses. Learning is only
+    # sound for selectors that each match a different site layout, so no page
+    # matches two of them; when a later selector is a fallback for an earlier
+    # one (h1, then h2), the order is a precedence and learn must be False,
+    # otherwise what a page yields would depend on the pages parsed before it.
+    # Named plans report their fallbacks and misses to the crawl metrics.
+    def __init__(self, selectors, learn=True, name=None):
+        # the documented precedence, kept apart from the learned try order
+        self.order = tuple(selectors)
+        self.selectors = list(selectors)
+        self.learn = learn
+        self.name = name
+        self.pages = 0
+        self.fallbacks = 0
+        # pages may be parsed from several threads at once (see async_scraper)
+        self.lock = threading.Lock()
+
+    def find(self, soup, extract):
+        # extract(tags) returns a truthy result when the selector succeeded
+        self.pages += 1
+        selectors = list(self.selectors)
+        for position, selector in enumerate(selectors):
+            result = extract(soup.select(selector))
+            if result:
+                if position > 0:
+                    self.fallbacks += 1
+                    if self.name:
+                        get_metrics().inc("selector_fallbacks_total", field=self.name)
+                    if self.learn:
+                        with self.lock:
+                            self.selectors.remove(selector)
+                            self.selectors.insert(0, selector)
+                return result
+        if self.name:
+            get_metrics().inc("selector_misses_total", field=self.name)
+        return None
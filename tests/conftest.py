@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# the modules live at the top of the repository, not in a package
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope="session")
+def matcher_class():
+    # matcher.py reads fridge.json from the working directory on import
+    cwd = os.getcwd()
+    os.chdir(ROOT)
+    try:
+        from matcher import Matcher
+    finally:
+        os.chdir(cwd)
+    return Matcher
@@ -0,0 +1,139 @@
+import asyncio
+import multiprocessing
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+import aiohttp
+
+import scraper
+from async_scraper import AsyncCrawler
+from benchmark_parser import synthetic_page
+from benchmark_scraper import listing_page, serve
+from recipe_store import iter_recipes
+
+N_PAGES = 3
+RECIPES_PER_PAGE = 8
+
+
+@pytest.fixture
+def site():
+    # the benchmark's stand-in cookbook: 20 ms per response, a 503 on the first
+    # request of a fifth of the recipe pages
+    ready = multiprocessing.Queue()
+    errors = multiprocessing.Value('i', 0)
+    server = multiprocessing.Process(target=serve, daemon=True,
+                                     args=(ready, N_PAGES, RECIPES_PER_PAGE, 0.02, 0.2, 7, errors))
+    server.start()
+    yield f"http://127.0.0.1:{ready.get()}", errors
+    server.terminate()
+    server.join()
+
+
+@pytest.fixture
+def instance(tmp_path, monkeypatch):
+    # the scraper keeps its recipes and crawl state in the working directory
+    monkeypatch.chdir(tmp_path)
+    instance = scraper.Scraper()
+    yield instance
+    instance.crawl_state.close()
+
+
+@pytest.fixture
+def requests_seen(monkeypatch):
+    # every GET the crawler sends, and the most ever in flight at once
+    stats = {'urls': [], 'active': 0, 'peak': 0}
+    original_get = aiohttp.ClientSession.get
+
+    class CountedRequest:
+        def __init__(self, request, url):
+            self.request = request
+            self.url = url
+
+        async def __aenter__(self):
+            stats['urls'].append(self.url)
+            stats['active'] += 1
+            stats['peak'] = max(stats['peak'], stats['active'])
+            try:
+                return await self.request.__aenter__()
+            except BaseException:
+                stats['active'] -= 1
+                raise
+
+        async def __aexit__(self, *exc_info):
+            stats['active'] -= 1
+            return await self.request.__aexit__(*exc_info)
+
+    monkeypatch.setattr(aiohttp.ClientSession, 'get',
+                        lambda session, url, **kwargs: CountedRequest(original_get(session, url, **kwargs), url))
+    return stats
+
+
+def crawl(instance, cookbook_url, **options):
+    crawler = AsyncCrawler(scraper=instance, cookbook_url=cookbook_url, requests_per_second=1000.0,
+                           burst=1000, retry_delay=0.01, **options)
+    return crawler, asyncio.run(crawler.crawl())
+
+
+def recipe_urls(urls):
+    return [url for url in urls if '/ricette/' in url]
+
+
+def test_crawl_retries_and_respects_concurrency(site, instance, requests_seen):
+    base_url, errors = site
+    crawler, n_saved = crawl(instance, f"{base_url}/ricette-cat", max_concurrency=8, per_host_concurrency=3)
+    assert n_saved == N_PAGES * RECIPES_PER_PAGE
+    assert crawler.total_recipes_failed == 0
+    # the failed first requests were retried
+    assert errors.value > 0
+    assert len(recipe_urls(requests_seen['urls'])) == n_saved + errors.value
+    assert 2 <= requests_seen['peak'] <= 3
+    assert len(list(iter_recipes('Recipes'))) == n_saved
+
+
+def test_known_links_are_not_requested(site, instance, requests_seen):
+    base_url, _ = site
+    known = f"{base_url}/ricette/ricetta-1-0.html"
+    instance.crawl_state.mark_seen(known)
+    _, n_saved = crawl(instance, f"{base_url}/ricette-cat")
+    assert n_saved == N_PAGES * RECIPES_PER_PAGE - 1
+    assert known not in requests_seen['urls']
+
+    # a second crawl only walks the listing pages
+    requests_seen['urls'].clear()
+    instance.recipe_store = scraper.ShardWriter('Recipes')
+    _, n_saved = crawl(instance, f"{base_url}/ricette-cat")
+    assert n_saved == 0
+    assert recipe_urls(requests_seen['urls']) == []
+
+
+def test_page_with_a_wrong_charset_is_crawled(instance):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            base_url = f"http://127.0.0.1:{self.server.server_port}"
+            if self.path.startswith('/ricette/'):
+                body = synthetic_page(1, random.Random(1)) + '<p>caffè</p>'
+            else:
+                body = listing_page(1, 1, 2, base_url) + '<p>crème brûlée</p>'
+            content = body.encode('utf-8')
+            self.send_response(200)
+            # declared ASCII, sent as UTF-8
+            self.send_header('Content-Type', 'text/html; charset=us-ascii')
+            self.send_header('Content-Length', str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        _, n_saved = crawl(instance, f"http://127.0.0.1:{server.server_port}/ricette-cat")
+    finally:
+        server.shutdown()
+    assert n_saved == 2
@@ -0,0 +1,41 @@
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+
+import bitmap_matcher
+from benchmark_matcher import generate_recipes, generate_vocabulary
+from bitmap_matcher import BitmapMatcher
+from ingredient_index import IngredientIndex
+
+
+def build_index(recipes):
+    index = IngredientIndex()
+    for recipe in recipes:
+        index.add_recipe(recipe)
+    return index
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    rng = random.Random(11)
+    vocabulary = generate_vocabulary(50, rng)
+    recipes = list(generate_recipes(400, vocabulary, rng))
+    recipes.append({'url': 'empty', 'ingredients': []})
+    fridges = [rng.sample(vocabulary, size) for size in (0, 3, 10, 25, 40, 50)]
+    return build_index(recipes), fridges
+
+
+def test_batch_matches_index(corpus):
+    index, fridges = corpus
+    batch = BitmapMatcher(index).get_matching_recipes_batch(fridges)
+    assert batch == [index.get_matching_recipes(fridge) for fridge in fridges]
+
+
+def test_batch_split_into_chunks_matches_index(corpus, monkeypatch):
+    index, fridges = corpus
+    # a few fridges per chunk
+    monkeypatch.setattr(bitmap_matcher, 'MAX_BATCH_CELLS', 2 * sum(index.recipe_sizes))
+    batch = BitmapMatcher(index).get_matching_recipes_batch(fridges)
+    assert batch == [index.get_matching_recipes(fridge) for fridge in fridges]
@@ -0,0 +1,53 @@
+from crawl_state import CrawlState, canonicalize_url
+
+LINKS = ['https://example.invalid/ricette/a.html', 'https://example.invalid/ricette/b.html',
+         'https://example.invalid/ricette/c.html']
+
+
+def test_canonicalize_url():
+    assert canonicalize_url(' HTTPS://Example.Invalid/ricette/a.html/?utm=1#top') == \
+        'https://example.invalid/ricette/a.html'
+
+
+def test_resume_from_the_interrupted_page(tmp_path):
+    state_path = str(tmp_path / 'crawl_state.sqlite')
+    state = CrawlState(state_path)
+    state.complete_page(1)
+    state.add_to_frontier(2, LINKS)
+    state.mark_seen(LINKS[0])
+    state.close()
+
+    # a new process after a crash
+    state = CrawlState(state_path)
+    assert state.is_page_completed(1)
+    assert not state.is_page_completed(2)
+    assert state.get_frontier(2) == LINKS[1:]
+    assert state.is_seen(LINKS[0])
+    state.complete_page(2)
+    assert state.get_frontier(2) == []
+    state.reset_pages()
+    assert not state.is_page_completed(1)
+    # seen URLs outlive the page progress
+    assert state.is_seen(LINKS[0])
+    state.close()
+
+
+def test_failed_recipes_are_retried(tmp_path):
+    state = CrawlState(str(tmp_path / 'crawl_state.sqlite'))
+    state.mark_seen(LINKS[0], saved=False)
+    assert not state.is_seen(LINKS[0])
+    state.mark_seen(LINKS[0], saved=True)
+    assert state.is_seen(LINKS[0])
+    # a later failure does not forget a recipe that was saved
+    state.mark_seen(LINKS[0], saved=False)
+    assert state.is_seen(LINKS[0])
+    assert state.count_seen() == 1
+    state.close()
+
+
+def test_seen_urls_are_canonical(tmp_path):
+    state = CrawlState(str(tmp_path / 'crawl_state.sqlite'))
+    state.seed_seen([LINKS[1] + '?ref=home'])
+    assert state.is_seen(LINKS[1] + '/')
+    assert not state.is_seen(LINKS[2])
+    state.close()
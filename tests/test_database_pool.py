@@ -0,0 +1,159 @@
+import threading
+
+import psycopg2
+import psycopg2.extensions
+import pytest
+from psycopg2 import pool
+
+import database_pool
+from database_pool import DatabasePool, configure_pool, get_pool
+
+CONFIG = {'host': 'localhost', 'database': 'ispirami_test', 'user': 'test'}
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, query, params=None):
+        if self.connection.closed:
+            raise psycopg2.InterfaceError("connection already closed")
+        self.connection.queries.append(query)
+
+
+class FakeInfo:
+    transaction_status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.autocommit = False
+        self.info = FakeInfo()
+        self.queries = []
+        self.n_commits = 0
+        self.n_rollbacks = 0
+
+    def cursor(self, cursor_factory=None):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.n_commits += 1
+
+    def rollback(self):
+        if self.closed:
+            raise psycopg2.InterfaceError("connection already closed")
+        self.n_rollbacks += 1
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    opened = []
+
+    def connect(*args, **kwargs):
+        conn = FakeConnection()
+        opened.append(conn)
+        return conn
+
+    monkeypatch.setattr(psycopg2, 'connect', connect)
+    yield opened
+    database_pool.close_pools()
+
+
+def test_borrow_and_return_reuses_idle_connection(connections):
+    database_pool = DatabasePool(CONFIG, minconn=1, maxconn=2)
+    assert len(connections) == 1
+    conn = database_pool.getconn()
+    assert conn is connections[0]
+    conn.autocommit = True
+    database_pool.putconn(conn)
+    assert conn.n_rollbacks == 1
+    assert conn.autocommit is False
+    assert database_pool.getconn() is conn
+    assert len(connections) == 1
+
+
+def test_extra_connections_are_closed_when_returned(connections):
+    database_pool = DatabasePool(CONFIG, minconn=1, maxconn=3)
+    borrowed = [database_pool.getconn() for _ in range(3)]
+    assert len(connections) == 3
+    for conn in borrowed:
+        database_pool.putconn(conn)
+    assert sum(not conn.closed for conn in connections) == 1
+    assert database_pool.n_borrowed == 0
+
+
+def test_borrow_times_out_when_exhausted(connections):
+    database_pool = DatabasePool(CONFIG, minconn=1, maxconn=2, timeout=0.05)
+    database_pool.getconn()
+    database_pool.getconn()
+    with pytest.raises(pool.PoolError):
+        database_pool.getconn()
+    assert database_pool.n_borrowed == 2
+
+
+def test_waiting_borrower_gets_returned_connection(connections):
+    database_pool = DatabasePool(CONFIG, minconn=1, maxconn=1)
+    conn = database_pool.getconn()
+    borrowed = []
+    waiter = threading.Thread(target=lambda: borrowed.append(database_pool.getconn(timeout=5)))
+    waiter.start()
+    waiter.join(0.1)
+    assert waiter.is_alive()
+    database_pool.putconn(conn)
+    waiter.join(5)
+    assert borrowed == [conn]
+
+
+def test_closed_connection_is_replaced(connections):
+    database_pool = DatabasePool(CONFIG, minconn=1, maxconn=1)
+    conn = database_pool.getconn()
+    database_pool.putconn(conn)
+    conn.close()
+    replacement = database_pool.getconn()
+    assert replacement is not conn
+    assert not replacement.closed
+    assert database_pool.n_borrowed == 1
+
+
+def test_stale_connection_is_pinged(connections):
+    database_pool = DatabasePool(CONFIG, minconn=1, maxconn=1, health_check_interval=0)
+    conn = database_pool.getconn()
+    database_pool.putconn(conn)
+    assert database_pool.getconn() is conn
+    assert conn.queries == ["SELECT 1"]
+
+
+def test_connection_commits_or_rolls_back(connections):
+    database_pool = DatabasePool(CONFIG, minconn=1, maxconn=1)
+    with database_pool.connection() as conn:
+        pass
+    assert conn.n_commits == 1
+    with pytest.raises(ValueError):
+        with database_pool.connection() as conn:
+            raise ValueError
+    assert conn.n_commits == 1
+    assert conn.n_rollbacks == 2
+    assert database_pool.n_borrowed == 0
+
+
+def test_configure_pool_resizes_in_place(connections):
+    shared_pool = get_pool(CONFIG)
+    conn = shared_pool.getconn()
+    assert configure_pool(CONFIG, maxconn=1, timeout=0.05) is shared_pool
+    assert shared_pool.maxconn == 1
+    with pytest.raises(pool.PoolError):
+        shared_pool.getconn()
+    # the connection borrowed before resizing is still valid and returned normally
+    shared_pool.putconn(conn)
+    assert not conn.closed
+    assert shared_pool.getconn() is conn
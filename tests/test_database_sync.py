@@ -0,0 +1,129 @@
+import gzip
+import json
+import os
+
+import psycopg2
+import pytest
+from psycopg2.extensions import parse_dsn
+
+import database_pool
+from database_setup import DatabaseSetup
+from recipe_store import encode_recipe
+
+# libpq connection string of a scratch database, e.g. "host=localhost dbname=ispirami_test user=postgres";
+# its recipe tables are dropped and recreated by these tests
+TEST_DSN = os.environ.get("ISPIRAMI_TEST_DSN")
+
+pytestmark = pytest.mark.skipif(not TEST_DSN, reason="ISPIRAMI_TEST_DSN is not set")
+
+
+def recipe(name, *ingredients):
+    return {'title': name, 'category': 'Primi', 'url': f'https://example.invalid/ricette/{name}.html',
+            'n_people': '4', 'ingredients': [[ingredient, 100, 'g'] for ingredient in ingredients]}
+
+
+def write_shard(path, recipes):
+    with gzip.open(path, 'wb') as file:
+        for item in recipes:
+            file.write(encode_recipe(item))
+
+
+@pytest.fixture
+def setup():
+    setup = DatabaseSetup()
+    setup.config = parse_dsn(TEST_DSN)
+    setup.connect()
+    setup.cursor.execute("""
+        DROP VIEW IF EXISTS recipe_ingredients_view;
+        DROP TABLE IF EXISTS sync_manifest_recipes, sync_manifest, recipe_ingredients, ingredients, recipes;
+    """)
+    setup.conn.commit()
+    setup.create_schema()
+    yield setup
+    setup.disconnect()
+    database_pool.close_pools()
+
+
+def manifest(setup):
+    setup.cursor.execute("SELECT path, url FROM sync_manifest_recipes ORDER BY path, url")
+    files = {}
+    for row in setup.cursor.fetchall():
+        files.setdefault(row['path'], []).append(row['url'].rsplit('/', 1)[1][:-len('.html')])
+    return files
+
+
+def recipes(setup):
+    setup.cursor.execute("""
+        SELECT r.title, r.n_ingredients, array_agg(i.name ORDER BY i.name) AS ingredients
+        FROM recipes r
+        JOIN recipe_ingredients ri ON ri.recipe_id = r.id
+        JOIN ingredients i ON i.id = ri.ingredient_id
+        GROUP BY r.id ORDER BY r.title
+    """)
+    return {row['title']: (row['n_ingredients'], row['ingredients']) for row in setup.cursor.fetchall()}
+
+
+def test_sync_tracks_files_and_their_recipes(setup, tmp_path, capsys):
+    write_shard(tmp_path / 'recipes-00000.jsonl.gz',
+                [recipe('carbonara', 'pasta', 'uovo', 'guanciale'), recipe('amatriciana', 'pasta', 'guanciale')])
+    with open(tmp_path / 'risotto.json', 'w') as file:
+        json.dump(recipe('risotto', 'riso', 'burro'), file)
+    setup.sync_recipes(str(tmp_path))
+    assert manifest(setup) == {'recipes-00000.jsonl.gz': ['amatriciana', 'carbonara'], 'risotto.json': ['risotto']}
+    assert recipes(setup)['carbonara'] == (3, ['guanciale', 'pasta', 'uovo'])
+
+    # a new mtime with the same content only refreshes the stat
+    os.utime(tmp_path / 'risotto.json', ns=(0, 0))
+    capsys.readouterr()
+    setup.sync_recipes(str(tmp_path))
+    assert "0 new or changed" in capsys.readouterr().out
+    setup.cursor.execute("SELECT mtime FROM sync_manifest WHERE path = 'risotto.json'")
+    assert setup.cursor.fetchone()['mtime'] == 0
+
+    # a changed shard replaces the links of its recipes and deletes the ones it lost
+    write_shard(tmp_path / 'recipes-00000.jsonl.gz', [recipe('carbonara', 'pasta', 'uovo')])
+    setup.sync_recipes(str(tmp_path))
+    assert manifest(setup) == {'recipes-00000.jsonl.gz': ['carbonara'], 'risotto.json': ['risotto']}
+    assert recipes(setup) == {'carbonara': (2, ['pasta', 'uovo']), 'risotto': (2, ['burro', 'riso'])}
+
+
+def test_removed_file_keeps_recipes_found_in_another_file(setup, tmp_path):
+    write_shard(tmp_path / 'recipes-00000.jsonl.gz', [recipe('carbonara', 'pasta', 'uovo'), recipe('gricia', 'pasta')])
+    write_shard(tmp_path / 'recipes-00001.jsonl.gz', [recipe('carbonara', 'pasta', 'uovo')])
+    setup.sync_recipes(str(tmp_path))
+    os.remove(tmp_path / 'recipes-00000.jsonl.gz')
+    setup.sync_recipes(str(tmp_path))
+    assert manifest(setup) == {'recipes-00001.jsonl.gz': ['carbonara']}
+    assert list(recipes(setup)) == ['carbonara']
+
+
+def test_truncated_shard_is_retried(setup, tmp_path):
+    path = tmp_path / 'recipes-00000.jsonl.gz'
+    write_shard(path, [recipe(f'ricetta-{number}', 'sale') for number in range(50)])
+    content = path.read_bytes()
+    path.write_bytes(content[:len(content) // 2])
+    setup.sync_recipes(str(tmp_path))
+    assert manifest(setup) == {}
+
+    path.write_bytes(content)
+    setup.sync_recipes(str(tmp_path))
+    assert len(manifest(setup)['recipes-00000.jsonl.gz']) == 50
+    setup.cursor.execute("SELECT COUNT(*) AS count FROM recipes")
+    assert setup.cursor.fetchone()['count'] == 50
+
+
+def test_sync_manifest_survives_a_failed_load(setup, tmp_path, monkeypatch):
+    write_shard(tmp_path / 'recipes-00000.jsonl.gz', [recipe('carbonara', 'pasta')])
+    setup.sync_recipes(str(tmp_path))
+    write_shard(tmp_path / 'recipes-00000.jsonl.gz', [recipe('gricia', 'pasta')])
+
+    def fail(*args, **kwargs):
+        raise psycopg2.OperationalError("connection lost")
+
+    monkeypatch.setattr(setup, 'load_batch', fail)
+    with pytest.raises(psycopg2.OperationalError):
+        setup.sync_recipes(str(tmp_path))
+    monkeypatch.undo()
+    assert manifest(setup) == {'recipes-00000.jsonl.gz': ['carbonara']}
+    setup.sync_recipes(str(tmp_path))
+    assert manifest(setup) == {'recipes-00000.jsonl.gz': ['gricia']}
@@ -0,0 +1,32 @@
+from ingredient_index import IngredientIndex
+
+PARMIGIANA = {'url': 'parmigiana', 'ingredients': [['melanzana', 2, None]]}
+ZUCCHINE = {'url': 'zucchine trifolate', 'ingredients': [['zucchina', 3, None]]}
+
+
+def build_index(recipes, fuzzy_threshold):
+    index = IngredientIndex()
+    index.fuzzy_threshold = fuzzy_threshold
+    for recipe in recipes:
+        index.add_recipe(recipe)
+    return index
+
+
+def test_fuzzy_threshold():
+    # melanzane and melanzana share 6 of their 8 distinct trigrams
+    assert build_index([PARMIGIANA], None).get_matching_recipes(['melanzane']) == []
+    assert build_index([PARMIGIANA], 0.7).get_matching_recipes(['melanzane']) == ['parmigiana']
+    assert build_index([PARMIGIANA], 0.8).get_matching_recipes(['melanzane']) == []
+
+
+def test_fuzzy_pass_skipped_for_known_names():
+    index = build_index([PARMIGIANA, {'url': 'caponata', 'ingredients': [['melanzane', 2, None]]}], 0.7)
+    assert index.get_matching_recipes(['melanzane']) == ['caponata']
+
+
+def test_fuzzy_cache_invalidated_by_new_vocabulary():
+    index = build_index([ZUCCHINE], 0.7)
+    assert index.get_matching_recipes(['melanzane']) == []
+    assert index.fuzzy_cache
+    index.add_recipe(PARMIGIANA)
+    assert index.get_matching_recipes(['melanzane']) == ['parmigiana']
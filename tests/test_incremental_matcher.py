@@ -0,0 +1,45 @@
+import random
+
+from benchmark_matcher import generate_recipes, generate_vocabulary
+from incremental_matcher import IncrementalMatcher, diff_fridge
+from ingredient_index import IngredientIndex
+
+
+def build_index(recipes):
+    index = IngredientIndex()
+    for recipe in recipes:
+        index.add_recipe(recipe)
+    return index
+
+
+def test_diff_fridge():
+    assert diff_fridge({'latte': '1 l', 'uova': '6'}, {'uova': '4', 'burro': '100 g'}) == (['burro'], ['latte'])
+
+
+def test_entered_and_left_follow_a_full_rematch():
+    rng = random.Random(5)
+    vocabulary = generate_vocabulary(40, rng)
+    index = build_index(list(generate_recipes(300, vocabulary, rng)) + [{'url': 'empty', 'ingredients': []}])
+    fridge = set(rng.sample(vocabulary, 20))
+    matcher = IncrementalMatcher(index, fridge)
+    assert matcher.get_matching_recipes() == index.get_matching_recipes(fridge)
+    for _ in range(30):
+        new_fridge = (fridge - set(rng.sample(sorted(fridge), min(len(fridge), rng.randint(0, 4))))
+                      | set(rng.sample(vocabulary, rng.randint(0, 4))))
+        added, removed = diff_fridge(fridge, new_fridge)
+        before = set(index.get_matching_recipes(fridge))
+        fridge = new_fridge
+        after = set(index.get_matching_recipes(fridge))
+        entered, left = matcher.update(added, removed)
+        assert set(entered) == after - before
+        assert set(left) == before - after
+        assert matcher.get_matching_recipes() == index.get_matching_recipes(fridge)
+
+
+def test_ingredient_provided_twice_stays_until_both_leave():
+    index = build_index([{'url': 'pane', 'ingredients': [['farina', 500, 'g']]}])
+    matcher = IncrementalMatcher(index, ['farina', 'farina 00'])
+    assert matcher.get_matching_recipes() == ['pane']
+    assert matcher.update(removed=['farina 00']) == ([], [])
+    assert matcher.update(removed=['farina']) == ([], ['pane'])
+    assert matcher.update(added=['farina 00']) == (['pane'], [])
@@ -0,0 +1,59 @@
+import random
+
+from benchmark_matcher import generate_recipes, generate_vocabulary
+from ingredient_index import IngredientIndex
+from ingredient_ontology import IngredientOntology
+
+
+def baseline_matches(matcher_class, recipes, fridge, ontology=None):
+    # the original nested scan, without loading a catalog or the Recipes folder
+    matcher = matcher_class.__new__(matcher_class)
+    matcher.ingredients_available = fridge
+    matcher.ontology = ontology
+    return [recipe['url'] for recipe in recipes if matcher.has_all_ingredients(recipe['ingredients'])]
+
+
+def build_index(recipes, ontology=None):
+    index = IngredientIndex()
+    index.ontology = ontology
+    for recipe in recipes:
+        index.add_recipe(recipe)
+    return index
+
+
+def test_matches_baseline_on_synthetic_corpus(matcher_class):
+    rng = random.Random(7)
+    vocabulary = generate_vocabulary(60, rng)
+    recipes = list(generate_recipes(500, vocabulary, rng))
+    # names that only match by containment, in both directions
+    recipes.append({'url': 'contained', 'ingredients': [[vocabulary[0].split()[0], 1, 'g']]})
+    recipes.append({'url': 'containing', 'ingredients': [[vocabulary[1] + ' fresco', 1, 'g']]})
+    index = build_index(recipes)
+    for size in (5, 20, 40, 60):
+        fridge = rng.sample(vocabulary, size)
+        assert index.get_matching_recipes(fridge) == baseline_matches(matcher_class, recipes, fridge)
+
+
+def test_edge_cases_match_baseline(matcher_class):
+    recipes = [
+        {'url': 'empty', 'ingredients': []},
+        {'url': 'duplicate', 'ingredients': [['sale', 1, 'g'], ['Sale', 2, 'g']]},
+        {'url': 'normalized', 'ingredients': [['  Farina 00 (tipo) ', 500, 'g']]},
+        {'url': 'missing', 'ingredients': [['sale', 1, 'g'], ['zafferano', 1, 'g']]},
+    ]
+    index = build_index(recipes)
+    for fridge in ([], ['sale'], ['farina 00', 'sale'], ['FARINA'], ['zafferano', 'sale']):
+        assert index.get_matching_recipes(fridge) == baseline_matches(matcher_class, recipes, fridge)
+
+
+def test_ontology_matches_baseline(matcher_class):
+    ontology = IngredientOntology(synonyms=[['pomodori', 'pomodoro']],
+                                  is_a={'parmigiano': ['formaggio grattugiato']})
+    recipes = [
+        {'url': 'grated', 'ingredients': [['formaggio grattugiato', 50, 'g']]},
+        {'url': 'tomato', 'ingredients': [['pomodori', 3, None]]},
+        {'url': 'both', 'ingredients': [['formaggio grattugiato', 50, 'g'], ['pomodori', 3, None]]},
+    ]
+    index = build_index(recipes, ontology)
+    for fridge in (['parmigiano'], ['pomodoro'], ['parmigiano', 'pomodoro'], ['latte']):
+        assert index.get_matching_recipes(fridge) == baseline_matches(matcher_class, recipes, fridge, ontology)
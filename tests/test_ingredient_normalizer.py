@@ -0,0 +1,27 @@
+import pytest
+
+from ingredient_normalizer import normalize_ingredient
+
+
+@pytest.mark.parametrize("raw_name, name", [
+    ('Farina 00 (tipo) 200 g', 'farina 00'),
+    ('Uova', 'uovo'),
+    ('2 Carciofi', 'carciofo'),
+    ('Funghi porcini', 'fungo porcino'),
+    ('Finocchi', 'finocchio'),
+    ("Spicchio d'aglio", 'spicchio aglio'),
+    ('Olio di oliva', 'olio oliva'),
+    ('Sale q.b.', 'sale'),
+    # feminine plurals in -e collide with singulars such as sale and are kept
+    ('Latte intero', 'latte intero'),
+    ('melanzane', 'melanzane'),
+])
+def test_normalize_ingredient(raw_name, name):
+    assert normalize_ingredient(raw_name) == name
+
+
+def test_normalize_ingredient_is_memoized():
+    normalize_ingredient('Pomodorini ciliegino 300 g')
+    hits = normalize_ingredient.cache_info().hits
+    assert normalize_ingredient('Pomodorini ciliegino 300 g') == 'pomodorino ciliegino'
+    assert normalize_ingredient.cache_info().hits == hits + 1
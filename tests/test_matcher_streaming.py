@@ -0,0 +1,68 @@
+import sys
+
+import pytest
+
+from recipe_store import ShardWriter
+
+FRIDGE = ['pasta', 'uovo', 'pomodoro']
+
+
+def recipe(number):
+    # every third recipe needs something the fridge lacks
+    ingredients = [['pasta', 100, 'g'], ['uova', 2, None] if number % 2 else ['pomodori', 3, None]]
+    if number % 3 == 0:
+        ingredients.append(['zafferano', 1, 'g'])
+    return {'url': f'https://example.invalid/ricetta-{number}.html', 'ingredients': ingredients}
+
+
+@pytest.fixture
+def matcher(matcher_class, tmp_path, monkeypatch):
+    # four shards of 25 recipes in an empty working directory: no catalog, no ontology
+    monkeypatch.chdir(tmp_path)
+    for shard in range(4):
+        writer = ShardWriter('Recipes')
+        for number in range(shard * 25, shard * 25 + 25):
+            writer.write(recipe(number))
+        writer.close()
+    opened = []
+    matcher_module = sys.modules[matcher_class.__module__]
+    read_recipe_file = matcher_module.read_recipe_file
+
+    def tracked_read_recipe_file(path):
+        opened.append(path)
+        return read_recipe_file(path)
+
+    monkeypatch.setattr(matcher_module, 'read_recipe_file', tracked_read_recipe_file)
+    matcher = matcher_class()
+    matcher.ingredients_available = FRIDGE
+    matcher.opened = opened
+    yield matcher
+    matcher.close()
+
+
+def test_limited_iteration_stops_reading_early(matcher):
+    matches = list(matcher.iter_matching_recipes(limit=3))
+    assert matches == [f'https://example.invalid/ricetta-{number}.html' for number in (1, 2, 4)]
+    assert matcher.opened == ['Recipes/recipes-00000.jsonl.gz']
+    assert matcher.index is None
+
+
+def test_lazy_pages_match_the_index(matcher):
+    lazy = list(matcher.iter_matching_recipes())
+    assert len(matcher.opened) == 4
+    assert lazy == matcher.get_matching_recipes()
+    for limit, offset in ((5, 0), (5, 20), (100, 60), (3, 1000)):
+        matcher.index = None
+        page = list(matcher.iter_matching_recipes(limit, offset))
+        assert page == lazy[offset:offset + limit]
+
+
+def test_fuzzy_and_parallel_iteration_match_the_full_list(matcher):
+    expected = matcher.get_matching_recipes()
+    matcher.index = None
+    matcher.fuzzy_threshold = 0.9
+    assert list(matcher.iter_matching_recipes()) == expected
+    matcher.fuzzy_threshold = None
+    matcher.n_workers = 3
+    assert list(matcher.iter_matching_recipes(limit=10, offset=5)) == expected[5:15]
+    assert matcher.get_matching_recipes() == expected
@@ -0,0 +1,35 @@
+from ingredient_index import IngredientIndex
+from quantity_udm_parser import get_quantity_udm, parse_quantity_udm, to_base_unit
+
+
+def build_index(recipes):
+    index = IngredientIndex()
+    for recipe in recipes:
+        index.add_recipe(recipe)
+    return index
+
+
+def test_parse_quantity_udm():
+    assert parse_quantity_udm('1,5 kg') == [1.5, 'kg']
+    assert parse_quantity_udm('3 (medie)') == [3.0, None]
+    assert parse_quantity_udm('q.b.') == [None, None]
+    # the scraper keeps its historical fallback for unreadable quantities
+    assert get_quantity_udm('q.b.') == [1, 'g']
+
+
+def test_to_base_unit():
+    assert to_base_unit(1.5, 'kg') == [1500.0, 'g']
+    assert to_base_unit(2, 'cl') == [20.0, 'ml']
+    assert to_base_unit(3, None) == [3.0, None]
+    assert to_base_unit(1, 'cucchiai') == [None, None]
+
+
+def test_quantities_treat_unreadable_amounts_as_unknown():
+    index = build_index([{'url': 'bread', 'n_people': '2',
+                          'ingredients': [['farina', 300, 'g'], ['sale', 5, 'g']]}])
+    assert index.get_matching_recipes_with_quantities({'farina': '400 g', 'sale': 'q.b.'}) == ['bread']
+    assert index.get_matching_recipes_with_quantities({'farina': '400 g', 'sale': '1 g'}) == []
+    # two fridge items resolving to the same ingredient are not added up
+    assert index.get_matching_recipes_with_quantities({'farina': '200 g', 'farina 00': '200 g',
+                                                       'sale': '5 g'}) == []
+    assert index.get_matching_recipes_with_quantities({'farina': '200 g', 'sale': '5 g'}, servings=1) == ['bread']
@@ -0,0 +1,47 @@
+from ingredient_index import IngredientIndex
+
+RECIPES = [
+    {'url': 'carbonara', 'ingredients': [['pasta', 100, 'g'], ['uovo', 2, None], ['guanciale', 50, 'g']]},
+    {'url': 'pasta al pomodoro', 'ingredients': [['pasta', 100, 'g'], ['pomodoro', 3, None]]},
+    {'url': 'risotto', 'ingredients': [['riso', 80, 'g'], ['zafferano', 1, 'g'], ['burro', 20, 'g'],
+                                       ['brodo', 1, 'l']]},
+    {'url': 'pasta all uovo', 'ingredients': [['pasta', 100, 'g'], ['uovo', 1, None]]},
+    {'url': 'carote lesse', 'ingredients': [['carota', 3, None]]},
+]
+FRIDGE = ['pasta', 'uovo', 'pomodoro', 'burro']
+
+
+def build_index(recipes):
+    index = IngredientIndex()
+    for recipe in recipes:
+        index.add_recipe(recipe)
+    return index
+
+
+def test_ranked_by_fewest_missing_then_coverage():
+    ranked = build_index(RECIPES).get_ranked_recipes(FRIDGE, k=10)
+    assert [item['url'] for item in ranked] == ['pasta al pomodoro', 'pasta all uovo', 'carbonara', 'risotto']
+    assert ranked[2]['missing'] == ['guanciale']
+    assert ranked[2]['coverage'] == 2 / 3
+    assert sorted(ranked[3]['missing']) == ['brodo', 'riso', 'zafferano']
+    # recipes sharing nothing with the fridge are not candidates
+    assert 'carote lesse' not in [item['url'] for item in ranked]
+
+
+def test_top_k_keeps_the_best_candidates():
+    ranked = build_index(RECIPES).get_ranked_recipes(FRIDGE, k=3)
+    assert [item['url'] for item in ranked] == ['pasta al pomodoro', 'pasta all uovo', 'carbonara']
+
+
+def test_scan_stops_after_k_perfect_matches():
+    recipes = [{'url': f'pasta {number}', 'ingredients': [['pasta', 100, 'g']]} for number in range(50)]
+    recipes.append({'url': 'pasta e burro', 'ingredients': [['pasta', 100, 'g'], ['burro', 10, 'g']]})
+    ranked = build_index(recipes).get_ranked_recipes(['pasta'], k=5)
+    assert len(ranked) == 5
+    assert all(item['missing'] == [] and item['coverage'] == 1.0 for item in ranked)
+
+
+def test_empty_recipes_rank_as_perfect_matches():
+    recipes = RECIPES + [{'url': 'acqua', 'ingredients': []}]
+    ranked = build_index(recipes).get_ranked_recipes(['carota'], k=2)
+    assert {item['url'] for item in ranked} == {'acqua', 'carote lesse'}
@@ -0,0 +1,77 @@
+import json
+import os
+import time
+
+from recipe_catalog import PackedCatalog, build_catalog, is_catalog_current, load_catalog
+from recipe_store import ShardWriter
+
+RECIPES = [
+    {'title': 'Crêpes dolci e salate', 'category': 'Dolci', 'url': 'https://example.invalid/crepes.html',
+     'n_people': '4', 'ingredients': [['farina 00', 250.0, 'g'], ['uova', 3.0, None], ['sale', None, None]]},
+    {'title': 'Acqua', 'category': None, 'url': 'https://example.invalid/acqua.html',
+     'n_people': None, 'ingredients': []},
+    {'title': 'Besciamella', 'category': 'Salse', 'url': 'https://example.invalid/besciamella.html',
+     'n_people': '6', 'ingredients': [['latte', 1.5, 'l'], ['burro', 100.0, 'g'], ['farina 00', 100.0, 'g']]},
+]
+
+
+def write_recipes(folder, recipes):
+    writer = ShardWriter(str(folder))
+    for recipe in recipes:
+        writer.write(recipe)
+    writer.close()
+
+
+def test_round_trip(tmp_path):
+    catalog_path = str(tmp_path / 'recipes.catalog')
+    assert build_catalog(catalog_path=catalog_path, recipes=RECIPES) == len(RECIPES)
+    catalog = PackedCatalog(catalog_path)
+    try:
+        assert len(catalog) == len(RECIPES)
+        assert list(catalog) == RECIPES
+        assert catalog.get_field(2, 'url') == RECIPES[2]['url']
+        assert catalog.get_ingredients(0) == RECIPES[0]['ingredients']
+    finally:
+        catalog.close()
+
+
+def test_empty_catalog_is_loaded(tmp_path):
+    recipe_path = tmp_path / 'Recipes'
+    recipe_path.mkdir()
+    catalog_path = str(tmp_path / 'recipes.catalog')
+    assert build_catalog(str(recipe_path), catalog_path) == 0
+    catalog = load_catalog(catalog_path, str(recipe_path))
+    assert catalog is not None
+    assert len(catalog) == 0
+    assert list(catalog) == []
+    catalog.close()
+
+
+def test_catalog_goes_stale_when_recipe_files_change(tmp_path):
+    recipe_path = tmp_path / 'Recipes'
+    write_recipes(recipe_path, RECIPES[:2])
+    catalog_path = str(tmp_path / 'recipes.catalog')
+    build_catalog(str(recipe_path), catalog_path)
+    assert is_catalog_current(str(recipe_path), catalog_path)
+
+    # a legacy JSON file added by hand
+    with open(recipe_path / 'besciamella.json', 'w') as file:
+        json.dump(RECIPES[2], file)
+    assert not is_catalog_current(str(recipe_path), catalog_path)
+    assert load_catalog(catalog_path, str(recipe_path)) is None
+
+    build_catalog(str(recipe_path), catalog_path)
+    assert is_catalog_current(str(recipe_path), catalog_path)
+    # a file rewritten in place keeps its name but not its mtime
+    shard_path = recipe_path / 'recipes-00000.jsonl.gz'
+    later = time.time_ns() + 10 ** 9
+    os.utime(shard_path, ns=(later, later))
+    assert not is_catalog_current(str(recipe_path), catalog_path)
+
+
+def test_catalog_from_another_format_is_stale(tmp_path):
+    recipe_path = tmp_path / 'Recipes'
+    recipe_path.mkdir()
+    catalog_path = tmp_path / 'recipes.catalog'
+    catalog_path.write_bytes(b'ISPCAT01' + bytes(200))
+    assert not is_catalog_current(str(recipe_path), str(catalog_path))
@@ -0,0 +1,156 @@
+import gzip
+import multiprocessing
+import os
+import zlib
+
+from recipe_store import (PARTIAL_SUFFIX, ShardWriter, count_recipe_file, iter_recipes,
+                          read_recipe_range)
+
+
+def recipe(number):
+    return {'url': f'https://example.invalid/ricetta-{number}.html', 'title': f'ricetta {number}',
+            'ingredients': [['sale', 1, 'g']]}
+
+
+def urls(folder):
+    return [item['url'] for item in iter_recipes(str(folder))]
+
+
+# gzip streams of crashed writers, kept so they are never finished on collection
+abandoned_files = []
+
+
+def crash(writer):
+    # leave the shard being filled behind without its gzip trailer, as a killed process would
+    writer.raw_file.close()
+    abandoned_files.append(writer.file)
+    writer.file = None
+    writer.raw_file = None
+
+
+def test_shards_roll_over_and_are_published_on_close(tmp_path):
+    writer = ShardWriter(str(tmp_path), max_shard_bytes=300)
+    for number in range(10):
+        writer.write(recipe(number))
+    writer.close()
+    file_names = sorted(os.listdir(tmp_path))
+    assert len(file_names) > 1
+    assert not any(file_name.endswith(PARTIAL_SUFFIX) for file_name in file_names)
+    assert urls(tmp_path) == [recipe(number)['url'] for number in range(10)]
+
+
+def test_recovery_publishes_every_complete_line_once(tmp_path):
+    writer = ShardWriter(str(tmp_path), max_shard_bytes=300)
+    for number in range(7):
+        writer.write(recipe(number))
+    crash(writer)
+    assert any(file_name.endswith(PARTIAL_SUFFIX) for file_name in os.listdir(tmp_path))
+
+    writer = ShardWriter(str(tmp_path))
+    writer.recover_partial_shards()
+    writer.write(recipe(7))
+    writer.close()
+    assert urls(tmp_path) == [recipe(number)['url'] for number in range(8)]
+    assert not any(file_name.endswith(PARTIAL_SUFFIX) for file_name in os.listdir(tmp_path))
+
+
+def test_recovery_drops_a_cut_last_line(tmp_path):
+    writer = ShardWriter(str(tmp_path))
+    for number in range(3):
+        writer.write(recipe(number))
+    crash(writer)
+    partial_path = os.path.join(tmp_path, 'recipes-00000.jsonl.gz' + PARTIAL_SUFFIX)
+    with open(partial_path, 'rb') as file:
+        content = zlib.decompressobj(wbits=31).decompress(file.read())
+    with gzip.open(partial_path, 'wb') as file:
+        file.write(content[:-10])
+
+    ShardWriter(str(tmp_path)).recover_partial_shards()
+    assert urls(tmp_path) == [recipe(number)['url'] for number in range(2)]
+
+
+def test_recovery_interrupted_after_publishing_does_not_duplicate(tmp_path):
+    writer = ShardWriter(str(tmp_path))
+    for number in range(3):
+        writer.write(recipe(number))
+    crash(writer)
+    partial_path = os.path.join(tmp_path, 'recipes-00000.jsonl.gz' + PARTIAL_SUFFIX)
+    with open(partial_path, 'rb') as file:
+        partial = file.read()
+    ShardWriter(str(tmp_path)).recover_partial_shards()
+    # the recovered shard was published but the process died before removing the .tmp
+    with open(partial_path, 'wb') as file:
+        file.write(partial)
+
+    ShardWriter(str(tmp_path)).recover_partial_shards()
+    assert urls(tmp_path) == [recipe(number)['url'] for number in range(3)]
+    assert os.listdir(tmp_path) == ['recipes-00000.jsonl.gz']
+
+
+def test_recovery_leaves_a_live_writer_alone(tmp_path):
+    writer = ShardWriter(str(tmp_path))
+    writer.write(recipe(0))
+    ShardWriter(str(tmp_path)).recover_partial_shards()
+    assert os.listdir(tmp_path) == ['recipes-00000.jsonl.gz' + PARTIAL_SUFFIX]
+    writer.write(recipe(1))
+    writer.close()
+    assert urls(tmp_path) == [recipe(0)['url'], recipe(1)['url']]
+
+
+def test_read_recipe_range(tmp_path):
+    writer = ShardWriter(str(tmp_path))
+    for number in range(5):
+        writer.write(recipe(number))
+    writer.close()
+    path = os.path.join(tmp_path, 'recipes-00000.jsonl.gz')
+    assert count_recipe_file(path) == 5
+    assert [item['url'] for item in read_recipe_range(path, 1, 4)] == [recipe(number)['url'] for number in (1, 2, 3)]
+
+
+def test_two_writers_never_clobber_each_other(tmp_path):
+    first = ShardWriter(str(tmp_path))
+    second = ShardWriter(str(tmp_path))
+    first.write(recipe(0))
+    first.close()
+    # second was created before the first shard was published
+    second.write(recipe(1))
+    second.close()
+    assert sorted(urls(tmp_path)) == [recipe(0)['url'], recipe(1)['url']]
+
+    first = ShardWriter(str(tmp_path))
+    second = ShardWriter(str(tmp_path))
+    for number in range(2, 12):
+        (first if number % 2 else second).write(recipe(number))
+    second.close()
+    first.close()
+    assert sorted(urls(tmp_path)) == sorted(recipe(number)['url'] for number in range(12))
+    assert len(os.listdir(tmp_path)) == 4
+
+
+def test_publishing_onto_an_existing_shard_takes_another_number(tmp_path):
+    writer = ShardWriter(str(tmp_path))
+    writer.write(recipe(0))
+    # a shard of the same name published by a writer that did not claim it
+    with gzip.open(os.path.join(tmp_path, 'recipes-00000.jsonl.gz'), 'wt') as file:
+        file.write('{"url": "foreign"}\n')
+    writer.close()
+    assert sorted(urls(tmp_path)) == ['foreign', recipe(0)['url']]
+    assert not any(file_name.endswith(PARTIAL_SUFFIX) for file_name in os.listdir(tmp_path))
+
+
+
+def write_range(folder, start, end):
+    writer = ShardWriter(folder, max_shard_bytes=300)
+    for number in range(start, end):
+        writer.write(recipe(number))
+    writer.close()
+
+
+def test_concurrent_writer_processes_keep_every_recipe(tmp_path):
+    workers = [multiprocessing.Process(target=write_range, args=(str(tmp_path), start, start + 300))
+               for start in (0, 300, 600)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert sorted(urls(tmp_path)) == sorted(recipe(number)['url'] for number in range(900))
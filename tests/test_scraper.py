@@ -0,0 +1,87 @@
+import random
+
+import pytest
+import requests
+
+import scraper
+from benchmark_parser import synthetic_page
+from recipe_store import iter_recipes
+
+
+@pytest.fixture
+def instance(tmp_path, monkeypatch):
+    # the scraper keeps its recipes and crawl state in the working directory
+    monkeypatch.chdir(tmp_path)
+    instance = scraper.Scraper()
+    instance.request_delay = instance.page_delay = 0
+    yield instance
+    instance.recipe_store.close()
+    instance.crawl_state.close()
+
+
+def cached_response(html):
+    response = requests.Response()
+    response.status_code = 200
+    response.encoding = 'utf-8'
+    response._content = html.encode('utf-8')
+    response.from_cache = True
+    return response
+
+
+def test_page_answered_from_the_cache_is_parsed(instance, monkeypatch):
+    url = 'https://example.invalid/ricette/carbonara.html'
+    page = synthetic_page(1, random.Random(1))
+    monkeypatch.setattr(scraper, 'fetch_page', lambda link: cached_response(page))
+    # a recipe the crawl state does not know, e.g. lost in a crash after the cache was written
+    assert instance.save_recipe(url)
+    instance.recipe_store.close()
+    assert [recipe['url'] for recipe in iter_recipes('Recipes')] == [url]
+
+
+def link(name):
+    return f'https://example.invalid/ricette/{name}.html'
+
+
+def run_refresh(instance, monkeypatch, pages, failing=()):
+    saved = []
+    pauses = []
+    monkeypatch.setattr(instance, 'count_total_pages', lambda: len(pages))
+    monkeypatch.setattr(instance, 'download_page_links', lambda page_number: pages[page_number - 1])
+    monkeypatch.setattr(instance, 'pause', lambda seconds, reason: pauses.append(reason))
+
+    def save_recipe(recipe_link):
+        if recipe_link in failing:
+            return False
+        saved.append(recipe_link)
+        return True
+
+    monkeypatch.setattr(instance, 'save_recipe', save_recipe)
+    instance.download_new_recipes()
+    return saved, pauses
+
+
+def test_refresh_stops_at_the_canonical_watermark_and_paces_pages(instance, monkeypatch):
+    instance.crawl_state.set_meta("watermark_url", link('c'))
+    pages = [[link('a'), link('b')], ['https://EXAMPLE.invalid/ricette/c.html/', link('d')]]
+    saved, pauses = run_refresh(instance, monkeypatch, pages)
+    assert saved == [link('a'), link('b')]
+    assert pauses.count('page') == 1
+    assert instance.crawl_state.get_meta("watermark_url") == link('a')
+
+
+def test_watermark_stays_behind_failed_recipes(instance, monkeypatch):
+    instance.crawl_state.set_meta("watermark_url", link('e'))
+    pages = [[link('a'), link('b'), link('c'), link('d'), link('e')]]
+    run_refresh(instance, monkeypatch, pages, failing={link('b')})
+    assert instance.crawl_state.get_meta("watermark_url") == link('c')
+
+    # the next refresh walks back to the failed recipe and retries it
+    saved, _ = run_refresh(instance, monkeypatch, [[link('z')] + pages[0]])
+    assert saved == [link('z'), link('b')]
+    assert instance.crawl_state.get_meta("watermark_url") == link('z')
+
+
+def test_watermark_kept_when_the_oldest_new_recipe_failed(instance, monkeypatch):
+    instance.crawl_state.set_meta("watermark_url", link('c'))
+    run_refresh(instance, monkeypatch, [[link('a'), link('b'), link('c')]], failing={link('b')})
+    assert instance.crawl_state.get_meta("watermark_url") == link('c')
@@ -0,0 +1,57 @@
+import pytest
+
+import scraper
+from selector_plan import SelectorPlan, make_soup
+
+NORMAL_PAGE = ('<html><head><title>Carbonara | Ricette</title></head><body>'
+               '<h1>Carbonara</h1><h2>Ingredienti</h2>'
+               '<ul class="breadcrumb"><li><a>Primi piatti</a></li></ul><span class="category">Pasta</span>'
+               '<dl><dd class="gz-ingredient">Spaghetti 320 g</dd><dd class="gz-ingredient">Uova 4 medie</dd></dl>'
+               '</body></html>')
+# an older layout: no h1, no breadcrumb, other ingredient markup
+OLD_PAGE = ('<html><head><title>Gricia</title></head><body>'
+            '<h2>Gricia</h2><span class="category">Primi</span>'
+            '<ul><li class="ingredient">Rigatoni 320 g</li><li class="ingredient">Guanciale 150 g</li></ul>'
+            '</body></html>')
+TITLE_ONLY_PAGE = '<html><head><title>Pagina</title></head><body><p>nessuna ricetta</p></body></html>'
+
+
+@pytest.fixture
+def fresh_plans(monkeypatch):
+    # plans start from their documented order, whatever other tests parsed before
+    for name in ('TITLE_PLAN', 'INGREDIENT_PLAN', 'CATEGORY_PLAN'):
+        plan = getattr(scraper, name)
+        monkeypatch.setattr(scraper, name, SelectorPlan(plan.order, learn=plan.learn, name=plan.name))
+
+
+def extract(html):
+    soup = make_soup(html)
+    return scraper.find_title(soup), scraper.find_category(soup), scraper.find_ingredients(soup)
+
+
+def test_fields_do_not_depend_on_the_pages_parsed_before(fresh_plans):
+    expected = {html: extract(html) for html in (NORMAL_PAGE, OLD_PAGE, TITLE_ONLY_PAGE)}
+    assert expected[NORMAL_PAGE][:2] == ('Carbonara', 'Primi piatti')
+    assert expected[OLD_PAGE][:2] == ('Gricia', 'Primi')
+    for sequence in ([OLD_PAGE, NORMAL_PAGE], [TITLE_ONLY_PAGE, NORMAL_PAGE, OLD_PAGE],
+                     [NORMAL_PAGE, OLD_PAGE, OLD_PAGE, NORMAL_PAGE, TITLE_ONLY_PAGE]):
+        for html in sequence:
+            assert extract(html) == expected[html]
+
+
+def test_learned_plan_tries_the_last_winning_selector_first():
+    plan = SelectorPlan(['.ingredient', '.gz-ingredient'])
+    soup = make_soup(NORMAL_PAGE)
+    assert len(plan.find(soup, lambda tags: tags)) == 2
+    assert plan.selectors == ['.gz-ingredient', '.ingredient']
+    assert plan.order == ('.ingredient', '.gz-ingredient')
+    assert plan.fallbacks == 1
+    plan.find(soup, lambda tags: tags)
+    assert plan.fallbacks == 1
+
+
+def test_precedence_plan_keeps_its_order():
+    plan = SelectorPlan(['h1', 'h2'], learn=False)
+    plan.find(make_soup(OLD_PAGE), scraper.first_text)
+    assert plan.selectors == ['h1', 'h2']
+    assert plan.find(make_soup(NORMAL_PAGE), scraper.first_text) == 'Carbonara'